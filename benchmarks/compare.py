@@ -0,0 +1,68 @@
+"""Compare two benchmark results of benchmarks.run, e.g between two commits.
+
+usage:
+    python -m benchmarks.compare baseline.json results.json --threshold 0.1
+
+exits with status 1 if the throughput or the p99 latency of a benchmark regressed
+by more than `threshold`.
+"""
+
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+KEY_FIELDS = (
+    "scenario",
+    "backend",
+    "codec",
+    "concurrency",
+    "payload_size",
+    "latency",
+)
+
+
+def _key(result: Dict[str, Any]) -> Tuple[Any, ...]:
+    return tuple(result.get(field) for field in KEY_FIELDS)
+
+
+def compare(
+    baseline: Dict[str, Any], current: Dict[str, Any], threshold: float
+) -> List[str]:
+    """print the change of each benchmark, returns the regressions"""
+    baseline_results = {_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = baseline_results.get(_key(result))
+        if before is None:
+            continue
+        name = "{scenario} {backend} {codec} c={concurrency}".format(**result)
+        rps = result["requests_per_second"] / before["requests_per_second"] - 1
+        p99 = result["p99"] / before["p99"] - 1
+        print(f"{name:<28} req/s {rps:+7.1%}  p99 {p99:+7.1%}")
+        if rps < -threshold or p99 > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """compare two reports of benchmarks/run.py, returns 1 on regressions"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print("regressions: " + ", ".join(regressions), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+"""Benchmarks of the client hot paths against an in-process mock server.
+
+usage:
+    python -m benchmarks.run --backends asyncio,trio --concurrency 1,10,100 \
+        --requests 2000 --output results.json
+    python -m benchmarks.run --codecs json,orjson --payload-size 1000000 \
+        --requests 100 --concurrency 10
+    python -m benchmarks.compare baseline.json results.json
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import platform
+import subprocess  # nosec
+import sys
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.server import MockGraphQLServer
+from pygraphql import BaseAuth, BaseClientAsync, Query
+from pygraphql.client.utils import BACKEND, RetryError, merge_concurrently
+
+QUERY = """query($first: Int!) { items(first: $first) { id name score } }"""
+
+SCENARIOS = ("execute", "query", "retry")
+
+
+async def _run_requests(
+    call: Callable[[int], Awaitable[Any]],
+    requests: int,
+    concurrency: int,
+    backend: Optional[str],
+) -> Dict[str, Any]:
+    """call `call` `requests` times with `concurrency` calls in flight"""
+    latencies: List[float] = []
+    failures = 0
+
+    async def worker(index: int, send: Callable[[Any], Awaitable[None]]) -> None:
+        nonlocal failures
+        start = time.perf_counter()
+        try:
+            await call(index)
+        except RetryError:
+            failures += 1
+        latencies.append(time.perf_counter() - start)
+
+    start_cpu = time.process_time()
+    start = time.perf_counter()
+    async for _ in merge_concurrently(worker, range(requests), concurrency, backend):
+        pass
+    return {
+        "wall": time.perf_counter() - start,
+        "cpu": time.process_time() - start_cpu,
+        "latencies": sorted(latencies),
+        "failures": failures,
+    }
+
+
+async def run_scenario(
+    scenario: str,
+    backend_name: str,
+    concurrency: int,
+    codec: str,
+    args: argparse.Namespace,
+) -> Dict[str, Any]:
+    """run a scenario and measure its throughput, latency, cpu and memory"""
+    backend = "asyncio" if backend_name == "asyncio" else None
+    error_rate = args.error_rate
+    if scenario == "retry":
+        error_rate = max(error_rate, 0.2)
+    server = MockGraphQLServer(
+        latency=args.latency,
+        payload_size=args.payload_size,
+        error_rate=error_rate,
+        timeout_rate=args.timeout_rate,
+        timeout=args.timeout,
+        seed=args.seed,
+        backend=backend,
+    )
+    exec_kwargs: Dict[str, Any] = {
+        "max_tries": 5,
+        "random_exponential_sleep_max_sleep": 0,
+    }
+    async with BaseClientAsync(
+        endpoint="http://mock/graphql",
+        app=server,
+        auth=BaseAuth("benchmark"),
+        backend=backend,
+        codec=codec,
+    ) as client:
+        if scenario == "query":
+            query = Query(QUERY, client=client)
+
+            async def call(index: int) -> Any:
+                return await query({"first": index}, **exec_kwargs)
+
+        else:
+
+            async def call(index: int) -> Any:
+                return await client.execute(QUERY, {"first": index}, **exec_kwargs)
+
+        # warmup
+        await _run_requests(call, min(args.requests, 50), concurrency, backend)
+
+        server.response_bytes = 0
+        measures = await _run_requests(call, args.requests, concurrency, backend)
+        response_bytes = server.response_bytes
+
+        # memory is measured in a separate pass, tracemalloc slows everything down
+        tracemalloc.start()
+        await _run_requests(call, min(args.requests, 200), concurrency, backend)
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    latencies = measures["latencies"]
+    decoded_mb = response_bytes / 1e6
+    return {
+        "scenario": scenario,
+        "backend": backend_name,
+        "concurrency": concurrency,
+        "codec": codec,
+        "requests": args.requests,
+        "latency": args.latency,
+        "payload_size": args.payload_size,
+        "error_rate": error_rate,
+        "timeout_rate": args.timeout_rate,
+        "failures": measures["failures"],
+        "requests_per_second": args.requests / measures["wall"],
+        "p50": _percentile(latencies, 50),
+        "p99": _percentile(latencies, 99),
+        "mean": sum(latencies) / len(latencies),
+        "cpu_seconds_per_mb": measures["cpu"] / decoded_mb if decoded_mb else None,
+        "peak_bytes_per_in_flight_request": peak_memory
+        / min(concurrency, args.requests),
+    }
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    """nearest rank percentile of sorted values"""
+    rank = max(1, -(-len(values) * percentile // 100))
+    return values[int(rank) - 1]
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(  # nosec
+            ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _run(backend_name: str, coroutine_function: Callable[[], Awaitable[Any]]) -> Any:
+    if backend_name == "asyncio":
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine_function())
+        finally:
+            loop.close()
+    import trio  # pylint: disable=import-outside-toplevel
+
+    return trio.run(coroutine_function)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """parse the command line arguments of the benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument(
+        "--backends", default="asyncio,trio" if BACKEND == "trio" else "asyncio"
+    )
+    parser.add_argument("--concurrency", default="1,10,100")
+    parser.add_argument("--codecs", default="json", help="json codecs to compare")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--payload-size", type=int, default=1024)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="json file of the results")
+    parser.add_argument("--log-level", default="ERROR", help="of the client logs")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    """run the scenarios for each backend, codec and concurrency, print them
+    and write the report to `--output` if given, returns the report"""
+    args = parse_args(argv)
+    # the retry warnings are still formatted, only their output is skipped
+    logging.getLogger("pygraphql").setLevel(args.log_level)
+    results = []
+    for backend_name in args.backends.split(","):
+        if backend_name == "trio" and BACKEND != "trio":
+            print("trio is not installed, skipping the trio backend", file=sys.stderr)
+            continue
+        for scenario in args.scenarios.split(","):
+            assert scenario in SCENARIOS, f"unknown scenario {scenario}"
+            for codec in args.codecs.split(","):
+                for concurrency in map(int, args.concurrency.split(",")):
+                    result = _run(
+                        backend_name,
+                        lambda: run_scenario(
+                            scenario, backend_name, concurrency, codec, args
+                        ),
+                    )
+                    results.append(result)
+                    print(
+                        "{scenario:>8} {backend:>8} {codec:>6} c={concurrency:<4} "
+                        "{requests_per_second:9.1f} req/s  p50={p50:.4f}s  "
+                        "p99={p99:.4f}s  cpu/MB={cpu_seconds_per_mb:.3f}s  "
+                        "failures={failures}".format(**result),
+                        file=sys.stderr,
+                    )
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "date": datetime.datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "httpx": httpx.__version__,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
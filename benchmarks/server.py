@@ -0,0 +1,103 @@
+import json
+import random
+from typing import Any, Callable, Dict
+
+from pygraphql.client.utils import sleep
+
+
+class MockGraphQLServer:
+    """in-process ASGI stand-in of a GraphQL server, to benchmark the client
+    without the noise of a real server and network.
+
+    every request gets, after `latency` seconds:
+
+    - with probability `error_rate`: a 503 response (retried by the client).
+    - with probability `timeout_rate`: a 504 response after `timeout` more seconds,
+      as a gateway would answer for a stuck backend.
+    - otherwise: a 200 response with a `{"data": {"items": [...]}}` body of about
+      `payload_size` bytes.
+
+    example:
+        >>> server = MockGraphQLServer(latency=0.005, payload_size=10_000)
+        >>> async with BaseClientAsync(endpoint="http://mock/", app=server) as client:
+                ...
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        payload_size: int = 1024,
+        error_rate: float = 0.0,
+        timeout_rate: float = 0.0,
+        timeout: float = 1.0,
+        seed: int = 0,
+        backend=None,
+    ):
+        """
+        Args:
+            latency (optional): seconds before answering. Defaults to 0.
+            payload_size (optional): approximate size in bytes of the successful
+                responses. Defaults to 1024.
+            error_rate (optional): ratio of 503 responses. Defaults to 0.
+            timeout_rate (optional): ratio of 504 responses. Defaults to 0.
+            timeout (optional): extra seconds before a 504 response. Defaults to 1.
+            seed (optional): seed of the random errors. Defaults to 0.
+            backend (optional): force backend to use asyncio even if trio is
+                installed. Defaults to None.
+        """
+        assert 0 <= error_rate + timeout_rate <= 1
+        self.latency = latency
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout = timeout
+        self._backend = backend
+        self._random = random.Random(seed)
+        self._payload = _make_payload(payload_size)
+        self.requests = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    async def __call__(
+        self, scope: Dict[str, Any], receive: Callable, send: Callable
+    ) -> None:
+        assert scope["type"] == "http"
+        more_body = True
+        while more_body:
+            message = await receive()
+            self.request_bytes += len(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        self.requests += 1
+
+        if self.latency:
+            await sleep(self.latency, backend=self._backend)
+        roll = self._random.random()
+        if roll < self.error_rate:
+            status, body = 503, b'{"errors": [{"message": "unavailable"}]}'
+        elif roll < self.error_rate + self.timeout_rate:
+            await sleep(self.timeout, backend=self._backend)
+            status, body = 504, b'{"errors": [{"message": "gateway timeout"}]}'
+        else:
+            status, body = 200, self._payload
+
+        self.response_bytes += len(body)
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ]
+        await send(
+            {"type": "http.response.start", "status": status, "headers": headers}
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+def _make_payload(size: int) -> bytes:
+    """a graphql response of about `size` bytes"""
+    items = []
+    total = len('{"data": {"items": []}}')
+    index = 0
+    while total < size:
+        item = {"id": str(index), "name": "item-{}".format(index), "score": index}
+        items.append(item)
+        total += len(json.dumps(item)) + 2
+        index += 1
+    return json.dumps({"data": {"items": items}}).encode("utf-8")
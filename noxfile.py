@@ -5,3 +5,11 @@ import nox
 def tests(session):
     session.run("poetry", "install", "-E", "trio", external=True)
     session.run("pytest")
+
+
+@nox.session(python="3.8")
+def benchmarks(session):
+    """run the benchmarks, extra args are given to benchmarks.run
+    e.g: nox -s benchmarks -- --concurrency 10 --output results.json"""
+    session.run("poetry", "install", "-E", "trio", external=True)
+    session.run("python", "-m", "benchmarks.run", *session.posargs)
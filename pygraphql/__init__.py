@@ -1,3 +1,8 @@
 from .auth import BaseAuth
-from .client import BaseClientAsync
-from .query import Query
+from .bulk import BulkReport, BulkWriter
+from .client import BaseClientAsync, SubscriptionClient
+from .executor import ProcessExecutor
+from .loader import QueryLoader
+from .query import BigQuery, Query
+from .sink import ArrowSink, ColumnBuffer, CsvSink, NdjsonSink, ParquetSink
+from .sync import SyncClient, SyncQuery
@@ -1,2 +1,3 @@
 from .base import BaseAuth
-from .hasura_admin import HasuraAdminAuth
\ No newline at end of file
+from .hasura_admin import HasuraAdminAuth
+from .token import RefreshableToken
@@ -1,3 +1,4 @@
+import hashlib
 import logging
 import os
 
@@ -5,12 +6,66 @@ import httpx
 
 
 class BaseAuth(httpx.Auth):
-    def __init__(self, token=None):
-        self._token = token or os.getenv("GRAPHQL_AUTH_TOKEN")
-        assert isinstance(self._token, str)
+    """bearer token auth, the token is given, read from the GRAPHQL_AUTH_TOKEN
+    env variable, or fetched by a `token_provider` (see
+    pygraphql.auth.RefreshableToken) for short lived tokens: it's refreshed
+    before it expires and when a request is rejected with a 401, the request
+    is then sent again with the new token.
+
+    subclasses set the token on the requests in `apply_token`.
+    """
+
+    def __init__(self, token=None, token_provider=None):
+        self._token_provider = token_provider
+        self._token = token
+        if token_provider is None:
+            self._token = token or os.getenv("GRAPHQL_AUTH_TOKEN")
+            assert isinstance(self._token, str)
         self._logger = logging.getLogger(__name__)
         self._logger.debug(f"Success {self.__class__.__name__} setup")
 
+    @property
+    def identity(self) -> str:
+        """a hash identifying the credentials, used to scope cached responses"""
+        if self._token_provider is not None:
+            key = f"{self.__class__.__name__}:provider:{self._token_provider.key}"
+        else:
+            key = f"{self.__class__.__name__}:{self._token}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    @property
+    def token_provider(self):
+        """the provider of short lived tokens, None if the token is given"""
+        return self._token_provider
+
+    def apply_token(self, request, token):
+        """set the token on the request, in the Authorization header"""
+        request.headers["Authorization"] = f"bearer {token}"
+
     def auth_flow(self, request):
-        request.headers["Authorization"] = f"bearer {self._token}"
+        token = self._token
+        if self._token_provider is not None:
+            # sync clients can't refresh it, the last token fetched is used
+            token = self._token_provider.current
+        self.apply_token(request, token)
         yield request
+
+    async def async_auth_flow(self, request):
+        if self._token_provider is None:
+            flow = super().async_auth_flow(request)
+            request = await flow.__anext__()
+            while True:
+                response = yield request
+                try:
+                    request = await flow.asend(response)
+                except StopAsyncIteration:
+                    return
+
+        token = await self._token_provider.token()
+        self.apply_token(request, token)
+        response = yield request
+        if response.status_code == 401:
+            self._logger.warning("Token rejected, refreshing it")
+            token = await self._token_provider.refresh(stale=token)
+            self.apply_token(request, token)
+            yield request
@@ -2,7 +2,6 @@ from .base import BaseAuth
 
 
 class HasuraAdminAuth(BaseAuth):
-    def auth_flow(self, request):
+    def apply_token(self, request, token):
         # Send the request, with a custom `x-hasura-admin-Secret` header.
-        request.headers["x-hasura-admin-Secret"] = self._token
-        yield request
+        request.headers["x-hasura-admin-Secret"] = token
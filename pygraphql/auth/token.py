@@ -0,0 +1,158 @@
+import base64
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Union
+
+from pygraphql.client.utils import create_event
+
+Fetch = Callable[[], Awaitable[Union[str, Tuple[str, Optional[float]]]]]
+
+
+class RefreshableToken:
+    """A short lived token (e.g a JWT) fetched by an async function and refreshed
+    without recreating the clients using it, see BaseAuth(token_provider=...).
+
+    `fetch` returns the token, or a (token, expires_in seconds) tuple. without
+    expiry, the `exp` claim of a JWT is used, other tokens never expire.
+
+    - the token is refreshed `refresh_margin` seconds before its expiry, by the
+      first request needing it, while the other requests keep using the current
+      token.
+    - a token rejected with a 401 is refreshed once for all the concurrent
+      requests rejected with it: they wait for the refresh and are replayed.
+    - the tokens are cached per `key`, `RefreshableToken.shared(key, fetch)`
+      returns the same token to all the auths using this key.
+
+    example:
+        >>> async def fetch():
+        >>>     response = await http.post(token_url, data=credentials)
+        >>>     return response.json()["access_token"], response.json()["expires_in"]
+        >>> auth = BaseAuth(token_provider=RefreshableToken(fetch, key="service"))
+    """
+
+    _shared: Dict[str, "RefreshableToken"] = {}
+
+    def __init__(
+        self,
+        fetch: Fetch,
+        key: Optional[str] = None,
+        refresh_margin: float = 60.0,
+        backend=None,
+    ):
+        """
+        Args:
+            fetch: async function returning a token or (token, expires_in)
+            key (optional): identity of the credentials, scoping the cached
+                responses and shared clients. Defaults to None (unique).
+            refresh_margin (optional): seconds before the expiry to refresh the
+                token. Defaults to 60.
+            backend (optional): force backend to use asyncio even if trio is
+                installed. Defaults to None.
+        """
+        self._fetch = fetch
+        self.key = key if key is not None else f"{id(self):x}"
+        self.refresh_margin = refresh_margin
+        self._backend = backend
+        self._token: Optional[str] = None
+        self._expires_at: Optional[float] = None
+        self._refreshing: Any = None  # event of the refresh in progress
+        self._error: Optional[Exception] = None
+        self.refreshes = 0
+        self._logger = logging.getLogger(__name__)
+
+    @classmethod
+    def shared(cls, key: str, fetch: Fetch, **kwargs: Any) -> "RefreshableToken":
+        """the token cached for `key`, created with `fetch` and the kwargs the
+        first time"""
+        token = cls._shared.get(key)
+        if token is None:
+            token = cls._shared[key] = cls(fetch, key=key, **kwargs)
+        return token
+
+    @property
+    def current(self) -> Optional[str]:
+        """the cached token, None if not fetched yet"""
+        return self._token
+
+    @property
+    def expires_in(self) -> Optional[float]:
+        """seconds until the token expires, None if it doesn't"""
+        if self._expires_at is None:
+            return None
+        return self._expires_at - time.monotonic()
+
+    async def token(self) -> str:
+        """the current token, refreshed if it expires soon"""
+        expires_in = self.expires_in
+        if self._token is not None and (
+            expires_in is None or expires_in > self.refresh_margin
+        ):
+            return self._token
+        if (
+            self._refreshing is not None
+            and self._token is not None
+            and expires_in is not None
+            and expires_in > 0
+        ):
+            # still valid, don't wait for the proactive refresh
+            return self._token
+        return await self.refresh()
+
+    async def refresh(self, stale: Optional[str] = None) -> str:
+        """fetch a new token, a single time for the concurrent callers
+
+        Args:
+            stale (optional): the token rejected by the server, nothing is
+                fetched if it was already replaced. Defaults to None.
+
+        Returns:
+            str: the new token
+        """
+        if stale is not None and self._token is not None and self._token != stale:
+            return self._token
+        if self._refreshing is not None:
+            await self._refreshing.wait()
+            if self._error is not None:
+                raise self._error
+            return self._token  # type: ignore
+
+        event = self._refreshing = create_event(self._backend)
+        self._error = None
+        try:
+            self._set(await self._fetch())
+            self.refreshes += 1
+            self._logger.debug(f"Token {self.key} refreshed")
+            return self._token  # type: ignore
+        except Exception as error:
+            self._error = error
+            raise
+        finally:
+            self._refreshing = None
+            event.set()
+
+    def _set(self, value: Union[str, Tuple[str, Optional[float]]]) -> None:
+        if isinstance(value, tuple):
+            token, expires_in = value
+        else:
+            token, expires_in = value, _jwt_expires_in(value)
+        assert isinstance(token, str)
+        self._token = token
+        self._expires_at = None
+        if expires_in is not None:
+            self._expires_at = time.monotonic() + expires_in
+
+
+def _jwt_expires_in(token: str) -> Optional[float]:
+    """seconds until the `exp` claim of a JWT, None if it isn't a JWT"""
+    parts = token.split(".")
+    if len(parts) != 3:
+        return None
+    try:
+        payload = base64.urlsafe_b64decode(parts[1] + "=" * (-len(parts[1]) % 4))
+        exp = json.loads(payload)["exp"]
+    except (ValueError, KeyError, TypeError):
+        return None
+    if not isinstance(exp, (int, float)):
+        return None
+    return exp - time.time()
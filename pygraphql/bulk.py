@@ -0,0 +1,253 @@
+import time
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from pygraphql.client.base import BaseClientAsync
+from pygraphql.client.registry import default_registry
+from pygraphql.client.document import CompiledQuery
+from pygraphql.client.utils import RetryError, _aiter_items, merge_concurrently
+
+Rows = Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]]
+
+
+class BulkReport:
+    """progress of a bulk write"""
+
+    def __init__(self) -> None:
+        self.rows = 0  # rows written or failed
+        self.chunks = 0  # mutations executed successfully
+        self.affected_rows = 0
+        self.failed: List[Tuple[Dict[str, Any], Any]] = []  # (row, errors)
+        self.start = time.monotonic()
+        self.end: Optional[float] = None
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(rows={self.rows}, chunks={self.chunks}, "
+            f"affected_rows={self.affected_rows}, failed={len(self.failed)}, "
+            f"rows_per_second={self.rows_per_second:0.1f})"
+        )
+
+    @property
+    def elapsed(self) -> float:
+        """seconds since the start of the write, until its end once done"""
+        return (self.end or time.monotonic()) - self.start
+
+    @property
+    def rows_per_second(self) -> float:
+        """rows written or failed per second"""
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+class BulkWriter:
+    """Insert a large number of rows in a Hasura table with `insert_*` mutations
+
+    rows are consumed lazily from a sync or async iterable and packed in
+    `objects` chunks of at most `chunk_size` rows and `max_chunk_bytes` bytes.
+    At most `max_concurrency` mutations are in flight, the rows are only pulled
+    from the iterable when a slot is free so a fast producer is slowed down to
+    the pace of the server.
+
+    chunks are retried like any execution (see BaseClientAsync.execute), a chunk
+    rejected with graphql errors (e.g a constraint violation) is split in halves
+    to isolate the bad rows when `split_on_error` is True. Rows that can't be
+    written are collected in the `failed` list of the report.
+
+    example:
+        >>> writer = BulkWriter(
+                "users",
+                on_conflict={"constraint": "users_pkey", "update_columns": ["name"]},
+                client=client,
+            )
+        >>> report = await writer(rows)
+        >>> report.affected_rows, report.failed
+
+    takes exactly the same kwargs as pygraphql.Query, a single client is used for
+    the whole write.
+    """
+
+    def __init__(
+        self,
+        table: str,
+        on_conflict: Optional[Dict[str, Any]] = None,
+        mutation: Optional[str] = None,
+        chunk_size: int = 1000,
+        max_chunk_bytes: Optional[int] = None,
+        max_concurrency: int = 4,
+        split_on_error: bool = True,
+        on_progress: Optional[Callable[[BulkReport], None]] = None,
+        **kwargs: Any,
+    ):
+        """initialise the writer
+
+        Args:
+            table: name of the table in the graphql schema, e.g "users" for the
+                `insert_users` mutation
+            on_conflict (optional): `on_conflict` argument of the mutation,
+                for upserts. Defaults to None.
+            mutation (optional): custom mutation taking the rows as `$objects`
+                (and `$on_conflict` if given), its first root field must return
+                `affected_rows`. Defaults to None (`insert_<table>`).
+            chunk_size (optional): max rows per mutation. Defaults to 1000.
+            max_chunk_bytes (optional): max size in bytes of the rows of a
+                mutation. Defaults to None (no limit).
+            max_concurrency (optional): max mutations in flight. Defaults to 4.
+            split_on_error (optional): split chunks rejected with errors to
+                isolate the bad rows. Defaults to True.
+            on_progress (optional): called with the report after each chunk.
+                Defaults to None.
+        """
+        assert chunk_size > 0 and max_concurrency > 0
+        self._client = kwargs.get("client")
+        self._registry = kwargs.pop("registry", default_registry())
+        self._kwargs = kwargs
+        if mutation is None:
+            mutation = (
+                f"mutation($objects: [{table}_insert_input!]!, "
+                f"$on_conflict: {table}_on_conflict) {{ "
+                f"insert_{table}(objects: $objects, on_conflict: $on_conflict) "
+                "{ affected_rows } }"
+            )
+        self._document = CompiledQuery(mutation)
+        if self._document.operation_type != "mutation":
+            raise ValueError("BulkWriter needs a mutation")
+        self.on_conflict = on_conflict
+        self.chunk_size = chunk_size
+        self.max_chunk_bytes = max_chunk_bytes
+        self.max_concurrency = max_concurrency
+        self.split_on_error = split_on_error
+        self.on_progress = on_progress
+
+    async def __call__(
+        self,
+        rows: Rows,
+        max_tries: int = 5,
+        random_exponential_sleep_multiplier: float = 1,
+        random_exponential_sleep_max_sleep: float = 300,
+        random_exponential_sleep_exp_base: float = 2,
+        random_exponential_sleep_min_sleep: float = 0,
+        exc_info: bool = False,
+    ) -> BulkReport:
+        """write all the rows
+
+        Args:
+            rows: sync or async iterable of rows (dicts of column values)
+            max_tries (optional): max number of retries of a chunk in case of
+                errors. Defaults to 5.
+            random_exponential_sleep_multiplier (optional): Defaults to 1
+            random_exponential_sleep_max_sleep (optional):Defaults to 300
+            random_exponential_sleep_exp_base (optional): Defaults to 2.
+            random_exponential_sleep_min_sleep (optional): Defaults to 0.
+            exc_info (optional): wether to log exec info in case of exception.
+                    Defaults to False.
+
+        Returns:
+            BulkReport: affected rows, throughput and failed rows
+        """
+        exec_kwargs: Dict[str, Any] = {
+            "max_tries": max_tries,
+            "random_exponential_sleep_multiplier": random_exponential_sleep_multiplier,
+            "random_exponential_sleep_max_sleep": random_exponential_sleep_max_sleep,
+            "random_exponential_sleep_exp_base": random_exponential_sleep_exp_base,
+            "random_exponential_sleep_min_sleep": random_exponential_sleep_min_sleep,
+            "exc_info": exc_info,
+        }
+        if isinstance(self._client, BaseClientAsync):
+            return await self._write(self._client, rows, exec_kwargs)
+
+        if self._registry is not None:
+            client = await self._registry.acquire(self._kwargs)
+            try:
+                return await self._write(client, rows, exec_kwargs)
+            finally:
+                self._registry.release(client)
+
+        async with BaseClientAsync(**self._kwargs) as client:
+            return await self._write(client, rows, exec_kwargs)
+
+    async def _write(
+        self, client: BaseClientAsync, rows: Rows, exec_kwargs: Dict[str, Any]
+    ) -> BulkReport:
+        report = BulkReport()
+
+        # nothing is sent to the consumer, the report is updated in place
+        async def write(chunk: List[Dict[str, Any]], _send: Any) -> None:
+            await self._write_chunk(client, chunk, exec_kwargs, report)
+            if self.on_progress is not None:
+                self.on_progress(report)
+
+        chunks = self._chunks(rows, client.codec.dumps)
+        async for _ in merge_concurrently(
+            write, chunks, self.max_concurrency, backend=client.backend
+        ):
+            pass
+        report.end = time.monotonic()
+        return report
+
+    async def _write_chunk(
+        self,
+        client: BaseClientAsync,
+        chunk: List[Dict[str, Any]],
+        exec_kwargs: Dict[str, Any],
+        report: BulkReport,
+    ) -> None:
+        variables: Dict[str, Any] = {"objects": chunk}
+        if self.on_conflict is not None:
+            variables["on_conflict"] = self.on_conflict
+        try:
+            result = await client.execute(self._document, variables, **exec_kwargs)
+        except RetryError as error:
+            # the server or the network failed, splitting won't help
+            report.rows += len(chunk)
+            report.failed.extend((row, error) for row in chunk)
+            return
+
+        if result.errors:
+            if self.split_on_error and len(chunk) > 1:
+                middle = len(chunk) // 2
+                for half in (chunk[:middle], chunk[middle:]):
+                    await self._write_chunk(client, half, exec_kwargs, report)
+                return
+            report.rows += len(chunk)
+            report.failed.extend((row, result.errors) for row in chunk)
+            return
+
+        report.rows += len(chunk)
+        report.chunks += 1
+        data = result.data or {}
+        for value in data.values():
+            report.affected_rows += (value or {}).get("affected_rows") or 0
+            break
+
+    async def _chunks(
+        self, rows: Rows, dumps: Callable[[Any], bytes]
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """pack the rows in chunks of at most `chunk_size` rows and
+        `max_chunk_bytes` bytes"""
+        chunk: List[Dict[str, Any]] = []
+        chunk_bytes = 0
+        async for row in _aiter_items(rows):
+            size = len(dumps(row)) + 1 if self.max_chunk_bytes is not None else 0
+            if chunk and (
+                len(chunk) >= self.chunk_size
+                or (
+                    self.max_chunk_bytes is not None
+                    and chunk_bytes + size > self.max_chunk_bytes
+                )
+            ):
+                yield chunk
+                chunk, chunk_bytes = [], 0
+            chunk.append(row)
+            chunk_bytes += size
+        if chunk:
+            yield chunk
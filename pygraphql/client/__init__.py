@@ -1 +1,19 @@
-from .base import BaseClientAsync
\ No newline at end of file
+from .balancer import Endpoint, EndpointPool
+from .base import BaseClientAsync
+from .cache import BaseCache, DiskCache, MemoryCache
+from .codec import JsonCodec, OrjsonCodec, UjsonCodec
+from .compression import RequestCompression
+from .cost import CostEstimator, CostScheduler
+from .document import CompiledQuery, DocumentSyntaxError, VariablesError
+from .instrumentation import ExecutionEvent, MetricsAggregator, OpenTelemetryHook
+from .latency import LatencyTracker
+from .ratelimit import RateLimiter, SharedRateLimiter
+from .registry import ClientRegistry, aclose_clients, default_registry
+from .retry import CircuitBreaker, CircuitOpenError, RetryBudget, RetryPolicy
+from .subscription import (
+    Subscription,
+    SubscriptionClient,
+    SubscriptionError,
+    SubscriptionOverflowError,
+    WebSocketConnection,
+)
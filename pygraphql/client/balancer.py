@@ -0,0 +1,218 @@
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+
+class Endpoint:
+    """an endpoint of an EndpointPool, with its load and health"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0  # requests in flight
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ewma: Optional[float] = None  # moving average of the latency
+        self.ejected_until: Optional[float] = None
+        self.ejections = 0
+        self.probing = False
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.url!r})"
+
+    @property
+    def ejected(self) -> bool:
+        """wether the endpoint is out of the rotation until a probe succeeds"""
+        return self.ejected_until is not None
+
+    def stats(self) -> Dict[str, Any]:
+        """the counters, latency and state of the endpoint"""
+        return {
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "ewma_latency": self.ewma,
+            "ejected": self.ejected,
+            "ejections": self.ejections,
+        }
+
+
+class EndpointPool:
+    """Spread the requests of a client over several replicas of an endpoint.
+
+    - reads go to the healthy endpoint with the least outstanding requests
+      (`policy="least_outstanding"`) or with the lowest latency moving average
+      weighted by its outstanding requests (`policy="ewma"`), ties are broken at
+      random.
+    - mutations go to the `primary` endpoint if any, which doesn't have to be
+      one of the read endpoints.
+    - an endpoint failing `failure_threshold` times in a row (transport errors,
+      timeouts and 5xx responses) is ejected, after `ejection_time` seconds it's
+      probed with `probe_query` by the next request and put back if it answers.
+      if all the read endpoints are ejected, the one ejected first is used.
+
+    example:
+        >>> pool = EndpointPool(
+                ["https://replica-1/v1/graphql", "https://replica-2/v1/graphql"],
+                primary="https://primary/v1/graphql",
+                policy="ewma",
+            )
+        >>> async with BaseClientAsync(endpoint_pool=pool) as client:
+                ...
+        >>> pool.stats()
+    """
+
+    LEAST_OUTSTANDING = "least_outstanding"
+    EWMA = "ewma"
+
+    def __init__(
+        self,
+        endpoints: Sequence[str],
+        primary: Optional[str] = None,
+        policy: str = LEAST_OUTSTANDING,
+        failure_threshold: int = 3,
+        ejection_time: float = 30.0,
+        probe_query: str = "{ __typename }",
+        probe_timeout: float = 2.0,
+        ewma_alpha: float = 0.3,
+    ):
+        """
+        Args:
+            endpoints: urls of the endpoints serving the reads
+            primary (optional): url of the endpoint serving the mutations.
+                Defaults to None (mutations are spread like the reads).
+            policy (optional): "least_outstanding" or "ewma".
+                Defaults to "least_outstanding".
+            failure_threshold (optional): consecutive failures ejecting an
+                endpoint. Defaults to 3.
+            ejection_time (optional): seconds before probing an ejected endpoint.
+                Defaults to 30.
+            probe_query (optional): query probing the ejected endpoints.
+                Defaults to "{ __typename }".
+            probe_timeout (optional): timeout of the probes. Defaults to 2.
+            ewma_alpha (optional): weight of the last latency in the moving
+                average. Defaults to 0.3.
+
+        Raises:
+            ValueError: if there is no endpoint or the policy is unknown
+        """
+        if not endpoints:
+            raise ValueError("EndpointPool needs at least one endpoint")
+        if policy not in (self.LEAST_OUTSTANDING, self.EWMA):
+            raise ValueError(f"Unknown policy {policy!r}")
+        self._endpoints: Dict[str, Endpoint] = {url: Endpoint(url) for url in endpoints}
+        self._readers = list(self._endpoints.values())
+        self._primary: Optional[Endpoint] = None
+        if primary is not None:
+            self._primary = self._endpoints.setdefault(primary, Endpoint(primary))
+        self.policy = policy
+        self.failure_threshold = failure_threshold
+        self.ejection_time = ejection_time
+        self.probe_query = probe_query
+        self.probe_timeout = probe_timeout
+        self.ewma_alpha = ewma_alpha
+        self._logger = logging.getLogger(__name__)
+
+    @property
+    def endpoints(self) -> List[Endpoint]:
+        """all the endpoints, the readers then the primary"""
+        return list(self._endpoints.values())
+
+    @property
+    def primary(self) -> Optional[Endpoint]:
+        """the endpoint of the mutations, None if there is no primary"""
+        return self._primary
+
+    def acquire(self, primary: bool = False) -> Endpoint:
+        """choose the endpoint of a request, which must be released after it"""
+        if primary and self._primary is not None:
+            endpoint = self._primary
+        else:
+            endpoint = self._choose()
+        endpoint.outstanding += 1
+        endpoint.requests += 1
+        return endpoint
+
+    def release(
+        self, endpoint: Endpoint, elapsed: Optional[float] = None, failed: bool = False
+    ) -> None:
+        """record the outcome of a request, without `elapsed` nor `failed` it was
+        cancelled and has no outcome"""
+        endpoint.outstanding -= 1
+        if failed:
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            # penalise the latency so the endpoint is avoided before its ejection
+            self._record_latency(endpoint, max(elapsed or 0, 2 * (endpoint.ewma or 0)))
+            if (
+                not endpoint.ejected
+                and endpoint.consecutive_failures >= self.failure_threshold
+            ):
+                self._eject(endpoint)
+        elif elapsed is not None:
+            endpoint.consecutive_failures = 0
+            self._record_latency(endpoint, elapsed)
+
+    def due_probes(self) -> List[Endpoint]:
+        """the ejected endpoints to probe now, they must be given to
+        `record_probe` after"""
+        now = time.monotonic()
+        due = []
+        for endpoint in self._endpoints.values():
+            if (
+                endpoint.ejected_until is not None
+                and endpoint.ejected_until <= now
+                and not endpoint.probing
+            ):
+                endpoint.probing = True
+                due.append(endpoint)
+        return due
+
+    def record_probe(self, endpoint: Endpoint, healthy: bool) -> None:
+        """result of a health probe of an ejected endpoint, a healthy one is
+        back in the rotation, the others stay ejected for `ejection_time`"""
+        endpoint.probing = False
+        if healthy:
+            self._logger.info(f"Endpoint {endpoint.url} is back")
+            endpoint.ejected_until = None
+            endpoint.consecutive_failures = 0
+            endpoint.ewma = None
+        else:
+            endpoint.ejected_until = time.monotonic() + self.ejection_time
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """stats of each endpoint, by url"""
+        return {url: endpoint.stats() for url, endpoint in self._endpoints.items()}
+
+    def _choose(self) -> Endpoint:
+        candidates = [endpoint for endpoint in self._readers if not endpoint.ejected]
+        if not candidates:
+            # fail open rather than failing every read
+            return min(self._readers, key=lambda endpoint: endpoint.ejected_until)
+        if self.policy == self.EWMA:
+            costs = [
+                (endpoint.ewma or 0.0) * (endpoint.outstanding + 1)
+                for endpoint in candidates
+            ]
+        else:
+            costs = [endpoint.outstanding for endpoint in candidates]
+        lowest = min(costs)
+        return random.choice(
+            [endpoint for endpoint, cost in zip(candidates, costs) if cost == lowest]
+        )
+
+    def _record_latency(self, endpoint: Endpoint, elapsed: float) -> None:
+        if endpoint.ewma is None:
+            endpoint.ewma = elapsed
+        else:
+            endpoint.ewma += self.ewma_alpha * (elapsed - endpoint.ewma)
+
+    def _eject(self, endpoint: Endpoint) -> None:
+        self._logger.warning(
+            f"Ejecting endpoint {endpoint.url} after "
+            f"{endpoint.consecutive_failures} consecutive failures"
+        )
+        endpoint.ejected_until = time.monotonic() + self.ejection_time
+        endpoint.ejections += 1
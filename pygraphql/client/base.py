@@ -1,14 +1,57 @@
 import logging
 import os
-from typing import Any
+import time
+from functools import partial
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
 import httpx
 
 from pygraphql.auth.base import BaseAuth
+from pygraphql.client.balancer import Endpoint, EndpointPool
+from pygraphql.client.cache import BaseCache, cache_key
+from pygraphql.client.codec import JsonCodec, get_codec
+from pygraphql.client.compression import RequestCompression, accept_encoding
+from pygraphql.client.cost import CostScheduler
+from pygraphql.client.document import (
+    CompiledQuery,
+    operation_name,
+    operation_type,
+    query_hash as compute_query_hash,
+)
+from pygraphql.client.instrumentation import ExecutionEvent, Hook, Trace
+from pygraphql.client.latency import LatencyTracker
+from pygraphql.client.ratelimit import RateLimiter
+from pygraphql.client.retry import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryBudget,
+    RetryPolicy,
+)
+from pygraphql.client.stream import StreamingResult
 from pygraphql.client.utils import (
     ExecutionResult,
+    InvalidResponseError,
     RandomExponentialSleep,
+    RawResult,
     RetryError,
+    _aiter_items,
+    create_event,
+    create_semaphore,
+    hedge as hedge_attempts,
+    merge_concurrently,
     sleep,
 )
 
@@ -18,6 +61,53 @@ class BaseClientAsync(httpx.AsyncClient):
     based on httpx.AsyncClient, this class takes all the kwargs
     of AsyncClient in addition to `endpoint` where we define the endpoint.
 
+    persisted queries (APQ) can be enabled with `persisted_queries=True`, the sha256
+    hash of the query is then sent instead of its text once the server knows it
+    (the hashes known by an endpoint are shared by its clients),
+    `persisted_queries_get=True` sends those hashed queries as GET requests so they
+    can be cached by CDNs.
+
+    responses of queries can be cached by giving a cache backend with
+    `cache=MemoryCache()` (see pygraphql.client.cache), concurrent identical
+    queries then share a single request.
+
+    a `rate_limiter=RateLimiter(...)` (see pygraphql.client.ratelimit) can be shared
+    by all the requests of the client to cap their rate and concurrency and to
+    pause them when the server says its rate limit is reached.
+
+    APIs charging points per query (e.g GitHub) can be given a
+    `cost_scheduler=CostScheduler(points=5000)` (see pygraphql.client.cost): each
+    try of `execute` and `execute_raw` reserves the estimated cost of the query
+    and waits for the next window when the points are exhausted.
+
+    only retryable errors are retried, as classified by `retry_policy` (see
+    pygraphql.client.retry.RetryPolicy), a `retry_budget=RetryBudget()` caps the
+    retries of the client as a fraction of its traffic and a
+    `circuit_breaker=CircuitBreaker()` fails fast while the endpoint is down.
+
+    a `latency_tracker=LatencyTracker()` (see pygraphql.client.latency) derives the
+    timeout of each query from its recent latencies, and `hedging=True` sends a
+    duplicate of the queries that didn't answer by their p95 latency, taking
+    whichever response comes first.
+
+    `hooks=[...]` (see pygraphql.client.instrumentation) are called with the events
+    of the executions (request, response, decoded, retry, backoff, success and
+    failure) with their timings and sizes, e.g to export metrics with
+    `MetricsAggregator`.
+
+    payloads are encoded and responses decoded by the json `codec` (see
+    pygraphql.client.codec), e.g `codec="orjson"` or `codec="auto"` to use the
+    fastest json library installed. Defaults to the stdlib json module.
+
+    large request bodies are compressed with `compression=RequestCompression()`
+    (see pygraphql.client.compression), and `accept_encoding=["br", "gzip"]` sets
+    the encodings accepted for the responses in order of preference.
+
+    `endpoint` can be a list of replicas of the endpoint, the requests are then
+    spread over them and the failing ones are ejected, `endpoint_pool=
+    EndpointPool(...)` (see pygraphql.client.balancer) sets the balancing policy
+    and a primary endpoint for the mutations.
+
     example:
         >>> token = "xxx"
         >>> query_str = "..."
@@ -34,6 +124,16 @@ class BaseClientAsync(httpx.AsyncClient):
         """initialise the client, uses exactly same kwargs as httpx.AsyncClient"""
         self._endpoint = kwargs.pop("endpoint", os.getenv("GRAPHQL_ENDPOINT"))
         self._backend = kwargs.pop("backend", None)  # just for test purposes
+
+        # client side load balancing over several endpoints
+        self._endpoint_pool: Optional[EndpointPool] = kwargs.pop("endpoint_pool", None)
+        if self._endpoint_pool is None and isinstance(self._endpoint, (list, tuple)):
+            self._endpoint_pool = EndpointPool(self._endpoint)
+        if self._endpoint_pool is not None:
+            # identifies the endpoint in the cache keys
+            self._endpoint = (
+                self._endpoint_pool.primary or self._endpoint_pool.endpoints[0]
+            ).url
         assert isinstance(self._endpoint, str)
 
         # handle timeout
@@ -41,15 +141,154 @@ class BaseClientAsync(httpx.AsyncClient):
             5.0  # https://www.python-httpx.org/advanced/#timeout-configuration
         )
 
+        # servers answering batched requests with one of these status codes
+        # don't support batching, we fallback to one request per operation
+        self.batching_rejected_status_codes = (404, 405, 415, 501)
+        # a batch answered with one of these status codes may have an invalid
+        # operation, its operations are sent one per request
+        self.batch_failed_status_codes = (400, 422)
+        self._batching_supported = True
+
+        # automatic persisted queries
+        self._persisted_queries = kwargs.pop("persisted_queries", False)
+        self._persisted_queries_get = kwargs.pop("persisted_queries_get", False)
+        self._persisted_hashes = _PERSISTED_HASHES.setdefault(self._endpoint, set())
+
+        # response cache
+        self._cache: Optional[BaseCache] = kwargs.pop("cache", None)
+        self._in_flight: Dict[str, _InFlight] = {}
+
+        self._rate_limiter: Optional[RateLimiter] = kwargs.pop("rate_limiter", None)
+        self._cost_scheduler: Optional[CostScheduler] = kwargs.pop(
+            "cost_scheduler", None
+        )
+
+        # retries
+        self._retry_policy: RetryPolicy = kwargs.pop("retry_policy", None) or (
+            RetryPolicy()
+        )
+        self._retry_budget: Optional[RetryBudget] = kwargs.pop("retry_budget", None)
+        self._circuit_breaker: Optional[CircuitBreaker] = kwargs.pop(
+            "circuit_breaker", None
+        )
+
+        # latency percentiles, adaptive timeouts and hedged queries
+        self._hedging = kwargs.pop("hedging", False)
+        self._latency_tracker: Optional[LatencyTracker] = kwargs.pop(
+            "latency_tracker", None
+        )
+        if self._hedging and self._latency_tracker is None:
+            self._latency_tracker = LatencyTracker()
+
+        self._codec: JsonCodec = get_codec(kwargs.pop("codec", None))
+
+        # compression
+        compression = kwargs.pop("compression", None)
+        if isinstance(compression, str):
+            compression = RequestCompression(compression)
+        self._compression: Optional[RequestCompression] = compression
+        encodings = kwargs.pop("accept_encoding", None)
+        if encodings is not None:
+            kwargs["headers"] = {**(kwargs.get("headers") or {})}
+            kwargs["headers"].update(accept_encoding(encodings))
+
+        # instrumentation, the hot path only checks if the list is empty
+        self._hooks: List[Hook] = list(kwargs.pop("hooks", None) or [])
+
         if "auth" not in kwargs:
             kwargs["auth"] = BaseAuth()
 
         super().__init__(**kwargs)
         self._logger = logging.getLogger(__name__)
 
+    @property
+    def backend(self) -> Any:
+        """the async backend forced on the client, None if not forced"""
+        return self._backend
+
+    @property
+    def endpoint(self) -> str:
+        """the url of the graphql endpoint, the primary one of an endpoint pool"""
+        return self._endpoint
+
+    @property
+    def endpoint_pool(self) -> Optional[EndpointPool]:
+        """the endpoints the requests are spread over, None if a single one"""
+        return self._endpoint_pool
+
+    @property
+    def rate_limiter(self) -> Optional[RateLimiter]:
+        """the rate limiter of the client, None if disabled"""
+        return self._rate_limiter
+
+    @property
+    def cost_scheduler(self) -> Optional[CostScheduler]:
+        """the points budget of the client, None if disabled"""
+        return self._cost_scheduler
+
+    @property
+    def retry_budget(self) -> Optional[RetryBudget]:
+        """the retry budget of the client, None if disabled"""
+        return self._retry_budget
+
+    @property
+    def circuit_breaker(self) -> Optional[CircuitBreaker]:
+        """the circuit breaker of the client, None if disabled"""
+        return self._circuit_breaker
+
+    @property
+    def latency_tracker(self) -> Optional[LatencyTracker]:
+        """the latency tracker of the client, None if disabled"""
+        return self._latency_tracker
+
+    @property
+    def codec(self) -> JsonCodec:
+        """the json codec of the client"""
+        return self._codec
+
+    @property
+    def compression(self) -> Optional[RequestCompression]:
+        """the request compression of the client, None if disabled"""
+        return self._compression
+
+    @property
+    def hooks(self) -> List[Hook]:
+        """the hooks called with the events of the executions"""
+        return self._hooks
+
+    def add_hook(self, hook: Hook) -> None:
+        """register a hook called with every ExecutionEvent of the client"""
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: Hook) -> None:
+        """unregister a hook added with `add_hook`
+
+        Raises:
+            ValueError: if the hook isn't registered
+        """
+        self._hooks.remove(hook)
+
+    @property
+    def cache(self) -> Optional[BaseCache]:
+        """the response cache of the client, None if disabled"""
+        return self._cache
+
+    async def send(self, request: httpx.Request, **kwargs: Any) -> httpx.Response:
+        """send a request, waiting for the rate limiter if any"""
+        if self._rate_limiter is None:
+            return await super().send(request, **kwargs)
+
+        await self._rate_limiter.acquire()
+        try:
+            response = await super().send(request, **kwargs)
+        finally:
+            self._rate_limiter.release()
+        self._rate_limiter.update(response)
+        return response
+
     async def execute(
         self,
-        query: str,
+        query: Union[str, CompiledQuery],
         variables: dict,
         max_tries: int = 5,
         random_exponential_sleep_multiplier: float = 1,
@@ -57,11 +296,16 @@ class BaseClientAsync(httpx.AsyncClient):
         random_exponential_sleep_exp_base: float = 2,
         random_exponential_sleep_min_sleep: float = 0,
         exc_info: bool = False,
+        query_hash: Optional[str] = None,
+        cache_ttl: Optional[float] = None,
+        use_cache: bool = True,
+        hedge: Optional[bool] = None,
     ) -> ExecutionResult:
         """Function to execute  graphql query asynchronously
 
         Args:
-            query: a query in str format or as a DocumentNode
+            query: a query in str format or as a CompiledQuery, the variables of
+                a CompiledQuery are validated before sending it
             variables: variables dict containing variables of the query,
                 or empty if no variables
             max_tries (optional): max number of retries in case of errors.
@@ -72,17 +316,131 @@ class BaseClientAsync(httpx.AsyncClient):
             random_exponential_sleep_min_sleep (optional): Defaults to 0.
             exc_info (optional): wether to log exec info in case of exception.
                     Defaults to False.
+            query_hash (optional): precomputed sha256 hash of the query, used by
+                    persisted queries. Defaults to None (computed if needed).
+            cache_ttl (optional): time to live in seconds of the cached response.
+                    Defaults to None (the default ttl of the cache).
+            use_cache (optional): wether to use the response cache, mutations never
+                    use it. Defaults to True.
+            hedge (optional): wether to send a duplicate request when the query
+                    is slower than its p95 latency, mutations are never hedged.
+                    Defaults to None (the `hedging` setting of the client).
 
         Raises:
             RetryError: if there is still an error after retrying
+            VariablesError: if the variables of a CompiledQuery are not valid
 
         Returns:
             ExecutionResult: result of the query
         """
+        compiled = None
+        if isinstance(query, CompiledQuery):
+            compiled = query
+            compiled.validate(variables)
+            query = compiled.text
+            query_hash = query_hash or compiled.hash
+        assert isinstance(query, str)
 
-        retries_count = 0
+        sleeper = RandomExponentialSleep(
+            multiplier=random_exponential_sleep_multiplier,
+            max_sleep=random_exponential_sleep_max_sleep,
+            exp_base=random_exponential_sleep_exp_base,
+            min_sleep=random_exponential_sleep_min_sleep,
+        )
 
-        assert isinstance(query, str)
+        if self._persisted_queries or self._latency_tracker is not None:
+            query_hash = query_hash or compute_query_hash(query)
+        if self._persisted_queries:
+            send = partial(
+                self._send_persisted_query, query, variables, query_hash, compiled
+            )
+        elif compiled is not None:
+            send = partial(self._send_compiled_query, compiled, variables)
+        else:
+            send = partial(self._send_query, query, variables)
+
+        execute = self._retrying(
+            send,
+            query,
+            variables,
+            compiled,
+            query_hash,
+            hedge,
+            max_tries,
+            sleeper,
+            exc_info,
+        )
+        if self._cache is not None and use_cache and _is_query(query, compiled):
+            return await self._execute_cached(
+                cache_key(self._endpoint, query, variables, self.auth),
+                cache_ttl,
+                execute,
+            )
+        return await execute()
+
+    async def execute_raw(
+        self,
+        query: Union[str, CompiledQuery],
+        variables: dict,
+        max_tries: int = 5,
+        random_exponential_sleep_multiplier: float = 1,
+        random_exponential_sleep_max_sleep: float = 300,
+        random_exponential_sleep_exp_base: float = 2,
+        random_exponential_sleep_min_sleep: float = 0,
+        exc_info: bool = False,
+        hedge: Optional[bool] = None,
+    ) -> RawResult:
+        """execute a query and return the body of the response without decoding
+        it, e.g to forward it as is from a gateway.
+
+        the body is only checked cheaply: it must look like a json object, be as
+        long as its Content-Length, and the presence of `errors` is looked up in
+        the bytes, the body is only decoded when it may have errors (or looks
+        truncated) to confirm it. a body without Content-Length (chunked or
+        compressed) truncated right after an inner `}` is not detected. the
+        execution is retried like `execute`, the response cache and persisted
+        queries are not used.
+
+            >>> raw = await client.execute_raw(query, variables)
+            >>> if not raw.has_errors:
+            >>>     return Response(raw.content, media_type="application/json")
+
+        Args:
+            query: a query in str format or as a CompiledQuery, the variables of
+                a CompiledQuery are validated before sending it
+            variables: variables dict containing variables of the query,
+                or empty if no variables
+            max_tries (optional): max number of retries in case of errors.
+                        Defaults to 5.
+            random_exponential_sleep_multiplier (optional): Defaults to 1
+            random_exponential_sleep_max_sleep (optional):Defaults to 300
+            random_exponential_sleep_exp_base (optional): Defaults to 2.
+            random_exponential_sleep_min_sleep (optional): Defaults to 0.
+            exc_info (optional): wether to log exec info in case of exception.
+                    Defaults to False.
+            hedge (optional): wether to send a duplicate request when the query
+                    is slower than its p95 latency, mutations are never hedged.
+                    Defaults to None (the `hedging` setting of the client).
+
+        Raises:
+            RetryError: if there is still an error after retrying
+            VariablesError: if the variables of a CompiledQuery are not valid
+
+        Returns:
+            RawResult: body, status and headers of the response
+        """
+        query_hash = None
+        if isinstance(query, CompiledQuery):
+            query.validate(variables)
+            compiled: Optional[CompiledQuery] = query
+            content = query.encode(variables, self._codec.dumps)
+            query_hash = query.hash
+            query = query.text
+        else:
+            compiled = None
+            content = self._codec.dumps({"query": query, "variables": variables})
+        if self._latency_tracker is not None:
+            query_hash = query_hash or compute_query_hash(query)
 
         sleeper = RandomExponentialSleep(
             multiplier=random_exponential_sleep_multiplier,
@@ -90,59 +448,921 @@ class BaseClientAsync(httpx.AsyncClient):
             exp_base=random_exponential_sleep_exp_base,
             min_sleep=random_exponential_sleep_min_sleep,
         )
+        execute = self._retrying(
+            partial(self._send_raw, content),
+            query,
+            variables,
+            compiled,
+            query_hash,
+            hedge,
+            max_tries,
+            sleeper,
+            exc_info,
+        )
+        return await execute()
+
+    async def execute_all(
+        self,
+        query: Union[str, CompiledQuery],
+        variables: Union[Iterable[dict], AsyncIterable[dict]],
+        max_concurrency: int = 10,
+        ordered: bool = True,
+        return_exceptions: bool = True,
+        **kwargs: Any,
+    ) -> AsyncIterator[Tuple[dict, Any]]:
+        """execute a query with each set of variables of a sync or async
+        iterable, at most `max_concurrency` at a time.
+
+        the variables are consumed lazily, and the results are yielded in the
+        order of the variables, or as soon as they are received with
+        `ordered=False`. with `ordered=True` at most `2 * max_concurrency`
+        executions are in flight or waiting for an earlier one, so memory stays
+        bounded.
+
+        an execution that fails doesn't cancel the others, its exception is
+        yielded instead of its result, unless `return_exceptions=False`.
+
+            >>> async for variables, result in client.execute_all(query, variables):
+            >>>     if isinstance(result, Exception):
+            >>>         ...
+
+        Args:
+            query: a query in str format or as a CompiledQuery, compiled once
+            variables: sync or async iterable of variables dicts
+            max_concurrency (optional): max executions at the same time.
+                Defaults to 10.
+            ordered (optional): wether to yield the results in the order of the
+                variables. Defaults to True.
+            return_exceptions (optional): wether to yield the exceptions of the
+                executions that failed instead of raising them. Defaults to True.
+            **kwargs: kwargs of `execute` (max_tries, ...)
+
+        Raises:
+            DocumentSyntaxError: if the query is not valid
+
+        Yields:
+            Tuple[dict, Any]: the variables and their ExecutionResult or exception
+        """
+        if not isinstance(query, CompiledQuery):
+            query = CompiledQuery(query)
+        window = create_semaphore(2 * max_concurrency, self._backend)
+
+        async def items():
+            iterator = _aiter_items(variables)
+            index = 0
+            while True:
+                # wait for a slot before pulling the next variables
+                if ordered:
+                    await window.acquire()
+                try:
+                    item = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+                yield index, item
+                index += 1
+
+        async def execute(item, send):
+            index, item_variables = item
+            try:
+                result = await self.execute(query, item_variables, **kwargs)
+            except Exception as error:  # pylint: disable=broad-except
+                if not return_exceptions:
+                    raise
+                result = error
+            await send((index, item_variables, result))
+
+        buffered: Dict[int, Tuple[dict, Any]] = {}
+        next_index = 0
+        async for index, item_variables, result in merge_concurrently(
+            execute, items(), max_concurrency, backend=self._backend
+        ):
+            if not ordered:
+                yield item_variables, result
+                continue
+            buffered[index] = (item_variables, result)
+            while next_index in buffered:
+                window.release()
+                yield buffered.pop(next_index)
+                next_index += 1
+
+    def _retrying(
+        self,
+        send: Callable[[Dict[str, Any]], Awaitable[Any]],
+        query: str,
+        variables: dict,
+        compiled: Optional[CompiledQuery],
+        query_hash: Optional[str],
+        hedge: Optional[bool],
+        max_tries: int,
+        sleeper: RandomExponentialSleep,
+        exc_info: bool,
+    ) -> Callable[[], Awaitable[Any]]:
+        """wrap `send` with the cost scheduler, the endpoint pool, the latency
+        tracker and the retries, returns the coroutine function executing it"""
+        if self._cost_scheduler is not None:
+            cost = self._cost_scheduler.estimate(compiled or query, variables)
+            send = partial(self._send_budgeted, send, cost)
+        if self._endpoint_pool is not None and not _is_query(query, compiled):
+            send = partial(self._send_primary, send)
         timeout = None
+        if self._latency_tracker is not None:
+            hedged = self._hedging if hedge is None else hedge
+            hedged = hedged and _is_query(query, compiled)
+            send = partial(self._send_timed, send, query_hash, hedged)
+            timeout = self._latency_tracker.timeout(query_hash)  # type: ignore
+
+        operation = None
+        if self._hooks:
+            operation = compiled.operation_name if compiled else operation_name(query)
+        return partial(
+            self._retry, send, max_tries, sleeper, exc_info, timeout, operation
+        )
+
+    def execute_stream(
+        self,
+        query: str,
+        variables: dict,
+        path: str,
+        max_tries: int = 5,
+        random_exponential_sleep_multiplier: float = 1,
+        random_exponential_sleep_max_sleep: float = 300,
+        random_exponential_sleep_exp_base: float = 2,
+        random_exponential_sleep_min_sleep: float = 0,
+        exc_info: bool = False,
+    ) -> StreamingResult:
+        """Function to execute a graphql query and stream the items of a list of
+        its result while the response is received, the body is decoded
+        incrementally so memory stays bounded whatever the size of the response.
+
+        example:
+            >>> result = client.execute_stream(
+                    query, variables, path="repository.issues.edges.item"
+                )
+            >>> async for edge in result:
+                    ...
+            >>> result.errors
+
+        errors before the response headers are received are retried, the
+        response can't be retried once items have been yielded.
+
+        Args:
+            query: a query in str format
+            variables: variables dict containing variables of the query,
+                or empty if no variables
+            path: dot separated path in the result data of the items to stream,
+                `item` standing for the elements of a list.
+            max_tries (optional): max number of retries in case of errors.
+                        Defaults to 5.
+            random_exponential_sleep_multiplier (optional): Defaults to 1
+            random_exponential_sleep_max_sleep (optional):Defaults to 300
+            random_exponential_sleep_exp_base (optional): Defaults to 2.
+            random_exponential_sleep_min_sleep (optional): Defaults to 0.
+            exc_info (optional): wether to log exec info in case of exception.
+                    Defaults to False.
+
+        Returns:
+            StreamingResult: async iterator of the items, with the errors of the
+                response in `errors`
+        """
+        assert isinstance(query, str)
+
+        sleeper = RandomExponentialSleep(
+            multiplier=random_exponential_sleep_multiplier,
+            max_sleep=random_exponential_sleep_max_sleep,
+            exp_base=random_exponential_sleep_exp_base,
+            min_sleep=random_exponential_sleep_min_sleep,
+        )
+        send = partial(self._open_stream, query, variables)
+        operation = operation_name(query) if self._hooks else None
+        return StreamingResult(
+            partial(self._retry, send, max_tries, sleeper, exc_info, None, operation),
+            path,
+        )
+
+    async def execute_many(
+        self,
+        operations: List[Tuple[str, dict]],
+        max_batch_size: int = 10,
+        max_batch_bytes: Optional[int] = None,
+        max_tries: int = 5,
+        random_exponential_sleep_multiplier: float = 1,
+        random_exponential_sleep_max_sleep: float = 300,
+        random_exponential_sleep_exp_base: float = 2,
+        random_exponential_sleep_min_sleep: float = 0,
+        exc_info: bool = False,
+    ) -> List[ExecutionResult]:
+        """Function to execute many graphql queries with as few http requests as
+        possible, operations are packed in array-batched requests
+        (`[{"query": ..., "variables": ...}, ...]`) as supported by Apollo server
+        and Hasura.
+
+        If the server rejects batching (see `batching_rejected_status_codes`) or
+        answers with a non batched response, the operations are executed one per
+        request, concurrently, and batching is disabled for the rest of the client
+        life. A batch failing with one of `batch_failed_status_codes` (e.g an
+        invalid operation) is executed one operation per request the same way,
+        batching stays enabled.
+
+        Args:
+            operations: list of (query, variables) tuples
+            max_batch_size (optional): max number of operations per request.
+                        Defaults to 10.
+            max_batch_bytes (optional): max size in bytes of the json payload of
+                        a request, a single operation bigger than this is sent alone.
+                        Defaults to None (no limit).
+            max_tries (optional): max number of retries in case of errors.
+                        Defaults to 5.
+            random_exponential_sleep_multiplier (optional): Defaults to 1
+            random_exponential_sleep_max_sleep (optional):Defaults to 300
+            random_exponential_sleep_exp_base (optional): Defaults to 2.
+            random_exponential_sleep_min_sleep (optional): Defaults to 0.
+            exc_info (optional): wether to log exec info in case of exception.
+                    Defaults to False.
+
+        Raises:
+            RetryError: if there is still an error after retrying
+
+        Returns:
+            List[ExecutionResult]: results of the queries, in the same order as
+                the operations
+        """
+        assert max_batch_size > 0
+        exec_kwargs: Dict[str, Any] = {
+            "max_tries": max_tries,
+            "random_exponential_sleep_multiplier": random_exponential_sleep_multiplier,
+            "random_exponential_sleep_max_sleep": random_exponential_sleep_max_sleep,
+            "random_exponential_sleep_exp_base": random_exponential_sleep_exp_base,
+            "random_exponential_sleep_min_sleep": random_exponential_sleep_min_sleep,
+            "exc_info": exc_info,
+        }
+        sleeper = RandomExponentialSleep(
+            multiplier=random_exponential_sleep_multiplier,
+            max_sleep=random_exponential_sleep_max_sleep,
+            exp_base=random_exponential_sleep_exp_base,
+            min_sleep=random_exponential_sleep_min_sleep,
+        )
+
+        results: List[ExecutionResult] = []
+        batches = _pack_batches(
+            operations, max_batch_size, max_batch_bytes, self._codec.dumps
+        )
+        for batch in batches:
+            batch_results = None
+            if self._batching_supported and len(batch) > 1:
+                send = partial(self._send_batch, batch)
+                if self._endpoint_pool is not None and any(
+                    operation_type(query) != "query" for query, _ in batch
+                ):
+                    send = partial(self._send_primary, send)
+                batch_results = await self._retry(send, max_tries, sleeper, exc_info)
+            if batch_results is None:
+                batch_results = await self._execute_each(batch, exec_kwargs)
+            results.extend(batch_results)
+        return results
+
+    async def _execute_each(
+        self, operations: List[Tuple[str, dict]], exec_kwargs: Dict[str, Any]
+    ) -> List[ExecutionResult]:
+        """execute the operations concurrently, one per request"""
+        results: List[Any] = [None] * len(operations)
+
+        async def execute(item, _send):
+            index, (query, variables) = item
+            results[index] = await self.execute(query, variables, **exec_kwargs)
+
+        async for _ in merge_concurrently(
+            execute, enumerate(operations), len(operations), backend=self._backend
+        ):
+            pass
+        return results
+
+    async def _execute_cached(
+        self,
+        key: str,
+        cache_ttl: Optional[float],
+        execute: Callable[[], Awaitable[ExecutionResult]],
+    ) -> ExecutionResult:
+        """serve the result from the cache, or share the in flight request of an
+        identical execution, or execute it and cache its result if it has no
+        errors"""
+        assert self._cache is not None
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self._cache.stats.coalesced += 1
+            await in_flight.event.wait()
+            if in_flight.error is not None:
+                raise in_flight.error
+            if in_flight.result is not None:
+                return in_flight.result
+            # the leader was cancelled, execute it ourselves
+            return await self._execute_cached(key, cache_ttl, execute)
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            return ExecutionResult(**cached)
+
+        in_flight = _InFlight(create_event(self._backend))
+        self._in_flight[key] = in_flight
+        try:
+            result = await execute()
+            if not result.errors:
+                self._cache.set(key, result.formatted, cache_ttl)
+            in_flight.result = result
+            return result
+        except Exception as error:
+            in_flight.error = error
+            raise
+        finally:
+            del self._in_flight[key]
+            in_flight.event.set()
+
+    async def _send_timed(
+        self,
+        send: Callable[[Dict[str, Any]], Awaitable[Any]],
+        key: str,
+        hedged: bool,
+        kwargs: Dict[str, Any],
+    ) -> Any:
+        """send recording the latency of the response in the latency tracker,
+        and hedge it if `hedged`"""
+        tracker = self._latency_tracker
+        assert tracker is not None
+
+        async def attempt() -> Any:
+            start = time.monotonic()
+            try:
+                result = await send(kwargs)
+            except (httpx.ReadTimeout, httpx.WriteTimeout):
+                # remember slow responses, not only the successful ones
+                tracker.record(key, time.monotonic() - start)
+                raise
+            tracker.record(key, time.monotonic() - start)
+            return result
+
+        delay = tracker.hedge_delay(key) if hedged else None
+        if delay is None:
+            return await attempt()
+        return await hedge_attempts(
+            attempt, delay, can_hedge=self._can_hedge, backend=self._backend
+        )
+
+    def _can_hedge(self) -> bool:
+        """a duplicate request takes a retry from the budget, if any"""
+        if self._retry_budget is not None and not self._retry_budget.acquire_retry():
+            return False
+        assert self._latency_tracker is not None
+        self._latency_tracker.hedged += 1
+        return True
+
+    async def _request(
+        self, method: str, kwargs: Dict[str, Any], **request_kwargs: Any
+    ) -> httpx.Response:
+        """send a request to the endpoint, `kwargs` are the kwargs of the try
+        (the timeout and the trace of the execution if hooks are registered),
+        a `json` payload is encoded with the codec of the client and compressed
+        if compression is enabled"""
+        if "json" in request_kwargs:
+            request_kwargs["content"] = self._codec.dumps(request_kwargs.pop("json"))
+            request_kwargs["headers"] = _JSON_HEADERS
+        compressed_kwargs = self._compress(request_kwargs)
+        if compressed_kwargs is None:
+            return await self._send_request(method, kwargs, request_kwargs)
+
+        response = await self._send_request(method, kwargs, compressed_kwargs)
+        if response.status_code != 415:
+            return response
+        self._logger.warning("Compressed requests not supported by the server")
+        self._compression.enabled = False  # type: ignore
+        return await self._send_request(method, kwargs, request_kwargs)
+
+    def _compress(self, request_kwargs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """the request kwargs with a compressed content, None if not compressed"""
+        content = request_kwargs.get("content")
+        if self._compression is None or not isinstance(content, bytes):
+            return None
+        compressed = self._compression.compress(content)
+        if compressed is None:
+            return None
+        headers = {
+            **(request_kwargs.get("headers") or {}),
+            "Content-Encoding": self._compression.encoding,
+        }
+        return {**request_kwargs, "content": compressed, "headers": headers}
+
+    async def _send_request(
+        self, method: str, kwargs: Dict[str, Any], request_kwargs: Dict[str, Any]
+    ) -> httpx.Response:
+        if self._endpoint_pool is None:
+            return await self._send_request_to(
+                self._endpoint, method, kwargs, request_kwargs
+            )
+        primary = kwargs.get("primary", False)
+        kwargs = {key: value for key, value in kwargs.items() if key != "primary"}
+        return await self._send_balanced(
+            partial(
+                self._send_request_to,
+                method=method,
+                kwargs=kwargs,
+                request_kwargs=request_kwargs,
+            ),
+            primary,
+        )
+
+    async def _send_request_to(
+        self,
+        url: str,
+        method: str,
+        kwargs: Dict[str, Any],
+        request_kwargs: Dict[str, Any],
+    ) -> httpx.Response:
+        trace: Optional[Trace] = kwargs.get("trace")
+        if trace is None:
+            return await self.request(method, url, **request_kwargs, **kwargs)
+
+        kwargs = {key: value for key, value in kwargs.items() if key != "trace"}
+        request = self.build_request(method, url, **request_kwargs)
+        start = time.perf_counter()
+        response = await self.send(request, stream=True, **kwargs)
+        headers_time = time.perf_counter() - start
+        try:
+            await response.aread()
+        finally:
+            await response.aclose()
+        trace.emit(
+            ExecutionEvent.RESPONSE,
+            status_code=response.status_code,
+            request_bytes=len(request.read()),
+            response_bytes=len(response.content),
+            headers_time=headers_time,
+            transfer_time=time.perf_counter() - start - headers_time,
+        )
+        return response
+
+    async def _send_balanced(
+        self, send: Callable[[str], Awaitable[httpx.Response]], primary: bool
+    ) -> httpx.Response:
+        """send a request to an endpoint of the pool, recording its outcome, the
+        ejected endpoints due for a probe are probed first"""
+        pool = self._endpoint_pool
+        assert pool is not None
+        for endpoint in pool.due_probes():
+            await self._probe(endpoint)
+
+        endpoint = pool.acquire(primary)
+        start = time.monotonic()
+        try:
+            response = await send(endpoint.url)
+        except httpx.TransportError:
+            pool.release(endpoint, time.monotonic() - start, failed=True)
+            raise
+        except httpx.HTTPStatusError as error:  # raised by the streams
+            failed = error.response.status_code >= 500
+            pool.release(endpoint, time.monotonic() - start, failed=failed)
+            raise
+        except BaseException:
+            pool.release(endpoint)
+            raise
+        pool.release(
+            endpoint, time.monotonic() - start, failed=response.status_code >= 500
+        )
+        return response
+
+    async def _probe(self, endpoint: Endpoint) -> None:
+        """check if an ejected endpoint answers again"""
+        pool = self._endpoint_pool
+        assert pool is not None
+        healthy = False
+        try:
+            response = await self.request(
+                "POST",
+                endpoint.url,
+                content=self._codec.dumps({"query": pool.probe_query}),
+                headers=_JSON_HEADERS,
+                timeout=pool.probe_timeout,
+            )
+            healthy = response.status_code < 500
+        except httpx.TransportError as error:
+            self._logger.debug(f"Probe of {endpoint.url} failed: {error}")
+        finally:
+            pool.record_probe(endpoint, healthy)
+
+    async def _send_primary(
+        self, send: Callable[[Dict[str, Any]], Awaitable[Any]], kwargs: Dict[str, Any]
+    ) -> Any:
+        """send a mutation to the primary endpoint of the pool"""
+        return await send({**kwargs, "primary": True})
+
+    def _decode(self, response: httpx.Response, kwargs: Dict[str, Any]) -> Any:
+        """decode the json body of a response with the codec of the client, timed
+        if the try is traced"""
+        trace: Optional[Trace] = kwargs.get("trace")
+        if trace is None:
+            return self._codec.loads(response.content)
+        start = time.perf_counter()
+        result = self._codec.loads(response.content)
+        trace.emit(ExecutionEvent.DECODED, decode_time=time.perf_counter() - start)
+        return result
+
+    async def _send_query(
+        self, query: str, variables: dict, kwargs: Dict[str, Any]
+    ) -> ExecutionResult:
+        payload = {"query": query, "variables": variables}
+        request = await self._request("POST", kwargs, json=payload)
+        request.raise_for_status()
+        return _to_execution_result(self._decode(request, kwargs))
+
+    async def _send_compiled_query(
+        self, compiled: CompiledQuery, variables: dict, kwargs: Dict[str, Any]
+    ) -> ExecutionResult:
+        """send a query with its pre-encoded payload"""
+        request = await self._request(
+            "POST",
+            kwargs,
+            content=compiled.encode(variables, self._codec.dumps),
+            headers=_JSON_HEADERS,
+        )
+        request.raise_for_status()
+        return _to_execution_result(self._decode(request, kwargs))
+
+    async def _send_budgeted(
+        self,
+        send: Callable[[Dict[str, Any]], Awaitable[Any]],
+        cost: int,
+        kwargs: Dict[str, Any],
+    ) -> Any:
+        """send once `cost` points are available, reconciling the budget with the
+        rate limit data of the result"""
+        scheduler = self._cost_scheduler
+        assert scheduler is not None
+        await scheduler.acquire(cost)
+        data = None
+        try:
+            result = await send(kwargs)
+            if isinstance(result, ExecutionResult):
+                data = result.data
+            return result
+        finally:
+            scheduler.reconcile(cost, data)
+
+    async def _send_raw(self, content: bytes, kwargs: Dict[str, Any]) -> RawResult:
+        """send a pre-encoded payload and check the response body cheaply"""
+        response = await self._request(
+            "POST", kwargs, content=content, headers=_JSON_HEADERS
+        )
+        response.raise_for_status()
+        body = response.content
+        has_errors = b'"errors"' in body
+        stripped = body.strip()
+        if (
+            has_errors
+            or stripped[:1] != b"{"
+            or stripped[-1:] != b"}"
+            or _is_truncated(response)
+        ):
+            # `errors` may be a field of the data, and a truncated body must be
+            # retried: decode it to be sure
+            result = _to_execution_result(self._decode(response, kwargs))
+            has_errors = bool(result.errors)
+        return RawResult(body, response.status_code, response.headers, has_errors)
+
+    async def _open_stream(
+        self, query: str, variables: dict, kwargs: Dict[str, Any]
+    ) -> httpx.Response:
+        if self._endpoint_pool is None:
+            return await self._open_stream_to(self._endpoint, query, variables, kwargs)
+        return await self._send_balanced(
+            partial(
+                self._open_stream_to, query=query, variables=variables, kwargs=kwargs
+            ),
+            False,
+        )
+
+    async def _open_stream_to(
+        self, url: str, query: str, variables: dict, kwargs: Dict[str, Any]
+    ) -> httpx.Response:
+        payload = {"query": query, "variables": variables}
+        trace: Optional[Trace] = kwargs.get("trace")
+        kwargs = {key: value for key, value in kwargs.items() if key != "trace"}
+        request_kwargs = {
+            "content": self._codec.dumps(payload),
+            "headers": _JSON_HEADERS,
+        }
+        request = self.build_request(
+            "POST",
+            url,
+            **(self._compress(request_kwargs) or request_kwargs),
+        )
+        start = time.perf_counter()
+        response = await self.send(request, stream=True, **kwargs)
+        if trace is not None:
+            trace.emit(
+                ExecutionEvent.RESPONSE,
+                status_code=response.status_code,
+                request_bytes=len(request.read()),
+                headers_time=time.perf_counter() - start,
+            )
+        if response.is_error:
+            await response.aclose()
+            response.raise_for_status()
+        return response
+
+    async def _send_persisted_query(
+        self,
+        query: str,
+        variables: dict,
+        query_hash: str,
+        compiled: Optional[CompiledQuery],
+        kwargs: Dict[str, Any],
+    ) -> ExecutionResult:
+        """send the hash of the query if the server already accepted it, else send
+        the full query along with its hash to register it"""
+        if not self._persisted_queries:  # disabled since by the server
+            return await self._send_query(query, variables, kwargs)
+
+        extensions = {"persistedQuery": {"version": 1, "sha256Hash": query_hash}}
+        if query_hash in self._persisted_hashes:
+            use_get = self._persisted_queries_get
+            if use_get and _operation_type(query, compiled) != "mutation":
+                params = {
+                    "variables": self._codec.dumps(variables).decode("utf-8"),
+                    "extensions": self._codec.dumps(extensions).decode("utf-8"),
+                }
+                request = await self._request("GET", kwargs, params=params)
+            else:
+                persisted = {"variables": variables, "extensions": extensions}
+                request = await self._request("POST", kwargs, json=persisted)
+            error = _persisted_query_error(request, self._codec)
+            if error is None:
+                request.raise_for_status()
+                return _to_execution_result(self._decode(request, kwargs))
+            self._persisted_hashes.discard(query_hash)
+            if error == "PERSISTED_QUERY_NOT_SUPPORTED":
+                self._disable_persisted_queries()
+                return await self._send_query(query, variables, kwargs)
+
+        payload = {"query": query, "variables": variables, "extensions": extensions}
+        request = await self._request("POST", kwargs, json=payload)
+        error = _persisted_query_error(request, self._codec)
+        if error == "PERSISTED_QUERY_NOT_SUPPORTED":
+            self._disable_persisted_queries()
+            return await self._send_query(query, variables, kwargs)
+        request.raise_for_status()
+        result = _to_execution_result(self._decode(request, kwargs))
+        self._persisted_hashes.add(query_hash)
+        return result
+
+    def _disable_persisted_queries(self) -> None:
+        self._logger.warning("Persisted queries not supported by the server")
+        self._persisted_queries = False
+        self._persisted_hashes.clear()
+
+    async def _send_batch(
+        self, batch: List[Tuple[str, dict]], kwargs: Dict[str, Any]
+    ) -> Optional[List[ExecutionResult]]:
+        """send operations in a single array-batched request,
+        returns None if the server doesn't support batching"""
+        payload = [
+            {"query": query, "variables": variables} for query, variables in batch
+        ]
+        request = await self._request("POST", kwargs, json=payload)
+        if request.status_code in self.batching_rejected_status_codes:
+            self._logger.warning(
+                "Batching rejected with status {}, falling back to one request per \
+                operation".format(request.status_code)
+            )
+            self._batching_supported = False
+            return None
+        if request.status_code in self.batch_failed_status_codes:
+            self._logger.warning(
+                "Batch failed with status {}, sending its operations one per \
+                request".format(request.status_code)
+            )
+            return None
+        request.raise_for_status()
+        result = self._decode(request, kwargs)
+        if not isinstance(result, list) or len(result) != len(payload):
+            self._logger.warning(
+                "Received non-batched response, falling back to one request per \
+                operation"
+            )
+            self._batching_supported = False
+            return None
+        return [_to_execution_result(item) for item in result]
+
+    async def _retry(
+        self,
+        send: Callable[[Dict[str, Any]], Awaitable[Any]],
+        max_tries: int,
+        sleeper: RandomExponentialSleep,
+        exc_info: bool,
+        timeout: Optional[float] = None,
+        operation: Optional[str] = None,
+    ) -> Any:
+        """call `send` until it succeeds, growing the timeout on read/write
+        timeouts and sleeping between the other failures.
+
+        `send` takes the kwargs of the try: the timeout forwarded to the httpx
+        request and the trace emitting the events of the execution if hooks are
+        registered. `timeout` is the timeout of the first try, None for the client
+        default, and `operation` the operation name given to the hooks.
+        """
+        retries_count = 0
         last_exception = None
+        breaker = self._circuit_breaker
+        trace = Trace(self._hooks, operation) if self._hooks else None
+        if self._retry_budget is not None:
+            self._retry_budget.record_request()
         while retries_count < max_tries:
+            if (
+                retries_count
+                and self._retry_budget is not None
+                and not self._retry_budget.acquire_retry()
+            ):
+                self._logger.warning(
+                    "Retry budget exhausted, giving up after {} tries".format(
+                        retries_count
+                    )
+                )
+                break
+            if breaker is not None:
+                try:
+                    breaker.before_call(retries_count)
+                except CircuitOpenError as error:
+                    if trace is not None:
+                        trace.emit(ExecutionEvent.FAILURE, error=error)
+                    raise
             try:
-                payload = {"query": query, "variables": variables}
                 kwargs: Any = {}
                 if timeout:
                     kwargs["timeout"] = timeout
+                if trace is not None:
+                    trace.attempt = retries_count + 1
+                    trace.emit(ExecutionEvent.REQUEST)
+                    kwargs["trace"] = trace
                 self._logger.debug("Start Exuction")
-                request = await self.post(self._endpoint, json=payload, **kwargs)
-                request.raise_for_status()
-                result = request.json()
-                assert (
-                    "errors" in result or "data" in result
-                ), 'Received non-compatible response "{}"'.format(result)
-                self._logger.debug("Success Exuction")
-                return ExecutionResult(
-                    errors=result.get("errors"), data=result.get("data")
-                )
-            except httpx.ReadTimeout as error:
+                result = await send(kwargs)
+            except Exception as error:  # pylint: disable=broad-except
                 retries_count += 1
                 last_exception = error  # type: ignore
-                old_timeout = timeout if timeout else self.default_timeout
-                timeout = old_timeout * 1.5
-                self._logger.warning(
-                    "Execution failed with a 'ReadTimeoutError', Retrying for the {} \
-                     time with a new timeout of {:0.2f}s (last_old={:0.2f}s)".format(
-                        retries_count, timeout, old_timeout
+                retryable = self._retry_policy.is_retryable(error)
+                if trace is not None and retryable:
+                    trace.emit(ExecutionEvent.RETRY, error=error)
+                if breaker is not None:
+                    # only errors of the endpoint count as failures
+                    if retryable:
+                        breaker.record_failure(error)
+                    else:
+                        breaker.record_success()
+                if not retryable:
+                    self._logger.warning(
+                        "Execution failed with non retryable exception '{}'".format(
+                            error
+                        ),
+                        exc_info=exc_info,
                     )
-                )
-            except httpx.WriteTimeout as error:
-                retries_count += 1
-                last_exception = error  # type: ignore
-                old_timeout = timeout if timeout else self.default_timeout
-                timeout = old_timeout * 1.5
-                self._logger.warning(
-                    "Execution failed with a 'WriteTimeoutError', Retrying for the {} time \
-                    with a new timeout of {:0.2f}s (last_old={:0.2f}s)".format(
-                        retries_count, timeout, old_timeout
+                    break
+                if isinstance(error, (httpx.ReadTimeout, httpx.WriteTimeout)):
+                    old_timeout = timeout if timeout else self.default_timeout
+                    timeout = old_timeout * 1.5
+                    self._logger.warning(
+                        "Execution failed with a '{}Error', Retrying for the {} time "
+                        "with a new timeout of {:0.2f}s (last_old={:0.2f}s)".format(
+                            type(error).__name__, retries_count, timeout, old_timeout
+                        )
                     )
-                )
-            except Exception as error:  # pylint: disable=broad-except
-                retries_count += 1
-                sleep_time = sleeper(retries_count)
-                last_exception = error  # type: ignore
+                    continue
 
+                sleep_time = sleeper(retries_count)
+                if (
+                    self._rate_limiter is not None
+                    and self._rate_limiter.pause_remaining
+                ):
+                    # the rate limiter already pauses the requests of all the tasks
+                    # until the server rate limit window resets
+                    sleep_time = 0
                 self._logger.warning(
                     "Execution failed with exception '{}'. Retrying for the {} time \
-                    after {:0.2f} seconds...".format(
-                        error, retries_count, sleep_time
-                    ),
+                    after {:0.2f} seconds...".format(error, retries_count, sleep_time),
                     exc_info=exc_info,
                 )
+                if trace is not None:
+                    trace.emit(ExecutionEvent.BACKOFF, sleep=sleep_time)
                 await sleep(sleep_time, backend=self._backend)
+            except BaseException:
+                if breaker is not None:
+                    breaker.record_cancelled()
+                raise
+            else:
+                if breaker is not None:
+                    breaker.record_success()
+                if trace is not None:
+                    trace.emit(ExecutionEvent.SUCCESS)
+                self._logger.debug("Success Exuction")
+                return result
 
+        if trace is not None:
+            trace.emit(ExecutionEvent.FAILURE, error=last_exception)
         raise RetryError(retries_count, last_exception)
+
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# hashes of the persisted queries accepted by each endpoint, shared by its clients
+_PERSISTED_HASHES: Dict[str, Set[str]] = {}
+
+
+def _operation_type(query: str, compiled: Optional[CompiledQuery]) -> str:
+    """the type of the operation, only tokenized without CompiledQuery"""
+    if compiled is not None:
+        return compiled.operation_type
+    return operation_type(query)
+
+
+def _is_query(query: str, compiled: Optional[CompiledQuery]) -> bool:
+    """wether the operation is a query, i.e not a mutation nor a subscription,
+    only tokenized when a feature depends on it"""
+    return _operation_type(query, compiled) == "query"
+
+
+class _InFlight:
+    """an execution in flight, shared by identical concurrent executions"""
+
+    __slots__ = "event", "result", "error"
+
+    def __init__(self, event: Any):
+        self.event = event
+        self.result: Optional[ExecutionResult] = None
+        self.error: Optional[Exception] = None
+
+
+def _persisted_query_error(request: httpx.Response, codec: JsonCodec) -> Optional[str]:
+    """find a persisted query error code in a response, if any"""
+    try:
+        errors = codec.loads(request.content).get("errors") or []
+    except Exception:  # pylint: disable=broad-except
+        return None
+    for error in errors if isinstance(errors, list) else []:
+        if not isinstance(error, dict):
+            continue
+        code = (error.get("extensions") or {}).get("code")
+        message = error.get("message")
+        if code == "PERSISTED_QUERY_NOT_FOUND" or message == "PersistedQueryNotFound":
+            return "PERSISTED_QUERY_NOT_FOUND"
+        if (
+            code == "PERSISTED_QUERY_NOT_SUPPORTED"
+            or message == "PersistedQueryNotSupported"
+        ):
+            return "PERSISTED_QUERY_NOT_SUPPORTED"
+    return None
+
+
+def _is_truncated(response: httpx.Response) -> bool:
+    """wether the body is shorter than its Content-Length, unknown for the
+    compressed responses"""
+    length = response.headers.get("content-length")
+    encoding = response.headers.get("content-encoding", "identity")
+    if length is None or encoding != "identity":
+        return False
+    try:
+        return len(response.content) < int(length)
+    except ValueError:
+        return False
+
+
+def _to_execution_result(result: Any) -> ExecutionResult:
+    if not isinstance(result, dict) or (
+        "errors" not in result and "data" not in result
+    ):
+        raise InvalidResponseError(
+            'Received non-compatible response "{}"'.format(result)
+        )
+    return ExecutionResult(errors=result.get("errors"), data=result.get("data"))
+
+
+def _pack_batches(
+    operations: List[Tuple[str, dict]],
+    max_batch_size: int,
+    max_batch_bytes: Optional[int],
+    dumps: Callable[[Any], bytes],
+) -> List[List[Tuple[str, dict]]]:
+    """split operations in batches of at most `max_batch_size` operations and
+    `max_batch_bytes` bytes, as encoded by `dumps`"""
+    batches: List[List[Tuple[str, dict]]] = []
+    batch: List[Tuple[str, dict]] = []
+    batch_bytes = 2  # the enclosing []
+    for operation in operations:
+        size = 0
+        if max_batch_bytes is not None:
+            query, variables = operation
+            size = len(dumps({"query": query, "variables": variables}))
+        if batch and (
+            len(batch) >= max_batch_size
+            or (max_batch_bytes is not None and batch_bytes + size > max_batch_bytes)
+        ):
+            batches.append(batch)
+            batch, batch_bytes = [], 2
+        batch.append(operation)
+        batch_bytes += size + 1  # the separating comma
+    if batch:
+        batches.append(batch)
+    return batches
@@ -0,0 +1,194 @@
+import abc
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import httpx
+
+from pygraphql.client.document import tokenize
+
+
+class CacheStats:
+    """counters of a cache, to help tuning it"""
+
+    __slots__ = "hits", "misses", "coalesced", "evictions"
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __repr__(self) -> str:
+        name = self.__class__.__name__
+        return (
+            f"{name}(hits={self.hits}, misses={self.misses}, "
+            f"coalesced={self.coalesced}, evictions={self.evictions})"
+        )
+
+    @property
+    def hit_ratio(self) -> float:
+        """ratio of lookups served from the cache (including coalesced ones)"""
+        total = self.hits + self.coalesced + self.misses
+        return (self.hits + self.coalesced) / total if total else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        """the counters and the hit ratio, e.g to export them as metrics"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_ratio": self.hit_ratio,
+        }
+
+
+class BaseCache(abc.ABC):
+    """Base interface of a response cache used by BaseClientAsync,
+    values are formatted execution results (`{"data": ..., "errors": ...}`)
+    and must be treated as read-only.
+
+    to create your own backend, subclass it and implement `_get`, `_set` and
+    `clear`.
+    """
+
+    def __init__(self, default_ttl: float = 60):
+        """
+        Args:
+            default_ttl (optional): time to live of the entries in seconds when
+                none is given on `set`. Defaults to 60.
+        """
+        self.default_ttl = default_ttl
+        self.stats = CacheStats()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """get a value from the cache, None if missing or expired"""
+        value = self._get(key)
+        if value is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+    def set(self, key: str, value: Dict[str, Any], ttl: Optional[float] = None):
+        """set a value in the cache for `ttl` seconds (`default_ttl` if None)"""
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl > 0:
+            self._set(key, value, ttl)
+
+    @abc.abstractmethod
+    def clear(self) -> None:
+        """remove all the entries of the cache"""
+
+    @abc.abstractmethod
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        """the value of a key, None if missing or expired"""
+
+    @abc.abstractmethod
+    def _set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        """store a value for `ttl` seconds"""
+
+
+class MemoryCache(BaseCache):
+    """in memory cache, evicting the least recently used entries once it holds
+    more than `max_size` entries"""
+
+    def __init__(self, max_size: int = 1024, default_ttl: float = 60):
+        """
+        Args:
+            max_size (optional): max number of entries. Defaults to 1024.
+            default_ttl (optional): Defaults to 60 seconds.
+        """
+        super().__init__(default_ttl=default_ttl)
+        assert max_size > 0
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+
+class DiskCache(BaseCache):
+    """on disk cache, one json file per entry in `directory`, shared between
+    processes and surviving restarts"""
+
+    def __init__(self, directory: str, default_ttl: float = 60):
+        """
+        Args:
+            directory: directory where to store the entries, created if needed
+            default_ttl (optional): Defaults to 60 seconds.
+        """
+        super().__init__(default_ttl=default_ttl)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def clear(self) -> None:
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                os.remove(os.path.join(self.directory, name))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            with open(path) as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if entry["expires_at"] <= time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry["value"]
+
+    def _set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump({"expires_at": time.time() + ttl, "value": value}, file)
+        os.replace(tmp_path, path)  # atomic, readers never see partial entries
+
+
+def cache_key(
+    endpoint: str, query: str, variables: Dict[str, Any], auth: Optional[httpx.Auth]
+) -> str:
+    """build the cache key of an execution from the endpoint, the normalized
+    query, the canonicalized variables and the identity of the auth"""
+    normalized_query = " ".join(value for _, value in tokenize(query))
+    canonical_variables = json.dumps(variables, sort_keys=True, separators=(",", ":"))
+    if auth is None:
+        identity = "anonymous"
+    else:
+        identity = getattr(auth, "identity", None) or "{}:{}".format(
+            type(auth).__name__, id(auth)
+        )
+    key = "\n".join((endpoint, normalized_query, canonical_variables, identity))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
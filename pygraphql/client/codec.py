@@ -0,0 +1,108 @@
+import json
+from typing import Any, Dict, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+class JsonCodec:
+    """Encode the payloads of the requests and decode the bodies of the
+    responses, the stdlib json module by default.
+
+    to use another json library, subclass it and implement `dumps` and `loads`.
+    decoding errors must be raised as `json.JSONDecodeError` so they are
+    classified as retryable (see pygraphql.client.retry.RetryPolicy).
+    """
+
+    name = "json"
+
+    def dumps(self, value: Any) -> bytes:
+        """encode a value to json bytes"""
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, content: Union[bytes, str]) -> Any:
+        """decode json bytes or text"""
+        return json.loads(content)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}()"
+
+
+class OrjsonCodec(JsonCodec):
+    """codec using orjson, several times faster than the stdlib for both encoding
+    and decoding"""
+
+    name = "orjson"
+
+    def __init__(self) -> None:
+        if orjson is None:
+            raise ImportError("orjson is not installed")
+
+    def dumps(self, value: Any) -> bytes:
+        return orjson.dumps(value)
+
+    def loads(self, content: Union[bytes, str]) -> Any:
+        # orjson.JSONDecodeError is a subclass of json.JSONDecodeError
+        return orjson.loads(content)
+
+
+class UjsonCodec(JsonCodec):
+    """codec using ujson"""
+
+    name = "ujson"
+
+    def __init__(self) -> None:
+        if ujson is None:
+            raise ImportError("ujson is not installed")
+
+    def dumps(self, value: Any) -> bytes:
+        return ujson.dumps(value, ensure_ascii=False).encode("utf-8")
+
+    def loads(self, content: Union[bytes, str]) -> Any:
+        try:
+            return ujson.loads(content)
+        except ValueError as error:
+            if isinstance(content, bytes):
+                content = content.decode("utf-8", errors="replace")
+            raise json.JSONDecodeError(str(error), content, 0) from error
+
+
+CODECS: Dict[str, type] = {
+    "json": JsonCodec,
+    "orjson": OrjsonCodec,
+    "ujson": UjsonCodec,
+}
+
+
+def get_codec(codec: Optional[Union[str, JsonCodec]] = None) -> JsonCodec:
+    """get a codec by name
+
+    Args:
+        codec (optional): a codec, or the name of a codec: "json", "orjson",
+            "ujson" or "auto" for the fastest one installed.
+            Defaults to None (the stdlib json).
+
+    Raises:
+        ValueError: if the name is unknown
+        ImportError: if the json library of the codec is not installed
+    """
+    if isinstance(codec, JsonCodec):
+        return codec
+    if codec is None:
+        return JsonCodec()
+    if codec == "auto":
+        if orjson is not None:
+            return OrjsonCodec()
+        if ujson is not None:
+            return UjsonCodec()
+        return JsonCodec()
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec {codec!r}, use one of {list(CODECS)}")
+    return CODECS[codec]()
@@ -0,0 +1,118 @@
+import gzip
+from typing import Dict, Optional, Sequence, Union
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# encodings of the responses httpx can decode, br needs brotli
+_RESPONSE_ENCODINGS = ("identity", "gzip", "deflate") + (
+    ("br",) if brotli is not None else ()
+)
+
+
+class RequestCompression:
+    """Compress the bodies of the requests bigger than `min_size` bytes and send
+    them with a `Content-Encoding` header, to cut the upload time of large
+    payloads (e.g bulk mutations with big `variables`).
+
+    - gzip is always available, br needs `brotli` and zstd needs `zstandard`.
+    - if the server answers 415 (Unsupported Media Type) to a compressed
+      request, the request is sent again uncompressed and compression is
+      disabled for the rest of the client life.
+
+    example:
+        >>> compression = RequestCompression("gzip", min_size=1024)
+        >>> async with BaseClientAsync(endpoint=endpoint, compression=compression):
+                ...
+    """
+
+    def __init__(
+        self,
+        encoding: str = "gzip",
+        min_size: int = 1024,
+        level: Optional[int] = None,
+    ):
+        """
+        Args:
+            encoding (optional): one of "gzip", "br" or "zstd". Defaults to "gzip".
+            min_size (optional): smaller bodies are sent as is. Defaults to 1024.
+            level (optional): compression level, trading speed for size.
+                Defaults to None (6 for gzip, 5 for br, 3 for zstd).
+
+        Raises:
+            ValueError: if the encoding is unknown
+            ImportError: if the library of the encoding is not installed
+        """
+        if encoding not in ("gzip", "br", "zstd"):
+            raise ValueError(f"Unknown encoding {encoding!r}")
+        if encoding == "br" and brotli is None:
+            raise ImportError("brotli is not installed")
+        if encoding == "zstd" and zstandard is None:
+            raise ImportError("zstandard is not installed")
+        self.encoding = encoding
+        self.min_size = min_size
+        self.level = level
+        self.enabled = True
+        self.compressed_bytes = 0  # size of the bodies before compression
+        self.sent_bytes = 0  # and after
+
+    def compress(self, content: bytes) -> Optional[bytes]:
+        """compress a body, None if it should be sent as is"""
+        if not self.enabled or len(content) < self.min_size:
+            return None
+        if self.encoding == "gzip":
+            level = 6 if self.level is None else self.level
+            compressed = gzip.compress(content, compresslevel=level)
+        elif self.encoding == "br":
+            level = 5 if self.level is None else self.level
+            compressed = brotli.compress(content, quality=level)
+        else:
+            level = 3 if self.level is None else self.level
+            compressed = zstandard.ZstdCompressor(level=level).compress(content)
+        self.compressed_bytes += len(content)
+        self.sent_bytes += len(compressed)
+        return compressed
+
+    @property
+    def ratio(self) -> float:
+        """compressed size over original size of the compressed bodies"""
+        return self.sent_bytes / self.compressed_bytes if self.compressed_bytes else 1.0
+
+
+def accept_encoding(encodings: Union[str, Sequence[str]]) -> Dict[str, str]:
+    """build the `Accept-Encoding` header of the encodings accepted for the
+    responses, in order of preference
+
+    Args:
+        encodings: encodings, e.g ["br", "gzip"] or "br, gzip"
+
+    Raises:
+        ValueError: if httpx can't decode one of the encodings
+
+    Returns:
+        Dict[str, str]: the header
+    """
+    if isinstance(encodings, str):
+        encodings = [item.strip() for item in encodings.split(",") if item.strip()]
+    for encoding in encodings:
+        name = encoding.split(";")[0].strip()
+        if name not in _RESPONSE_ENCODINGS and name != "*":
+            raise ValueError(
+                f"Responses encoded with {name!r} can't be decoded, use some of "
+                f"{sorted(_RESPONSE_ENCODINGS)}"
+            )
+    # decreasing quality values to express the preference order
+    values = []
+    for index, encoding in enumerate(encodings):
+        if ";" in encoding or index == 0:
+            values.append(encoding)
+        else:
+            values.append(f"{encoding};q={max(0.1, 1 - index / 10):.1f}")
+    return {"Accept-Encoding": ", ".join(values)}
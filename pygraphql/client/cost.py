@@ -0,0 +1,259 @@
+import datetime
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from pygraphql.client.document import (
+    _MISSING,
+    CompiledQuery,
+    Definition,
+    Field,
+    FragmentSpread,
+    Variable,
+)
+from pygraphql.client.utils import sleep
+
+
+class CostEstimator:
+    """Static cost of a query, computed from the page sizes of its connections.
+
+    by default it's the cost of GitHub's GraphQL API: a connection is a field
+    with a `first` or `last` argument, it needs as many requests as the product
+    of the page sizes of the connections it is nested in, and the cost is the
+    sum of the requests of all the connections divided by 100, rounded, at least
+    1. e.g `repository { issues(first: 100) { nodes { labels(first: 10) } } }`
+    needs 1 + 100 requests, for a cost of 1.
+
+    the page sizes are read in the arguments, from the variables or their
+    default values, `default_page_size` is used when they are not set.
+
+    example:
+        >>> estimator = CostEstimator()
+        >>> estimator.estimate(query, {"first": 50})
+        1
+    """
+
+    def __init__(
+        self,
+        page_arguments: Sequence[str] = ("first", "last"),
+        divisor: float = 100,
+        minimum: int = 1,
+        default_page_size: int = 100,
+    ):
+        """
+        Args:
+            page_arguments (optional): arguments setting the page size of a
+                connection. Defaults to ("first", "last").
+            divisor (optional): requests per point. Defaults to 100.
+            minimum (optional): min cost of a query. Defaults to 1.
+            default_page_size (optional): page size of the connections without
+                page size. Defaults to 100.
+        """
+        self.page_arguments = page_arguments
+        self.divisor = divisor
+        self.minimum = minimum
+        self.default_page_size = default_page_size
+        self._compiled: Dict[str, CompiledQuery] = {}
+
+    def requests(
+        self, query: Union[str, CompiledQuery], variables: Dict[str, Any]
+    ) -> int:
+        """number of requests needed by the connections of the query"""
+        if not isinstance(query, CompiledQuery):
+            compiled = self._compiled.get(query)
+            if compiled is None:
+                if len(self._compiled) >= 1000:
+                    self._compiled.clear()
+                compiled = self._compiled[query] = CompiledQuery(query)
+            query = compiled
+        defaults = {
+            name: definition.default
+            for name, definition in query.variables.items()
+            if definition.default is not _MISSING
+        }
+        return self._requests(
+            query.operation.selections,
+            1,
+            {**defaults, **variables},
+            query.document.fragments,
+        )
+
+    def estimate(
+        self, query: Union[str, CompiledQuery], variables: Dict[str, Any]
+    ) -> int:
+        """cost of the query in points
+
+        Args:
+            query: a query in str format or as a CompiledQuery
+            variables: the variables of the query
+
+        Raises:
+            DocumentSyntaxError: if the query is not valid
+
+        Returns:
+            int: the estimated cost
+        """
+        requests = self.requests(query, variables)
+        return max(self.minimum, int(requests / self.divisor + 0.5))
+
+    def _requests(
+        self,
+        selections: List[Any],
+        multiplier: int,
+        variables: Dict[str, Any],
+        fragments: Dict[str, Definition],
+    ) -> int:
+        requests = 0
+        for selection in selections:
+            if isinstance(selection, FragmentSpread):
+                fragment = fragments.get(selection.name)
+                if fragment is not None:
+                    requests += self._requests(
+                        fragment.selections, multiplier, variables, fragments
+                    )
+                continue
+            nested = multiplier
+            if isinstance(selection, Field):
+                page_size = self._page_size(selection, variables)
+                if page_size is not None:
+                    requests += multiplier
+                    nested = multiplier * page_size
+            requests += self._requests(
+                selection.selections, nested, variables, fragments
+            )
+        return requests
+
+    def _page_size(self, field: Field, variables: Dict[str, Any]) -> Optional[int]:
+        """page size of a connection, None if the field isn't a connection"""
+        found = False
+        for name in self.page_arguments:
+            if name not in field.arguments:
+                continue
+            found = True
+            value = field.arguments[name]
+            if isinstance(value, Variable):
+                value = variables.get(value.name)
+            if isinstance(value, int) and not isinstance(value, bool):
+                return value
+        return self.default_page_size if found else None
+
+
+class CostScheduler:
+    """Admit executions against a budget of points per window, e.g the 5000
+    points per hour of GitHub's GraphQL API, so a job runs at the max
+    throughput of its quota instead of exhausting it and backing off.
+
+    each execution reserves its estimated cost (see CostEstimator) before being
+    sent, and waits for the next window when the budget is exhausted. when the
+    query selects the rate limit of the API at the top level
+    (`rateLimit { cost remaining resetAt }`), the budget is reconciled with it:
+    the remaining points and the reset time are the ones of the server.
+
+    example:
+        >>> scheduler = CostScheduler(points=5000, window=3600)
+        >>> async with BaseClientAsync(endpoint=endpoint,
+                cost_scheduler=scheduler) as client:
+                ...
+        >>> scheduler.stats()
+    """
+
+    def __init__(
+        self,
+        points: int,
+        window: float = 3600.0,
+        estimator: Optional[CostEstimator] = None,
+        rate_limit_field: str = "rateLimit",
+        backend=None,
+    ):
+        """
+        Args:
+            points: points available per window
+            window (optional): seconds before the budget resets. Defaults to 3600.
+            estimator (optional): Defaults to None (CostEstimator()).
+            rate_limit_field (optional): top level field of the rate limit in the
+                results. Defaults to "rateLimit".
+            backend (optional): force backend to use asyncio even if trio is
+                installed. Defaults to None.
+        """
+        assert points > 0
+        self.points = points
+        self.window = window
+        self.estimator = estimator or CostEstimator()
+        self.rate_limit_field = rate_limit_field
+        self._backend = backend
+        self.remaining = points
+        self.reset_at = time.monotonic() + window
+        self.in_flight = 0  # points reserved by the executions in flight
+        self.estimated = 0  # points reserved
+        self.charged = 0  # points charged according to the server
+        self.throttled = 0  # executions that waited for the next window
+        self._logger = logging.getLogger(__name__)
+
+    def estimate(
+        self, query: Union[str, CompiledQuery], variables: Dict[str, Any]
+    ) -> int:
+        """estimated cost of an execution, see CostEstimator.estimate"""
+        return self.estimator.estimate(query, variables)
+
+    async def acquire(self, cost: int) -> None:
+        """reserve `cost` points, waiting for the next window if needed"""
+        waited = False
+        while True:
+            now = time.monotonic()
+            if now >= self.reset_at:
+                self.remaining = self.points
+                self.reset_at = now + self.window
+            # an execution costing more than a window is let through alone
+            if self.remaining >= cost or self.remaining == self.points:
+                break
+            if not waited:
+                self._logger.warning(
+                    f"Cost budget exhausted ({self.remaining} points left), "
+                    f"waiting {self.reset_at - now:0.0f}s for the next window"
+                )
+                waited = True
+            await sleep(self.reset_at - now, backend=self._backend)
+        if waited:
+            self.throttled += 1
+        self.remaining -= cost
+        self.in_flight += cost
+        self.estimated += cost
+
+    def reconcile(self, cost: int, data: Any = None) -> None:
+        """end of an execution which reserved `cost` points, with the data of its
+        result if any"""
+        self.in_flight -= cost
+        rate_limit = data.get(self.rate_limit_field) if isinstance(data, dict) else None
+        if not isinstance(rate_limit, dict):
+            return
+        if isinstance(rate_limit.get("cost"), int):
+            self.charged += rate_limit["cost"]
+        if isinstance(rate_limit.get("remaining"), int):
+            # the reservations of the other executions are not counted yet
+            self.remaining = rate_limit["remaining"] - self.in_flight
+        reset_in = _seconds_until(rate_limit.get("resetAt"))
+        if reset_in is not None:
+            self.reset_at = time.monotonic() + max(0.0, reset_in)
+
+    def stats(self) -> Dict[str, Any]:
+        """the budget left in the current window and the counters of points"""
+        return {
+            "remaining": self.remaining,
+            "reset_in": max(0.0, self.reset_at - time.monotonic()),
+            "in_flight": self.in_flight,
+            "estimated": self.estimated,
+            "charged": self.charged,
+            "throttled": self.throttled,
+        }
+
+
+def _seconds_until(value: Any) -> Optional[float]:
+    """seconds until an ISO 8601 UTC datetime, e.g "2021-01-01T00:00:00Z" """
+    if not isinstance(value, str):
+        return None
+    try:
+        reset = datetime.datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ")
+    except ValueError:
+        return None
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return (reset.replace(tzinfo=datetime.timezone.utc) - now).total_seconds()
@@ -0,0 +1,629 @@
+import hashlib
+import json
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<ignored>[\s,\ufeff]+|\#[^\n\r]*)
+    | (?P<block_string>\"\"\"(?:\\\"\"\"|[^"]|"(?!""))*\"\"\")
+    | (?P<string>"(?:[^"\\\n\r]|\\.)*")
+    | (?P<spread>\.\.\.)
+    | (?P<name>[_A-Za-z][_0-9A-Za-z]*)
+    | (?P<number>-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?)
+    | (?P<punctuator>[!$&()\:=@\[\]{|}])
+    """,
+    re.VERBOSE,
+)
+
+OPERATION_TYPES = ("query", "mutation", "subscription")
+
+
+class DocumentSyntaxError(ValueError):
+    """Custom exception thrown when a graphql document can't be tokenized"""
+
+
+def tokenize(source: str) -> Iterator[Tuple[str, str]]:
+    """split a graphql document in (kind, value) tokens,
+    ignoring whitespaces, commas and comments
+
+    Args:
+        source: the graphql document
+
+    Raises:
+        DocumentSyntaxError: on unexpected characters
+
+    Yields:
+        (kind, value) tuples, kind is one of "block_string", "string", "spread",
+        "name", "number" or "punctuator"
+    """
+    position = 0
+    length = len(source)
+    while position < length:
+        match = _TOKEN_RE.match(source, position)
+        if match is None:
+            raise DocumentSyntaxError(
+                "Unexpected character {!r} at position {}".format(
+                    source[position], position
+                )
+            )
+        position = match.end()
+        kind = match.lastgroup
+        if kind != "ignored":
+            yield kind, match.group()  # type: ignore
+
+
+def query_hash(query: str) -> str:
+    """sha256 hex digest of a query, as used by automatic persisted queries"""
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+def operation_type(query: str) -> str:
+    """find the type of the first operation of a graphql document
+
+    Args:
+        query: the graphql document
+
+    Returns:
+        str: one of "query", "mutation" or "subscription"
+    """
+    depth = 0
+    in_fragment = False
+    for kind, value in tokenize(query):
+        if kind != "punctuator" and kind != "name":
+            continue
+        if value == "{":
+            if depth == 0 and not in_fragment:
+                return "query"  # query shorthand or named query
+            depth += 1
+        elif value == "}":
+            depth -= 1
+            if depth == 0:
+                in_fragment = False
+        elif depth == 0 and kind == "name":
+            if value in OPERATION_TYPES:
+                return value
+            if value == "fragment":
+                in_fragment = True
+    return "query"
+
+
+def operation_name(query: str) -> Optional[str]:
+    """find the name of the first operation of a graphql document
+
+    Args:
+        query: the graphql document
+
+    Returns:
+        Optional[str]: the name of the operation, None if anonymous
+    """
+    depth = 0
+    in_fragment = False
+    after_type = False
+    for kind, value in tokenize(query):
+        if kind != "punctuator" and kind != "name":
+            continue
+        if after_type:
+            return value if kind == "name" else None
+        if value == "{":
+            if depth == 0 and not in_fragment:
+                return None  # query shorthand
+            depth += 1
+        elif value == "}":
+            depth -= 1
+            if depth == 0:
+                in_fragment = False
+        elif depth == 0 and kind == "name":
+            if value in OPERATION_TYPES:
+                after_type = True
+            elif value == "fragment":
+                in_fragment = True
+    return None
+
+
+class Variable:
+    """reference to a variable (`$name`) in an argument value"""
+
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f"Variable({self.name!r})"
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, Variable) and other.name == self.name
+
+
+class VariableDefinition:
+    """`$name: Type = default` in the header of an operation"""
+
+    __slots__ = "name", "type", "default", "start", "end"
+
+    def __init__(self, name: str, type_: str, default: Any, start: int, end: int):
+        self.name = name
+        self.type = type_
+        self.default = default
+        self.start = start
+        self.end = end
+
+    @property
+    def required(self) -> bool:
+        """non-null variables without default value must be provided"""
+        return self.type.endswith("!") and self.default is _MISSING
+
+
+class Field:
+    """a field of a selection set, `alias: name(arguments) @directives { ... }`"""
+
+    __slots__ = "alias", "name", "arguments", "selections", "start", "name_index", "end"
+
+    def __init__(
+        self,
+        alias: Optional[str],
+        name: str,
+        arguments: Dict[str, Any],
+        selections: List[Any],
+        start: int,
+        name_index: int,
+        end: int,
+    ):
+        self.alias = alias
+        self.name = name
+        self.arguments = arguments
+        self.selections = selections
+        self.start = start
+        self.name_index = name_index
+        self.end = end
+
+    @property
+    def response_key(self) -> str:
+        """key of the field in the response data"""
+        return self.alias or self.name
+
+
+class FragmentSpread:
+    """`...Name` in a selection set"""
+
+    __slots__ = "name", "start", "end"
+
+    def __init__(self, name: str, start: int, end: int):
+        self.name = name
+        self.start = start
+        self.end = end
+
+
+class InlineFragment:
+    """`... on Type { ... }` in a selection set"""
+
+    __slots__ = "type_condition", "selections", "start", "end"
+
+    def __init__(
+        self, type_condition: Optional[str], selections: List[Any], start: int, end: int
+    ):
+        self.type_condition = type_condition
+        self.selections = selections
+        self.start = start
+        self.end = end
+
+
+class Definition:
+    """an operation or a fragment definition of a document, `start` and `end`
+    are indexes in the tokens of the document"""
+
+    __slots__ = (
+        "kind",
+        "name",
+        "variables",
+        "type_condition",
+        "selections",
+        "start",
+        "end",
+    )
+
+    def __init__(
+        self,
+        kind: str,
+        name: Optional[str],
+        variables: List[VariableDefinition],
+        type_condition: Optional[str],
+        selections: List[Any],
+        start: int,
+        end: int,
+    ):
+        self.kind = kind  # query, mutation, subscription or fragment
+        self.name = name
+        self.variables = variables
+        self.type_condition = type_condition
+        self.selections = selections
+        self.start = start
+        self.end = end
+
+
+class Document:
+    """a parsed graphql document, keeps its tokens to allow rewriting it"""
+
+    def __init__(self, tokens: List[Tuple[str, str]], definitions: List[Definition]):
+        self.tokens = tokens
+        self.definitions = definitions
+
+    @property
+    def operations(self) -> List[Definition]:
+        """the operations of the document, in order"""
+        return [item for item in self.definitions if item.kind != "fragment"]
+
+    @property
+    def fragments(self) -> Dict[str, Definition]:
+        """the fragments of the document by name"""
+        return {
+            item.name: item  # type: ignore
+            for item in self.definitions
+            if item.kind == "fragment"
+        }
+
+
+def parse(source: str) -> Document:
+    """parse a graphql executable document (operations and fragments)
+
+    Args:
+        source: the graphql document
+
+    Raises:
+        DocumentSyntaxError: if the document is not valid
+
+    Returns:
+        Document: the parsed document
+    """
+    parser = _Parser(list(tokenize(source)))
+    return Document(parser.tokens, parser.parse_document())
+
+
+def print_tokens(tokens: Iterable[Tuple[str, str]]) -> str:
+    """print tokens back to a graphql document with as few spaces as possible"""
+    parts: List[str] = []
+    previous_is_word = False
+    for kind, value in tokens:
+        is_word = kind in ("name", "number")
+        if previous_is_word and is_word:
+            parts.append(" ")
+        parts.append(value)
+        previous_is_word = is_word
+    return "".join(parts)
+
+
+def minify(query: str) -> str:
+    """strip comments and insignificant whitespaces and commas of a document"""
+    return print_tokens(tokenize(query))
+
+
+class VariablesError(ValueError):
+    """Custom exception thrown when variables don't match the declarations of
+    an operation"""
+
+
+class CompiledQuery:
+    """A query compiled once to be executed many times.
+
+    the document is parsed and minified (comments and insignificant whitespaces
+    stripped), its operation name, type and variable declarations are extracted
+    and the json payload up to the variables is pre-encoded, so only the
+    variables are serialized on each execution.
+
+    example:
+        >>> get_user = CompiledQuery(
+                "query GetUser($id: ID!) { user(id: $id) { name } }"
+            )
+        >>> get_user.validate({"id": 1})
+        >>> await client.execute(get_user, {"id": 1})
+    """
+
+    def __init__(
+        self, query: str, operation_name: Optional[str] = None, strict: bool = False
+    ):
+        """
+        Args:
+            query: the graphql document
+            operation_name (optional): operation to execute if the document has
+                many. Defaults to None (the first one).
+            strict (optional): reject the variables not declared by the
+                operation, they are sent and ignored by the server otherwise.
+                Defaults to False.
+
+        Raises:
+            DocumentSyntaxError: if the document is not valid
+        """
+        document = parse(query)
+        operations = document.operations
+        if not operations:
+            raise DocumentSyntaxError("Document without operation")
+        operation = operations[0]
+        if operation_name is not None:
+            named = [item for item in operations if item.name == operation_name]
+            if not named:
+                raise ValueError(f"Unknown operation {operation_name!r}")
+            operation = named[0]
+
+        self.source = query
+        self.strict = strict
+        self.document = document
+        self.operation = operation
+        self.text = print_tokens(document.tokens)
+        self.hash = query_hash(self.text)
+        self.operation_name = operation.name
+        self.operation_type = operation.kind
+        self.variables: Dict[str, VariableDefinition] = {
+            definition.name: definition for definition in operation.variables
+        }
+        self._required = [
+            name for name, definition in self.variables.items() if definition.required
+        ]
+
+        prefix = '{"query":' + json.dumps(self.text)
+        if len(operations) > 1:
+            prefix += ',"operationName":' + json.dumps(self.operation_name)
+        self._prefix = (prefix + ',"variables":').encode("utf-8")
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __repr__(self) -> str:
+        return f"CompiledQuery({self.text!r})"
+
+    def validate(self, variables: Dict[str, Any]) -> None:
+        """check the variables against the declarations of the operation:
+        missing variables, nulls and built-in scalar types (custom scalars, enums
+        and input objects are left to the server), and unknown variables if the
+        query is `strict`
+
+        Raises:
+            VariablesError: if the variables are not valid
+        """
+        errors = []
+        for name in self._required:
+            if name not in variables:
+                errors.append(f"missing variable ${name}")
+        for name, value in variables.items():
+            definition = self.variables.get(name)
+            if definition is None:
+                if self.strict:
+                    errors.append(f"unknown variable ${name}")
+                continue
+            error = _check_value(value, definition.type, f"${name}")
+            if error is not None:
+                errors.append(error)
+        if errors:
+            raise VariablesError(", ".join(errors))
+
+    def encode(
+        self,
+        variables: Dict[str, Any],
+        dumps: Optional[Callable[[Any], bytes]] = None,
+    ) -> bytes:
+        """the json payload of an execution with `variables`
+
+        Args:
+            variables: variables of the execution
+            dumps (optional): function encoding the variables to json bytes.
+                Defaults to None (stdlib json).
+        """
+        if dumps is None:
+            encoded = json.dumps(variables, separators=(",", ":")).encode("utf-8")
+        else:
+            encoded = dumps(variables)
+        return self._prefix + encoded + b"}"
+
+
+def _is_valid_scalar(value: Any, type_: str) -> bool:
+    """wether `value` is valid for a built-in scalar, other types are accepted"""
+    if isinstance(value, bool):
+        return type_ not in ("Int", "Float", "String", "ID")
+    if type_ == "Int":
+        # integral floats are coerced, e.g 1.0
+        return _is_integral(value) and -(2**31) <= value < 2**31
+    if type_ == "Float":
+        return isinstance(value, (int, float))
+    if type_ == "String":
+        return isinstance(value, str)
+    if type_ == "Boolean":
+        return False
+    if type_ == "ID":
+        return isinstance(value, str) or _is_integral(value)
+    return True
+
+
+def _is_integral(value: Any) -> bool:
+    return isinstance(value, int) or (isinstance(value, float) and value.is_integer())
+
+
+def _check_value(value: Any, type_: str, path: str) -> Optional[str]:
+    """error message if `value` can't be coerced to the input type `type_`"""
+    non_null = type_.endswith("!")
+    if non_null:
+        type_ = type_[:-1]
+    if value is None:
+        return f"{path} must not be null" if non_null else None
+    if type_.startswith("["):
+        # a single value is coerced to a list of one item
+        items = value if isinstance(value, (list, tuple)) else [value]
+        for index, item in enumerate(items):
+            error = _check_value(item, type_[1:-1], f"{path}[{index}]")
+            if error is not None:
+                return error
+        return None
+    if not _is_valid_scalar(value, type_):
+        return f"{path} expected {type_}, got {value!r}"
+    return None
+
+
+_MISSING: Any = type("_Missing", (), {"__repr__": lambda self: "MISSING"})()
+
+
+class _Parser:
+    # pylint: disable=missing-function-docstring
+    def __init__(self, tokens: List[Tuple[str, str]]):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self, value: Optional[str] = None, kind: Optional[str] = None) -> bool:
+        if self.position >= len(self.tokens):
+            return False
+        token_kind, token_value = self.tokens[self.position]
+        return (value is None or token_value == value) and (
+            kind is None or token_kind == kind
+        )
+
+    def expect(self, value: Optional[str] = None, kind: Optional[str] = None) -> str:
+        if not self.peek(value, kind):
+            found = (
+                self.tokens[self.position][1]
+                if self.position < len(self.tokens)
+                else "end of document"
+            )
+            raise DocumentSyntaxError(
+                "Expected {} but found {!r} at token {}".format(
+                    repr(value) if value else kind, found, self.position
+                )
+            )
+        self.position += 1
+        return self.tokens[self.position - 1][1]
+
+    def skip(self, value: str) -> bool:
+        if self.peek(value):
+            self.position += 1
+            return True
+        return False
+
+    def parse_document(self) -> List[Definition]:
+        definitions = []
+        while self.position < len(self.tokens):
+            definitions.append(self.parse_definition())
+        if not definitions:
+            raise DocumentSyntaxError("Empty document")
+        return definitions
+
+    def parse_definition(self) -> Definition:
+        start = self.position
+        if self.peek("{"):
+            selections = self.parse_selection_set()
+            return Definition("query", None, [], None, selections, start, self.position)
+        kind = self.expect(kind="name")
+        if kind == "fragment":
+            name = self.expect(kind="name")
+            self.expect("on")
+            type_condition = self.expect(kind="name")
+            self.parse_directives()
+            selections = self.parse_selection_set()
+            return Definition(
+                kind, name, [], type_condition, selections, start, self.position
+            )
+        if kind not in OPERATION_TYPES:
+            raise DocumentSyntaxError("Unknown definition {!r}".format(kind))
+        name = self.expect(kind="name") if self.peek(kind="name") else None
+        variables = self.parse_variable_definitions()
+        self.parse_directives()
+        selections = self.parse_selection_set()
+        return Definition(kind, name, variables, None, selections, start, self.position)
+
+    def parse_variable_definitions(self) -> List[VariableDefinition]:
+        variables: List[VariableDefinition] = []
+        if not self.skip("("):
+            return variables
+        while not self.skip(")"):
+            start = self.position
+            self.expect("$")
+            name = self.expect(kind="name")
+            self.expect(":")
+            type_ = self.parse_type()
+            default = self.parse_value() if self.skip("=") else _MISSING
+            self.parse_directives()
+            variables.append(
+                VariableDefinition(name, type_, default, start, self.position)
+            )
+        return variables
+
+    def parse_type(self) -> str:
+        if self.skip("["):
+            type_ = "[{}]".format(self.parse_type())
+            self.expect("]")
+        else:
+            type_ = self.expect(kind="name")
+        if self.skip("!"):
+            type_ += "!"
+        return type_
+
+    def parse_directives(self) -> None:
+        while self.skip("@"):
+            self.expect(kind="name")
+            self.parse_arguments()
+
+    def parse_arguments(self) -> Dict[str, Any]:
+        arguments: Dict[str, Any] = {}
+        if not self.skip("("):
+            return arguments
+        while not self.skip(")"):
+            name = self.expect(kind="name")
+            self.expect(":")
+            arguments[name] = self.parse_value()
+        return arguments
+
+    def parse_value(self) -> Any:
+        # pylint: disable=too-many-return-statements
+        if self.skip("$"):
+            return Variable(self.expect(kind="name"))
+        if self.skip("["):
+            values = []
+            while not self.skip("]"):
+                values.append(self.parse_value())
+            return values
+        if self.skip("{"):
+            fields = {}
+            while not self.skip("}"):
+                name = self.expect(kind="name")
+                self.expect(":")
+                fields[name] = self.parse_value()
+            return fields
+        if self.peek(kind="number"):
+            value = self.expect(kind="number")
+            return float(value) if any(c in value for c in ".eE") else int(value)
+        if self.peek(kind="string"):
+            return json.loads(self.expect(kind="string"))
+        if self.peek(kind="block_string"):
+            return self.expect(kind="block_string")[3:-3]
+        value = self.expect(kind="name")
+        return {"true": True, "false": False, "null": None}.get(value, value)
+
+    def parse_selection_set(self) -> List[Any]:
+        selections: List[Any] = []
+        self.expect("{")
+        while not self.skip("}"):
+            selections.append(self.parse_selection())
+        return selections
+
+    def parse_selection(self) -> Any:
+        start = self.position
+        if self.skip("..."):
+            if self.peek(kind="name") and not self.peek("on"):
+                name = self.expect(kind="name")
+                self.parse_directives()
+                return FragmentSpread(name, start, self.position)
+            type_condition = None
+            if self.skip("on"):
+                type_condition = self.expect(kind="name")
+            self.parse_directives()
+            selections = self.parse_selection_set()
+            return InlineFragment(type_condition, selections, start, self.position)
+
+        alias = None
+        name_index = self.position
+        name = self.expect(kind="name")
+        if self.skip(":"):
+            alias = name
+            name_index = self.position
+            name = self.expect(kind="name")
+        arguments = self.parse_arguments()
+        self.parse_directives()
+        selections = self.parse_selection_set() if self.peek("{") else []
+        return Field(
+            alias, name, arguments, selections, start, name_index, self.position
+        )
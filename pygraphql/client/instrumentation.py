@@ -0,0 +1,323 @@
+import bisect
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+Hook = Callable[["ExecutionEvent"], None]
+
+_logger = logging.getLogger(__name__)
+
+
+class ExecutionEvent:
+    """An event of the execution of an operation, passed to the hooks of
+    BaseClientAsync.
+
+    - kind: one of the `ExecutionEvent.*` kinds below.
+    - operation: name of the operation, None if anonymous.
+    - attempt: number of the try, starting at 1.
+    - elapsed: seconds since the start of the execution.
+
+    the other fields are None unless set by the kind of event:
+
+    - request: a try starts.
+    - response: the response of a try is received, with `status_code`,
+      `request_bytes`, `response_bytes`, `headers_time` (connection and server
+      time until the response headers) and `transfer_time` (reading the body).
+    - decoded: the json body of a response is decoded, with `decode_time`.
+    - retry: a try failed with a retryable `error`.
+    - backoff: the client sleeps `sleep` seconds before the next try.
+    - success: the execution succeeded.
+    - failure: the execution failed with `error`, no more tries.
+    """
+
+    REQUEST = "request"
+    RESPONSE = "response"
+    DECODED = "decoded"
+    RETRY = "retry"
+    BACKOFF = "backoff"
+    SUCCESS = "success"
+    FAILURE = "failure"
+
+    __slots__ = (
+        "kind",
+        "operation",
+        "attempt",
+        "elapsed",
+        "status_code",
+        "request_bytes",
+        "response_bytes",
+        "headers_time",
+        "transfer_time",
+        "decode_time",
+        "sleep",
+        "error",
+    )
+
+    def __init__(
+        self,
+        kind: str,
+        operation: Optional[str],
+        attempt: int,
+        elapsed: float,
+        **fields: Any,
+    ):
+        self.kind = kind
+        self.operation = operation
+        self.attempt = attempt
+        self.elapsed = elapsed
+        self.status_code: Optional[int] = fields.get("status_code")
+        self.request_bytes: Optional[int] = fields.get("request_bytes")
+        self.response_bytes: Optional[int] = fields.get("response_bytes")
+        self.headers_time: Optional[float] = fields.get("headers_time")
+        self.transfer_time: Optional[float] = fields.get("transfer_time")
+        self.decode_time: Optional[float] = fields.get("decode_time")
+        self.sleep: Optional[float] = fields.get("sleep")
+        self.error: Optional[BaseException] = fields.get("error")
+
+    def __repr__(self) -> str:
+        fields = ", ".join(
+            f"{name}={getattr(self, name)!r}"
+            for name in self.__slots__
+            if getattr(self, name) is not None
+        )
+        return f"{self.__class__.__name__}({fields})"
+
+
+class Trace:
+    """emits the events of an execution to the hooks, only created when hooks
+    are registered so executions without hooks pay nothing"""
+
+    __slots__ = "hooks", "operation", "attempt", "start"
+
+    def __init__(self, hooks: Sequence[Hook], operation: Optional[str]):
+        self.hooks = hooks
+        self.operation = operation
+        self.attempt = 1
+        self.start = time.perf_counter()
+
+    def emit(self, kind: str, **fields: Any) -> None:
+        """call the hooks with an event of this execution, the errors of the
+        hooks are logged and ignored"""
+        event = ExecutionEvent(
+            kind,
+            self.operation,
+            self.attempt,
+            time.perf_counter() - self.start,
+            **fields,
+        )
+        for hook in self.hooks:
+            try:
+                hook(event)
+            except Exception:  # pylint: disable=broad-except
+                _logger.exception("Hook %r failed on %s event", hook, kind)
+
+
+# default buckets of the prometheus client libraries, in seconds
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.075,
+    0.1,
+    0.25,
+    0.5,
+    0.75,
+    1.0,
+    2.5,
+    5.0,
+    7.5,
+    10.0,
+)
+
+
+class Histogram:
+    """cumulative histogram with fixed buckets"""
+
+    __slots__ = "buckets", "counts", "count", "sum"
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """count a value in its bucket"""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative_counts(self) -> List[Tuple[float, int]]:
+        """(upper bound, count of observations <= upper bound) of each bucket"""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class MetricsAggregator:
+    """A hook aggregating the events of the executions in counters and latency
+    histograms per operation, exported in the Prometheus text format.
+
+    example:
+        >>> metrics = MetricsAggregator()
+        >>> async with BaseClientAsync(endpoint=endpoint, hooks=[metrics]) as client:
+                ...
+        >>> print(metrics.to_prometheus())
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS, prefix="graphql"):
+        """
+        Args:
+            buckets (optional): upper bounds in seconds of the histogram buckets.
+                Defaults to the prometheus default buckets.
+            prefix (optional): prefix of the metric names. Defaults to "graphql".
+        """
+        self.buckets = tuple(buckets)
+        self.prefix = prefix
+        self.counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self.histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Histogram] = {}
+
+    def __call__(self, event: ExecutionEvent) -> None:
+        operation = (("operation", event.operation or ""),)
+        if event.kind == ExecutionEvent.RESPONSE:
+            labels = operation + (("status", str(event.status_code)),)
+            self._increment("requests_total", labels)
+            self._increment("request_bytes_total", operation, event.request_bytes)
+            self._increment("response_bytes_total", operation, event.response_bytes)
+            request_time = (event.headers_time or 0) + (event.transfer_time or 0)
+            self._observe("request_duration_seconds", operation, request_time)
+        elif event.kind == ExecutionEvent.DECODED:
+            self._observe("decode_duration_seconds", operation, event.decode_time)
+        elif event.kind == ExecutionEvent.RETRY:
+            self._increment("retries_total", operation)
+        elif event.kind == ExecutionEvent.SUCCESS:
+            self._observe("execution_duration_seconds", operation, event.elapsed)
+        elif event.kind == ExecutionEvent.FAILURE:
+            labels = operation + (("error", type(event.error).__name__),)
+            self._increment("failures_total", labels)
+            self._observe("execution_duration_seconds", operation, event.elapsed)
+
+    def _increment(self, name: str, labels: Any, value: Optional[float] = 1) -> None:
+        if value is not None:
+            key = (name, labels)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def _observe(self, name: str, labels: Any, value: Optional[float]) -> None:
+        if value is None:
+            return
+        histogram = self.histograms.get((name, labels))
+        if histogram is None:
+            histogram = self.histograms[(name, labels)] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def clear(self) -> None:
+        """reset all the metrics"""
+        self.counters.clear()
+        self.histograms.clear()
+
+    def to_prometheus(self) -> str:
+        """export the metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+        for name in sorted({name for name, _ in self.counters}):
+            metric = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {metric} counter")
+            for (counter_name, labels), value in sorted(self.counters.items()):
+                if counter_name == name:
+                    lines.append(f"{metric}{_format_labels(labels)} {value:g}")
+        for name in sorted({name for name, _ in self.histograms}):
+            metric = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {metric} histogram")
+            for (histogram_name, labels), histogram in sorted(
+                self.histograms.items(), key=lambda item: item[0]
+            ):
+                if histogram_name != name:
+                    continue
+                for bound, count in histogram.cumulative_counts():
+                    bucket_labels = labels + (("le", _format_bound(bound)),)
+                    lines.append(
+                        f"{metric}_bucket{_format_labels(bucket_labels)} {count}"
+                    )
+                lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.sum:g}")
+                lines.append(
+                    f"{metric}_count{_format_labels(labels)} {histogram.count}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+class OpenTelemetryHook:
+    """A hook recording the events of the executions in OpenTelemetry
+    instruments created from `meter` (an `opentelemetry.metrics.Meter`, the
+    opentelemetry packages are not a dependency of pygraphql).
+
+    example:
+        >>> from opentelemetry import metrics
+        >>> hook = OpenTelemetryHook(metrics.get_meter("pygraphql"))
+        >>> async with BaseClientAsync(endpoint=endpoint, hooks=[hook]) as client:
+                ...
+    """
+
+    def __init__(self, meter: Any, prefix: str = "graphql.client"):
+        """
+        Args:
+            meter: opentelemetry meter creating the instruments
+            prefix (optional): prefix of the instrument names.
+                Defaults to "graphql.client".
+        """
+        self._requests = meter.create_counter(f"{prefix}.requests")
+        self._retries = meter.create_counter(f"{prefix}.retries")
+        self._failures = meter.create_counter(f"{prefix}.failures")
+        self._request_bytes = meter.create_counter(f"{prefix}.request.size", unit="By")
+        self._response_bytes = meter.create_counter(
+            f"{prefix}.response.size", unit="By"
+        )
+        self._request_duration = meter.create_histogram(
+            f"{prefix}.request.duration", unit="s"
+        )
+        self._decode_duration = meter.create_histogram(
+            f"{prefix}.decode.duration", unit="s"
+        )
+        self._execution_duration = meter.create_histogram(
+            f"{prefix}.execution.duration", unit="s"
+        )
+
+    def __call__(self, event: ExecutionEvent) -> None:
+        attributes = {"operation": event.operation or ""}
+        if event.kind == ExecutionEvent.RESPONSE:
+            self._requests.add(1, {**attributes, "status": event.status_code})
+            if event.request_bytes is not None:
+                self._request_bytes.add(event.request_bytes, attributes)
+            if event.response_bytes is not None:
+                self._response_bytes.add(event.response_bytes, attributes)
+            self._request_duration.record(
+                (event.headers_time or 0) + (event.transfer_time or 0), attributes
+            )
+        elif event.kind == ExecutionEvent.DECODED:
+            self._decode_duration.record(event.decode_time, attributes)
+        elif event.kind == ExecutionEvent.RETRY:
+            self._retries.add(1, attributes)
+        elif event.kind == ExecutionEvent.SUCCESS:
+            self._execution_duration.record(event.elapsed, attributes)
+        elif event.kind == ExecutionEvent.FAILURE:
+            self._failures.add(1, {**attributes, "error": type(event.error).__name__})
+            self._execution_duration.record(event.elapsed, attributes)
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    formatted = ",".join(
+        '{}="{}"'.format(
+            name,
+            value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'),
+        )
+        for name, value in labels
+    )
+    return "{" + formatted + "}"
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else f"{bound:g}"
@@ -0,0 +1,119 @@
+import bisect
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+
+class LatencyTracker:
+    """Track the latency of the executions of each operation over a sliding
+    window of samples, to derive their timeouts and hedging delays.
+
+    - the timeout of an operation is its `timeout_percentile` latency times
+      `timeout_multiplier`, bounded by `min_timeout` and `max_timeout`.
+    - the hedging delay of an operation is its `hedge_percentile` latency.
+
+    both are None (the client defaults are used) until `min_samples` executions
+    of the operation were recorded.
+
+    example:
+        >>> tracker = LatencyTracker(timeout_percentile=99, hedge_percentile=95)
+        >>> async with BaseClientAsync(
+                endpoint=endpoint, latency_tracker=tracker, hedging=True
+            ) as client:
+                ...
+        >>> tracker.stats(query_hash(query))
+    """
+
+    def __init__(
+        self,
+        window: int = 200,
+        min_samples: int = 20,
+        timeout_percentile: float = 99,
+        timeout_multiplier: float = 2.0,
+        min_timeout: float = 0.5,
+        max_timeout: float = 60.0,
+        hedge_percentile: float = 95,
+    ):
+        """
+        Args:
+            window (optional): number of samples kept per operation.
+                Defaults to 200.
+            min_samples (optional): samples needed before adapting.
+                Defaults to 20.
+            timeout_percentile (optional): Defaults to 99.
+            timeout_multiplier (optional): Defaults to 2.
+            min_timeout (optional): Defaults to 0.5 seconds.
+            max_timeout (optional): Defaults to 60 seconds.
+            hedge_percentile (optional): Defaults to 95.
+        """
+        assert window >= min_samples > 0
+        self.window = window
+        self.min_samples = min_samples
+        self.timeout_percentile = timeout_percentile
+        self.timeout_multiplier = timeout_multiplier
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.hedge_percentile = hedge_percentile
+        self._samples: Dict[str, _Samples] = {}
+        self.hedged = 0  # number of duplicate requests sent
+
+    def record(self, key: str, seconds: float) -> None:
+        """record the latency of an execution of the operation `key`"""
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = self._samples[key] = _Samples(self.window)
+        samples.add(seconds)
+
+    def percentile(self, key: str, percentile: float) -> Optional[float]:
+        """latency percentile (0-100) of the operation, None if there are not
+        enough samples"""
+        samples = self._samples.get(key)
+        if samples is None or len(samples.ordered) < self.min_samples:
+            return None
+        return samples.percentile(percentile)
+
+    def timeout(self, key: str) -> Optional[float]:
+        """timeout in seconds for the next execution of the operation"""
+        latency = self.percentile(key, self.timeout_percentile)
+        if latency is None:
+            return None
+        return min(
+            self.max_timeout,
+            max(self.min_timeout, latency * self.timeout_multiplier),
+        )
+
+    def hedge_delay(self, key: str) -> Optional[float]:
+        """seconds to wait before sending a duplicate request"""
+        return self.percentile(key, self.hedge_percentile)
+
+    def stats(self, key: str) -> Dict[str, Any]:
+        """the number of samples, latency percentiles and timeout of a query"""
+        samples = self._samples.get(key)
+        return {
+            "samples": len(samples.ordered) if samples else 0,
+            "p50": self.percentile(key, 50),
+            "p95": self.percentile(key, 95),
+            "p99": self.percentile(key, 99),
+            "timeout": self.timeout(key),
+        }
+
+
+class _Samples:
+    """sliding window of samples, also kept sorted to read percentiles"""
+
+    __slots__ = "recent", "ordered"
+
+    def __init__(self, window: int):
+        self.recent: Deque[float] = deque(maxlen=window)
+        self.ordered: List[float] = []
+
+    def add(self, value: float) -> None:
+        """add a sample, dropping the oldest one once the window is full"""
+        if len(self.recent) == self.recent.maxlen:
+            del self.ordered[bisect.bisect_left(self.ordered, self.recent[0])]
+        self.recent.append(value)
+        bisect.insort(self.ordered, value)
+
+    def percentile(self, percentile: float) -> float:
+        """nearest rank percentile"""
+        rank = max(1, -(-len(self.ordered) * percentile // 100))
+        return self.ordered[int(rank) - 1]
@@ -0,0 +1,198 @@
+import email.utils
+import multiprocessing
+import time
+from typing import Any, Optional
+
+import httpx
+
+from pygraphql.client.utils import create_semaphore, sleep
+
+
+class RateLimiter:
+    """Client side rate limiter shared by all the requests of a client.
+
+    - `rate` and `burst` define a token bucket (implemented with the generic cell
+      rate algorithm, waiting requests are served in order): at most `rate`
+      requests per second on average with bursts of `burst` requests.
+    - `max_in_flight` caps the number of concurrent requests.
+    - rate limit headers of the responses (`Retry-After`,
+      `X-RateLimit-Remaining`/`X-RateLimit-Reset` and their `RateLimit-*`
+      variants) pause all the requests until the window resets.
+
+    example:
+        >>> limiter = RateLimiter(rate=10, burst=5, max_in_flight=20)
+        >>> async with BaseClientAsync(endpoint=endpoint, rate_limiter=limiter):
+                ...
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        burst: int = 1,
+        max_in_flight: Optional[int] = None,
+        backend=None,
+    ):
+        """
+        Args:
+            rate (optional): max requests per second. Defaults to None (no limit).
+            burst (optional): max requests sent at once when the bucket is full.
+                Defaults to 1.
+            max_in_flight (optional): max concurrent requests.
+                Defaults to None (no limit).
+            backend (optional): force backend to use asyncio even if trio is
+                installed. Defaults to None.
+        """
+        assert rate is None or rate > 0
+        assert burst >= 1
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self._backend = backend
+        self._theoretical_arrival = 0.0
+        self._paused_until = 0.0
+        self._semaphore: Any = None
+        self.in_flight = 0
+        self.throttled = 0  # number of requests that had to wait
+
+    def pause(self, seconds: float) -> None:
+        """pause all the requests for `seconds` seconds"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    @property
+    def pause_remaining(self) -> float:
+        """seconds until the requests are resumed, 0 if not paused"""
+        return max(0.0, self._paused_until - time.monotonic())
+
+    async def acquire(self) -> None:
+        """wait until a request can be sent"""
+        waited = False
+        if self.rate is not None:
+            interval = 1 / self.rate
+            now = time.monotonic()
+            # reserve a slot before sleeping, requests are served in order
+            arrival = self._reserve(now, interval)
+            wait = arrival - now - (self.burst - 1) * interval
+            if wait > 0:
+                waited = True
+                await sleep(wait, backend=self._backend)
+
+        while self.pause_remaining > 0:
+            waited = True
+            await sleep(self.pause_remaining, backend=self._backend)
+
+        if self.max_in_flight is not None:
+            if self._semaphore is None:
+                self._semaphore = create_semaphore(
+                    self.max_in_flight, backend=self._backend
+                )
+            await self._semaphore.acquire()
+        self.in_flight += 1
+        if waited:
+            self.throttled += 1
+
+    def _reserve(self, now: float, interval: float) -> float:
+        """reserve the next slot, returns its theoretical arrival time"""
+        arrival = max(self._theoretical_arrival, now)
+        self._theoretical_arrival = arrival + interval
+        return arrival
+
+    def release(self) -> None:
+        """signal the end of a request"""
+        self.in_flight -= 1
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    def update(self, response: httpx.Response) -> None:
+        """pause the requests if the response says the rate limit is reached"""
+        pause = _retry_after(response.headers.get("retry-after"))
+        if pause is None:
+            pause = _rate_limit_reset(response.headers)
+        if pause is not None and pause > 0:
+            self.pause(pause)
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    """parse a Retry-After header, either seconds or an http date"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return date.timestamp() - time.time()
+
+
+def _rate_limit_reset(headers: httpx.Headers) -> Optional[float]:
+    """seconds until the reset of an exhausted rate limit window, None if not
+    exhausted"""
+    for prefix in ("x-ratelimit-", "ratelimit-"):
+        remaining = headers.get(prefix + "remaining")
+        reset = headers.get(prefix + "reset")
+        if remaining is None or reset is None:
+            continue
+        try:
+            if float(remaining) > 0:
+                return None
+            reset_value = float(reset)
+        except ValueError:
+            return None
+        # epoch timestamps (GitHub style) or delta seconds (IETF draft style)
+        if reset_value > 1e9:
+            return reset_value - time.time()
+        return reset_value
+    return None
+
+
+class SharedRateLimiter(RateLimiter):
+    """RateLimiter shared by the clients of several processes, e.g the workers of
+    a pygraphql.executor.ProcessExecutor: the token bucket and the pauses of the
+    rate limit headers are kept in shared memory, `max_in_flight` applies per
+    process.
+
+    it must be created before the processes and given to them when they are
+    started.
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        burst: int = 1,
+        max_in_flight: Optional[int] = None,
+        mp_context: Any = None,
+    ):
+        """
+        Args:
+            rate (optional): max requests per second of all the processes.
+                Defaults to None (no limit).
+            burst (optional): max requests sent at once when the bucket is full.
+                Defaults to 1.
+            max_in_flight (optional): max concurrent requests of a process.
+                Defaults to None (no limit).
+            mp_context (optional): multiprocessing context of the processes.
+                Defaults to None (the default context).
+        """
+        super().__init__(rate, burst, max_in_flight, backend="asyncio")
+        mp_context = mp_context or multiprocessing.get_context()
+        self._lock = mp_context.Lock()
+        self._shared_arrival = mp_context.Value("d", 0.0, lock=False)
+        self._shared_paused_until = mp_context.Value("d", 0.0, lock=False)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._shared_paused_until.value = max(
+                self._shared_paused_until.value, time.monotonic() + seconds
+            )
+
+    @property
+    def pause_remaining(self) -> float:
+        return max(0.0, self._shared_paused_until.value - time.monotonic())
+
+    def _reserve(self, now: float, interval: float) -> float:
+        with self._lock:
+            arrival = max(self._shared_arrival.value, now)
+            self._shared_arrival.value = arrival + interval
+        return arrival
@@ -0,0 +1,299 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Hashable, Optional
+
+import httpx
+
+from pygraphql.auth.base import BaseAuth
+from pygraphql.client.base import BaseClientAsync
+from pygraphql.client.utils import sleep, use_asyncio
+
+try:
+    import trio
+except ImportError:
+    trio = None
+
+
+class _Entry:
+    __slots__ = "client", "in_use", "last_used"
+
+    def __init__(self, client: BaseClientAsync):
+        self.client = client
+        self.in_use = 0
+        self.last_used = time.monotonic()
+
+
+class ClientRegistry:
+    """Long lived clients shared by the Query objects created without a client
+    (the default registry, see `default_registry`) or with
+    `registry=ClientRegistry(...)`.
+
+    a client is created per event loop (asyncio loop or trio run) and per set of
+    client kwargs, so the Query objects with the same kwargs share its connection
+    pool instead of opening new connections on each call.
+
+    - `max_connections` and `max_keepalive_connections` are the pool limits of
+      the clients created, unless `limits` is given in the kwargs.
+    - `http2=True` enables HTTP/2 (needs `h2`), multiplexing the requests over
+      fewer connections.
+    - clients unused for `idle_timeout` seconds are closed, which is checked
+      periodically, when a client is acquired or by `evict_idle`.
+    - the clients of an event loop are closed when it ends: by a background
+      task cancelled at the end of `asyncio.run` or by a trio system task. loops
+      ended otherwise (e.g `loop.close()` without cancelling their tasks) must
+      be closed by `aclose` before, as well as by using the registry as an
+      async context manager.
+
+    example:
+        >>> async with ClientRegistry(max_connections=50, http2=True) as registry:
+        >>>     get_user = Query("...", endpoint=endpoint, registry=registry)
+        >>>     get_repo = Query("...", endpoint=endpoint, registry=registry)
+        >>>     ...
+    """
+
+    def __init__(
+        self,
+        max_connections: Optional[int] = 100,
+        max_keepalive_connections: Optional[int] = 20,
+        http2: bool = False,
+        idle_timeout: Optional[float] = 300.0,
+    ):
+        """
+        Args:
+            max_connections (optional): max connections of a client.
+                Defaults to 100.
+            max_keepalive_connections (optional): max idle connections kept open
+                by a client. Defaults to 20.
+            http2 (optional): wether to enable HTTP/2. Defaults to False.
+            idle_timeout (optional): seconds before closing an unused client,
+                None to keep them until `aclose`. Defaults to 300.
+        """
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.http2 = http2
+        self.idle_timeout = idle_timeout
+        self._loops: Dict[Any, Dict[Hashable, _Entry]] = {}
+        self._guards: Dict[Any, Any] = {}  # asyncio task or trio cancel scope
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+        self._logger = logging.getLogger(__name__)
+
+    def __len__(self) -> int:
+        """number of clients, of all the event loops"""
+        return sum(len(entries) for entries in self._loops.values())
+
+    async def acquire(self, kwargs: Dict[str, Any]) -> BaseClientAsync:
+        """get the client of the current event loop for these client kwargs,
+        created if needed, it must be given back to `release` after use"""
+        entries = self._entries(kwargs.get("backend"))
+        await self._evict(entries)
+
+        key = _freeze(kwargs)
+        entry = entries.get(key)
+        if entry is None:
+            entry = _Entry(self._create_client(kwargs))
+            entries[key] = entry
+            self.created += 1
+        else:
+            self.reused += 1
+        entry.in_use += 1
+        return entry.client
+
+    def release(self, client: BaseClientAsync) -> None:
+        """give back a client got from `acquire`, its idle time starts when it's
+        no longer used"""
+        for entries in self._loops.values():
+            for entry in entries.values():
+                if entry.client is client:
+                    entry.in_use -= 1
+                    entry.last_used = time.monotonic()
+                    return
+
+    async def evict_idle(self, backend=None) -> int:
+        """close the idle clients of the current event loop
+
+        Args:
+            backend (optional): force backend to use asyncio even if trio is
+                installed. Defaults to None.
+
+        Returns:
+            int: number of clients closed
+        """
+        return await self._evict(self._entries(backend))
+
+    async def aclose(self, backend=None) -> None:
+        """close all the clients of the current event loop
+
+        Args:
+            backend (optional): force backend to use asyncio even if trio is
+                installed. Defaults to None.
+        """
+        loop = _current_loop(backend)
+        entries = self._loops.pop(loop, {})
+        for entry in entries.values():
+            await entry.client.aclose()
+        guard = self._guards.pop(loop, None)
+        if guard is not None:
+            guard.cancel()
+            if isinstance(guard, asyncio.Task):
+                await asyncio.wait([guard])
+
+    async def __aenter__(self) -> "ClientRegistry":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        """the number of clients open and the counters of the registry"""
+        return {
+            "clients": len(self),
+            "created": self.created,
+            "reused": self.reused,
+            "evicted": self.evicted,
+        }
+
+    def _entries(self, backend) -> Dict[Hashable, _Entry]:
+        # the clients of the event loops that ended can't be closed anymore
+        for loop in [loop for loop in self._loops if not _is_running(loop)]:
+            entries = self._loops.pop(loop)
+            self._guards.pop(loop, None)
+            if entries:
+                self._logger.warning(
+                    f"{len(entries)} clients were not closed before the end of "
+                    "their event loop, close the registry before it ends"
+                )
+        loop = _current_loop(backend)
+        entries = self._loops.get(loop)
+        if entries is None:
+            entries = self._loops[loop] = {}
+            self._start_guard(loop, entries, backend)
+        return entries
+
+    def _start_guard(self, loop: Any, entries: Dict[Hashable, _Entry], backend):
+        """close the clients of the loop when it ends, see _guard"""
+        if isinstance(loop, asyncio.AbstractEventLoop):
+            self._guards[loop] = loop.create_task(self._guard(loop, entries, backend))
+        else:
+            scope = self._guards[loop] = trio.CancelScope()
+            trio.lowlevel.spawn_system_task(self._guard, loop, entries, backend, scope)
+
+    async def _guard(
+        self,
+        loop: Any,
+        entries: Dict[Hashable, _Entry],
+        backend,
+        scope: Any = None,
+    ) -> None:
+        """evict the idle clients of a loop until it ends, then close the others:
+        cancelled by asyncio.run before closing the loop, or with the other
+        system tasks at the end of trio.run"""
+        try:
+            if scope is None:
+                await self._evict_periodically(entries, backend)
+            else:
+                with scope:
+                    await self._evict_periodically(entries, backend)
+        finally:
+            # the entries are replaced when the registry is closed
+            if self._loops.get(loop) is entries:
+                del self._loops[loop]
+                self._guards.pop(loop, None)
+                if scope is None:
+                    await self._close_entries(entries)
+                else:
+                    with trio.CancelScope(shield=True):
+                        await self._close_entries(entries)
+
+    async def _evict_periodically(
+        self, entries: Dict[Hashable, _Entry], backend
+    ) -> None:
+        while True:
+            await sleep(self.idle_timeout or 3600.0, backend=backend)
+            await self._evict(entries)
+
+    async def _close_entries(self, entries: Dict[Hashable, _Entry]) -> None:
+        for entry in entries.values():
+            self._logger.debug(f"Closing client of {entry.client.endpoint}")
+            await entry.client.aclose()
+
+    async def _evict(self, entries: Dict[Hashable, _Entry]) -> int:
+        if self.idle_timeout is None:
+            return 0
+        now = time.monotonic()
+        idle = [
+            entries.pop(key)
+            for key, entry in list(entries.items())
+            if not entry.in_use and now - entry.last_used >= self.idle_timeout
+        ]
+        for entry in idle:
+            self._logger.debug(f"Closing idle client of {entry.client.endpoint}")
+            await entry.client.aclose()
+        self.evicted += len(idle)
+        return len(idle)
+
+    def _create_client(self, kwargs: Dict[str, Any]) -> BaseClientAsync:
+        kwargs = dict(kwargs)
+        kwargs.setdefault(
+            "limits",
+            httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+            ),
+        )
+        if self.http2:
+            kwargs.setdefault("http2", True)
+        return BaseClientAsync(**kwargs)
+
+
+_DEFAULT_REGISTRY = ClientRegistry()
+
+
+def default_registry() -> ClientRegistry:
+    """the registry used by the Query objects created without a client nor
+    registry"""
+    return _DEFAULT_REGISTRY
+
+
+async def aclose_clients(backend=None) -> None:
+    """close the clients of the default registry in the current event loop
+
+    Args:
+        backend (optional): force backend to use asyncio even if trio is
+            installed. Defaults to None.
+    """
+    await _DEFAULT_REGISTRY.aclose(backend)
+
+
+def _current_loop(backend=None) -> Any:
+    if use_asyncio(backend):
+        return asyncio.get_event_loop()
+    return trio.lowlevel.current_trio_token()
+
+
+def _is_running(loop: Any) -> bool:
+    if isinstance(loop, asyncio.AbstractEventLoop):
+        return not loop.is_closed()
+    try:
+        loop.run_sync_soon(lambda: None)
+    except trio.RunFinishedError:
+        return False
+    return True
+
+
+def _freeze(value: Any) -> Hashable:
+    """a hashable key of the client kwargs, objects that can't be hashed are
+    identified by their id"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, BaseAuth):
+        return (type(value), value.identity)
+    try:
+        hash(value)
+    except TypeError:
+        return ("id", id(value))
+    return value
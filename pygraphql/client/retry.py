@@ -0,0 +1,226 @@
+import json
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+import httpx
+
+from pygraphql.client.utils import RetryError
+
+
+class RetryPolicy:
+    """Classify the errors of an execution as retryable or permanent.
+
+    retryable: transport errors (timeouts, network errors, protocol errors),
+    invalid json bodies (truncated responses) and the status codes in
+    `retryable_status_codes`, or 403 responses with an exhausted rate limit.
+
+    permanent: any other http status (400 validation errors, 401 auth failures,
+    ...), responses that are not graphql responses and any other exception.
+
+    subclass it and override `is_retryable` to customise it.
+    """
+
+    retryable_status_codes = (408, 425, 429, 500, 502, 503, 504)
+
+    def is_retryable(self, error: Exception) -> bool:
+        """wether the execution should be retried after `error`"""
+        if isinstance(error, httpx.HTTPStatusError):
+            response = error.response
+            if response.status_code in self.retryable_status_codes:
+                return True
+            return response.status_code == 403 and (
+                "retry-after" in response.headers
+                or response.headers.get("x-ratelimit-remaining") == "0"
+            )
+        if isinstance(error, httpx.TransportError):
+            return True
+        # json decoding errors of truncated bodies
+        return isinstance(error, json.JSONDecodeError)
+
+
+class RetryBudget:
+    """Client wide budget of retries, retries are allowed as long as they stay
+    under `ratio` of the requests made in the last `window` seconds, plus
+    `min_retries_per_second` to allow retrying when the traffic is low. This
+    avoids amplifying the load on a struggling server by a factor of
+    `max_tries`.
+    """
+
+    def __init__(
+        self,
+        ratio: float = 0.2,
+        min_retries_per_second: float = 1.0,
+        window: float = 10.0,
+    ):
+        """
+        Args:
+            ratio (optional): max retries per request. Defaults to 0.2.
+            min_retries_per_second (optional): retries always allowed.
+                Defaults to 1.
+            window (optional): window in seconds over which requests and retries
+                are counted. Defaults to 10.
+        """
+        self.ratio = ratio
+        self.min_retries_per_second = min_retries_per_second
+        self.window = window
+        self._requests: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+        self.requests = 0
+        self.retries = 0
+        self.exhausted = 0
+
+    def record_request(self) -> None:
+        """record a new execution"""
+        self.requests += 1
+        self._requests.append(time.monotonic())
+
+    def acquire_retry(self) -> bool:
+        """take a retry from the budget, False if exhausted"""
+        now = time.monotonic()
+        for events in (self._requests, self._retries):
+            while events and events[0] <= now - self.window:
+                events.popleft()
+        allowed = self.min_retries_per_second * self.window + self.ratio * len(
+            self._requests
+        )
+        if len(self._retries) >= allowed:
+            self.exhausted += 1
+            return False
+        self.retries += 1
+        self._retries.append(now)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """the counters of the budget"""
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "exhausted": self.exhausted,
+        }
+
+
+class CircuitOpenError(RetryError):
+    """Custom exception thrown when the circuit breaker rejects an execution"""
+
+    def __init__(
+        self, last_exception: Optional[Exception], retries_count: int = 0
+    ) -> None:
+        """update the Exception message to take into account the circuit state"""
+        super().__init__(retries_count, last_exception)
+        self.args = (
+            "Circuit open, endpoint considered down (last error: {})".format(
+                last_exception
+            ),
+        )
+
+
+class CircuitBreaker:
+    """Fail fast while the endpoint is down.
+
+    - closed: executions go through, after `failure_threshold` consecutive
+      failures (retryable errors, see RetryPolicy) the circuit opens.
+    - open: executions fail right away with CircuitOpenError, after
+      `recovery_timeout` seconds the circuit becomes half open.
+    - half open: up to `half_open_max_calls` probe executions go through, the
+      circuit closes on a success and opens again on a failure.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+    ):
+        """
+        Args:
+            failure_threshold (optional): consecutive failures opening the circuit.
+                Defaults to 5.
+            recovery_timeout (optional): seconds before probing the endpoint.
+                Defaults to 30.
+            half_open_max_calls (optional): concurrent probes when half open.
+                Defaults to 1.
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self.consecutive_failures = 0
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+        self.last_exception: Optional[Exception] = None
+
+    @property
+    def state(self) -> str:
+        """closed, open or half_open, an open circuit becomes half open after
+        `recovery_timeout` seconds"""
+        if (
+            self._state == self.OPEN
+            and time.monotonic() - self._opened_at >= self.recovery_timeout
+        ):
+            self._state = self.HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def before_call(self, retries_count: int = 0) -> None:
+        """check an execution can go through
+
+        Args:
+            retries_count (optional): tries of the execution so far. Defaults to 0.
+
+        Raises:
+            CircuitOpenError: if the circuit is open or enough probes are running
+        """
+        state = self.state
+        if state == self.CLOSED:
+            return
+        if state == self.HALF_OPEN and self._probes < self.half_open_max_calls:
+            self._probes += 1
+            return
+        self.rejected += 1
+        raise CircuitOpenError(self.last_exception, retries_count)
+
+    def record_success(self) -> None:
+        """an execution succeeded, closes a half open circuit"""
+        self.successes += 1
+        self.consecutive_failures = 0
+        if self._state == self.HALF_OPEN:
+            self._state = self.CLOSED
+
+    def record_failure(self, error: Optional[Exception] = None) -> None:
+        """an execution failed with `error`, opens the circuit after
+        `failure_threshold` consecutive failures or when half open"""
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_exception = error
+        if self._state == self.HALF_OPEN or (
+            self._state == self.CLOSED
+            and self.consecutive_failures >= self.failure_threshold
+        ):
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+            self.opened += 1
+
+    def record_cancelled(self) -> None:
+        """an execution was cancelled before completing, frees its probe slot"""
+        if self._state == self.HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """the state and the counters of the circuit"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "successes": self.successes,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "opened": self.opened,
+        }
@@ -0,0 +1,331 @@
+import json
+import re
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+
+import httpx
+
+_WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
+_STRING_SPECIAL_RE = re.compile(r'["\\]')
+_CONTAINER_SPECIAL_RE = re.compile(r'["{}\[\]]')
+_SCALAR_END_RE = re.compile(r"[ \t\n\r,}\]]")
+
+
+class JsonStreamError(ValueError):
+    """Custom exception thrown when a streamed json body is not valid"""
+
+
+class JsonPathStreamParser:  # pylint: disable=too-many-instance-attributes
+    """incremental json parser yielding the items of an array at a given path
+    while the body is being received, the memory used is bounded by the size of
+    the largest item instead of the size of the body.
+
+    paths are dot separated keys, `item` standing for the elements of an array,
+    e.g: "data.repository.issues.edges.item". The top level `errors` of a
+    graphql response are always collected in `errors`.
+
+    only the containers along the path are walked in python, items and skipped
+    values are decoded by the C json decoder as soon as they are complete. the
+    chunks of an incomplete value are only scanned for its end (see
+    _PendingValue), so a large item is decoded once whatever the number of
+    chunks it is received in.
+
+    example:
+        >>> parser = JsonPathStreamParser("data.users.item")
+        >>> parser.feed('{"data": {"users": [{"id": 1}, {"i')
+        [{'id': 1}]
+        >>> parser.feed('d": 2}]}}')
+        [{'id': 2}]
+        >>> parser.close()
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: dot separated path of the array items to yield
+        """
+        self.path: Tuple[str, ...] = tuple(path.split("."))
+        assert self.path[-1] == "item", "path must point to array items"
+        self.errors: Optional[List[Any]] = None
+        self._buffer = ""
+        self._position = 0
+        # frames of the containers being walked: [kind, path, state, key]
+        self._stack: List[List[Any]] = []
+        self._done = False
+        self._decoder = json.JSONDecoder()
+        self._pending: Optional[_PendingValue] = None  # incomplete last value
+
+    def feed(self, text: str) -> List[Any]:
+        """feed the next chunk of the body
+
+        Args:
+            text: next chunk of the body
+
+        Raises:
+            JsonStreamError: if the body is not valid
+
+        Returns:
+            List[Any]: the items completed by this chunk
+        """
+        if self._pending is not None:
+            if not self._pending.feed(text):
+                return []
+            self._buffer = self._pending.text()
+            self._pending = None
+        else:
+            self._buffer = self._buffer[self._position :] + text
+        self._position = 0
+        items: List[Any] = []
+        self._parse(items, final=False)
+        return items
+
+    def close(self) -> List[Any]:
+        """signal the end of the body
+
+        Raises:
+            JsonStreamError: if the body is incomplete or not valid
+
+        Returns:
+            List[Any]: the last items, if any
+        """
+        if self._pending is not None:
+            self._buffer = self._pending.text()
+            self._position = 0
+            self._pending = None
+        items: List[Any] = []
+        self._parse(items, final=True)
+        if not self._done or self._buffer[self._position :].strip():
+            raise JsonStreamError("Incomplete or invalid json body")
+        return items
+
+    def _parse(self, items: List[Any], final: bool) -> None:
+        # pylint: disable=too-many-branches
+        buffer = self._buffer
+        while not self._done:
+            position = _WHITESPACE_RE.match(buffer, self._position).end()  # type: ignore
+            if position >= len(buffer):
+                self._position = position
+                return
+            char = buffer[position]
+
+            if not self._stack:
+                path: Tuple[str, ...] = ()
+            else:
+                kind, path, state, key = frame = self._stack[-1]
+                if state == "comma_or_end":
+                    if char == ",":
+                        frame[2] = "key" if kind == "object" else "value"
+                        self._position = position + 1
+                        continue
+                    if char == ("}" if kind == "object" else "]"):
+                        self._stack.pop()
+                        self._position = position + 1
+                        self._done = not self._stack
+                        continue
+                    raise JsonStreamError(
+                        "Unexpected {!r} in {}".format(char, ".".join(path))
+                    )
+                if state in ("key_or_end", "value_or_end") and char in "}]":
+                    self._stack.pop()
+                    self._position = position + 1
+                    self._done = not self._stack
+                    continue
+                if state in ("key", "key_or_end"):
+                    decoded = self._decode(position, final)
+                    if decoded is None:
+                        return
+                    key, self._position = decoded
+                    if not isinstance(key, str):
+                        raise JsonStreamError(
+                            "Expected a key in {}".format(".".join(path))
+                        )
+                    frame[2] = "colon"
+                    frame[3] = key
+                    continue
+                if state == "colon":
+                    if char != ":":
+                        raise JsonStreamError(
+                            "Expected ':' in {}".format(".".join(path))
+                        )
+                    frame[2] = "value"
+                    self._position = position + 1
+                    continue
+                path = path + ((key if kind == "object" else "item"),)
+
+            # parse a value at `path`
+            if char in "{[" and path == self.path[: len(path)] and path != self.path:
+                kind = "object" if char == "{" else "array"
+                self._push(
+                    kind, path, "key_or_end" if kind == "object" else "value_or_end"
+                )
+                self._position = position + 1
+                continue
+
+            decoded = self._decode(position, final)
+            if decoded is None:
+                return
+            value, self._position = decoded
+            if path == self.path:
+                items.append(value)
+            elif path == ("errors",):
+                self.errors = value
+            if self._stack:
+                self._stack[-1][2] = "comma_or_end"
+            else:
+                self._done = True
+
+    def _push(self, kind: str, path: Tuple[str, ...], state: str) -> None:
+        if self._stack:
+            self._stack[-1][2] = "comma_or_end"
+        self._stack.append([kind, path, state, None])
+
+    def _decode(self, position: int, final: bool) -> Optional[Tuple[Any, int]]:
+        """decode a complete value, None if more data is needed"""
+        buffer = self._buffer
+        try:
+            value, end = self._decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as error:
+            if final:
+                raise JsonStreamError(str(error)) from error
+            self._wait(position, error)
+            return None
+        # a number at the end of the buffer may continue in the next chunk
+        if (
+            end >= len(buffer)
+            and not final
+            and not isinstance(value, (dict, list, str))
+        ):
+            self._wait(position, None)
+            return None
+        return value, end
+
+    def _wait(self, position: int, error: Optional[json.JSONDecodeError]) -> None:
+        """keep the incomplete value starting at `position` aside until the chunk
+        completing it is fed"""
+        pending = _PendingValue(self._buffer[position])
+        if pending.feed(self._buffer[position:]) and error is not None:
+            # the value is complete: it's not valid
+            raise JsonStreamError(str(error)) from error
+        self._pending = pending
+        self._buffer = ""
+        self._position = 0
+
+
+class _PendingValue:
+    """chunks of an incomplete json value, scanned for the end of the value
+    without decoding it: the regexes skip the content of strings and containers
+    in C"""
+
+    __slots__ = "chunks", "kind", "depth", "in_string", "escaped"
+
+    def __init__(self, first_char: str):
+        self.chunks: List[str] = []
+        if first_char in "{[":
+            self.kind = "container"
+        elif first_char == '"':
+            self.kind = "string"
+        else:
+            self.kind = "scalar"
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, text: str) -> bool:
+        """add the next chunk, returns True if it completes the value"""
+        self.chunks.append(text)
+        return self._end(text) is not None
+
+    def text(self) -> str:
+        """the chunks received"""
+        return "".join(self.chunks)
+
+    def _end(self, text: str) -> Optional[int]:
+        """position of the end of the value in the chunk, None if the value
+        continues in the next chunks"""
+        if self.kind == "scalar":
+            match = _SCALAR_END_RE.search(text)
+            return match.start() if match else None
+        position = 0
+        while True:
+            if self.in_string:
+                end = self._skip_string(text, position)
+                if end is None or self.kind == "string":
+                    return end
+                position = end
+                continue
+            match = _CONTAINER_SPECIAL_RE.search(text, position)
+            if match is None:
+                return None
+            position = match.end()
+            char = match.group()
+            if char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+            else:
+                self.depth -= 1
+                if self.depth == 0:
+                    return position
+
+    def _skip_string(self, text: str, position: int) -> Optional[int]:
+        """position after the end of the string, None if it continues in the
+        next chunks"""
+        while True:
+            if self.escaped:
+                if position >= len(text):
+                    return None
+                self.escaped = False
+                position += 1
+            match = _STRING_SPECIAL_RE.search(text, position)
+            if match is None:
+                return None
+            position = match.end()
+            if match.group() == '"':
+                self.in_string = False
+                return position
+            self.escaped = True
+
+
+class StreamingResult:
+    """The streamed result of a GraphQL execution, an async iterator over the
+    items found at a path of the data while the response is being received.
+
+    - ``errors`` is filled with the errors of the response as soon as they are
+      parsed, it is complete once the iteration is over.
+
+    the response is only requested when the iteration starts and can only be
+    iterated once.
+    """
+
+    def __init__(
+        self,
+        open_response: Callable[[], Awaitable[httpx.Response]],
+        path: str,
+    ):
+        """
+        Args:
+            open_response: coroutine function sending the request and returning
+                the response with its body not read yet
+            path: dot separated path of the array items in the result data
+        """
+        self._open_response = open_response
+        self._parser = JsonPathStreamParser(f"data.{path}")
+        self._started = False
+
+    @property
+    def errors(self) -> Optional[List[Any]]:
+        """the errors of the response, None if there are none or they are not
+        parsed yet"""
+        return self._parser.errors
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        assert not self._started, "a StreamingResult can only be iterated once"
+        self._started = True
+        response = await self._open_response()
+        try:
+            async for chunk in response.aiter_text():
+                for item in self._parser.feed(chunk):
+                    yield item
+            for item in self._parser.close():
+                yield item
+        finally:
+            await response.aclose()
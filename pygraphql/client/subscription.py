@@ -0,0 +1,704 @@
+import abc
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Union
+
+import httpx
+
+from pygraphql.auth.base import BaseAuth
+from pygraphql.client.codec import JsonCodec, get_codec
+from pygraphql.client.document import CompiledQuery
+from pygraphql.client.utils import (
+    ExecutionResult,
+    RandomExponentialSleep,
+    RetryError,
+    _WorkerError,
+    create_event,
+    sleep,
+    use_asyncio,
+)
+
+try:
+    import trio
+except ImportError:
+    trio = None
+
+try:
+    import websockets
+
+    try:
+        from websockets.asyncio.client import connect as websockets_connect
+
+        _HEADERS_KWARG = "additional_headers"
+    except ImportError:  # websockets < 13
+        websockets_connect = websockets.connect
+        _HEADERS_KWARG = "extra_headers"
+except ImportError:
+    websockets = None
+
+try:
+    import trio_websocket
+except ImportError:
+    trio_websocket = None
+
+GRAPHQL_TRANSPORT_WS = "graphql-transport-ws"
+GRAPHQL_WS = "graphql-ws"  # legacy subscriptions-transport-ws protocol
+
+# client message types of each protocol
+_MESSAGES: Dict[str, Dict[str, Optional[str]]] = {
+    GRAPHQL_TRANSPORT_WS: {
+        "subscribe": "subscribe",
+        "stop": "complete",
+        "ping": "ping",
+    },
+    GRAPHQL_WS: {"subscribe": "start", "stop": "stop", "ping": None},
+}
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_newest", "error")
+
+Connect = Callable[[str, str, Dict[str, str]], Awaitable["WebSocketConnection"]]
+
+
+class SubscriptionError(Exception):
+    """Custom exception thrown when the server refuses the connection"""
+
+
+class SubscriptionOverflowError(SubscriptionError):
+    """Custom exception thrown when a subscription with the "error" overflow
+    policy receives more results than its queue can hold"""
+
+
+class WebSocketConnection(abc.ABC):
+    """minimal interface of a websocket connection, implement it (and give a
+    `connect` coroutine function to SubscriptionClient) to use another websocket
+    library"""
+
+    @abc.abstractmethod
+    async def send(self, message: str) -> None:
+        """send a text message"""
+
+    @abc.abstractmethod
+    async def receive(self) -> str:
+        """receive a text message, raises ConnectionError once closed"""
+
+    @abc.abstractmethod
+    async def aclose(self) -> None:
+        """close the connection"""
+
+
+class _WebsocketsConnection(WebSocketConnection):
+    """connection of the `websockets` library, for asyncio"""
+
+    def __init__(self, websocket: Any):
+        self._websocket = websocket
+
+    async def send(self, message: str) -> None:
+        try:
+            await self._websocket.send(message)
+        except websockets.exceptions.ConnectionClosed as error:
+            raise ConnectionError(str(error)) from error
+
+    async def receive(self) -> str:
+        try:
+            return await self._websocket.recv()
+        except websockets.exceptions.ConnectionClosed as error:
+            raise ConnectionError(str(error)) from error
+
+    async def aclose(self) -> None:
+        await self._websocket.close()
+
+
+class _TrioWebsocketConnection(WebSocketConnection):
+    """connection of the `trio-websocket` library, for trio"""
+
+    def __init__(self, websocket: Any):
+        self._websocket = websocket
+
+    async def send(self, message: str) -> None:
+        try:
+            await self._websocket.send_message(message)
+        except trio_websocket.ConnectionClosed as error:
+            raise ConnectionError(str(error)) from error
+
+    async def receive(self) -> str:
+        try:
+            return await self._websocket.get_message()
+        except trio_websocket.ConnectionClosed as error:
+            raise ConnectionError(str(error)) from error
+
+    async def aclose(self) -> None:
+        await self._websocket.aclose()
+
+
+_COMPLETE = object()
+
+
+class _SubscriptionQueue:
+    """bounded queue of the results of a subscription, with an overflow policy"""
+
+    def __init__(self, maxsize: int, overflow: str, backend=None):
+        self._items: Deque[Any] = deque()
+        self._maxsize = maxsize
+        self._overflow = overflow
+        self._backend = backend
+        self._readable = create_event(backend)
+        self._writable = create_event(backend)
+        self._closed = False
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    async def put(self, item: Any) -> bool:
+        """add a result, False if it overflowed with the "error" policy"""
+        while len(self._items) >= self._maxsize and not self._closed:
+            if self._overflow == "block":
+                self._writable = create_event(self._backend)
+                await self._writable.wait()
+                continue
+            if self._overflow == "error":
+                return False
+            self.dropped += 1
+            if self._overflow == "drop_newest":
+                return True
+            self._items.popleft()
+        if not self._closed:
+            self._items.append(item)
+            self._readable.set()
+        return True
+
+    def close(self, *items: Any) -> None:
+        """add the last items (the completion or an error) whatever the size"""
+        if not self._closed:
+            self._closed = True
+            self._items.extend(items)
+            self._readable.set()
+            self._writable.set()
+
+    async def get(self) -> Any:
+        """the next item, waits until there is one"""
+        while not self._items:
+            self._readable = create_event(self._backend)
+            await self._readable.wait()
+        item = self._items.popleft()
+        self._writable.set()
+        return item
+
+
+class Subscription:
+    """an active subscription, async iterator of the ExecutionResults sent by the
+    server, until the server completes it or it's unsubscribed.
+
+    example:
+        >>> async with await client.subscribe(query, variables) as subscription:
+                async for result in subscription:
+                    ...
+    """
+
+    def __init__(
+        self,
+        client: "SubscriptionClient",
+        subscription_id: str,
+        payload: Dict[str, Any],
+        queue: _SubscriptionQueue,
+    ):
+        self.id = subscription_id
+        self.payload = payload
+        self._client = client
+        self._queue = queue
+        self._last: Any = None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(id={self.id!r}, dropped={self.dropped})"
+
+    @property
+    def dropped(self) -> int:
+        """number of results dropped because the queue was full"""
+        return self._queue.dropped
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> ExecutionResult:
+        if self._last is not None:
+            item = self._last
+        else:
+            item = await self._queue.get()
+        if item is _COMPLETE:
+            self._last = item
+            raise StopAsyncIteration
+        if isinstance(item, _WorkerError):
+            self._last = item
+            raise item.error
+        return item
+
+    async def deliver(self, result: ExecutionResult) -> bool:
+        """queue a result received by the client, waits while the queue is full
+        with the "block" overflow policy
+
+        Returns:
+            bool: False if the queue is full with the "error" overflow policy
+        """
+        return await self._queue.put(result)
+
+    def complete(self, result: Optional[ExecutionResult] = None) -> None:
+        """end the iteration once the results queued, and `result` if given
+        (e.g the errors sent by the server), are read"""
+        if result is None:
+            self._queue.close(_COMPLETE)
+        else:
+            self._queue.close(result, _COMPLETE)
+
+    def fail(self, error: Exception) -> None:
+        """raise `error` once the results queued are read"""
+        self._queue.close(_WorkerError(error))
+
+    async def unsubscribe(self) -> None:
+        """stop the subscription, the results already received can still be read"""
+        await self._client._unsubscribe(self)
+
+    async def __aenter__(self) -> "Subscription":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.unsubscribe()
+
+
+class SubscriptionClient:
+    """Client for graphql subscriptions over a websocket, alongside BaseClientAsync
+    which can't receive them.
+
+    - both the graphql-transport-ws protocol and the legacy graphql-ws protocol
+      (subscriptions-transport-ws, e.g older Hasura versions) are supported.
+    - all the subscriptions are multiplexed over a single websocket.
+    - with graphql-transport-ws a ping is sent after `keepalive` seconds without
+      message, and the connection is considered dead after `keepalive_timeout`
+      seconds without message (graphql-ws servers send "ka" messages).
+    - when the connection is lost it's opened again, with a random exponential
+      sleep between the attempts, and the active subscriptions are subscribed
+      again. results published while disconnected are lost. after
+      `max_reconnect_tries` failed attempts in a row the subscriptions fail with
+      a RetryError.
+    - the results of each subscription are kept in a queue of `queue_size`
+      results, when a consumer is behind the `overflow` policy applies:
+      "drop_oldest" (default) or "drop_newest" drop results, "error" ends the
+      subscription with a SubscriptionOverflowError after the queued results,
+      and "block" stops reading the websocket until there is room, which stalls
+      all the subscriptions of the client.
+
+    needs `websockets` on asyncio or `trio-websocket` on trio, unless a custom
+    `connect` coroutine function returning a WebSocketConnection is given.
+
+    the auth headers are sent with the websocket handshake, and in the
+    `connection_init` payload as `{"headers": ...}` (where Hasura reads them)
+    unless `connection_params` is given.
+
+    example:
+        >>> async with SubscriptionClient(endpoint=endpoint, auth=auth) as client:
+                subscription = await client.subscribe(
+                    "subscription($id: Int!) { users(where: {id: {_eq: $id}}) "
+                    "{ name } }",
+                    {"id": 1},
+                )
+                async for result in subscription:
+                    ...
+    """
+
+    def __init__(
+        self,
+        endpoint: Optional[str] = None,
+        protocol: str = GRAPHQL_TRANSPORT_WS,
+        auth: Optional[httpx.Auth] = None,
+        headers: Optional[Dict[str, str]] = None,
+        connection_params: Optional[Dict[str, Any]] = None,
+        keepalive: Optional[float] = 20.0,
+        keepalive_timeout: Optional[float] = 60.0,
+        max_reconnect_tries: int = 5,
+        reconnect_sleep: Optional[Callable[[int], float]] = None,
+        queue_size: int = 100,
+        overflow: str = "drop_oldest",
+        codec: Optional[Union[str, JsonCodec]] = None,
+        connect: Optional[Connect] = None,
+        backend=None,
+    ):
+        """initialise the client
+
+        Args:
+            endpoint (optional): ws:// or wss:// url, http(s) urls are converted.
+                Defaults to None (GRAPHQL_WS_ENDPOINT or GRAPHQL_ENDPOINT env var).
+            protocol (optional): "graphql-transport-ws" or "graphql-ws".
+                Defaults to "graphql-transport-ws".
+            auth (optional): Defaults to None (BaseAuth()).
+            headers (optional): extra headers of the handshake. Defaults to None.
+            connection_params (optional): payload of `connection_init`.
+                Defaults to None ({"headers": auth and extra headers}).
+            keepalive (optional): seconds without message before sending a ping.
+                Defaults to 20.
+            keepalive_timeout (optional): seconds without message before
+                reconnecting. Defaults to 60.
+            max_reconnect_tries (optional): failed connections in a row before
+                giving up, 0 to never reconnect. Defaults to 5.
+            reconnect_sleep (optional): seconds to sleep before a reconnection
+                given its number. Defaults to None
+                (RandomExponentialSleep(multiplier=0.5, max_sleep=30)).
+            queue_size (optional): max results queued per subscription.
+                Defaults to 100.
+            overflow (optional): "drop_oldest", "drop_newest", "error" or
+                "block". Defaults to "drop_oldest".
+            codec (optional): json codec, see pygraphql.client.codec.
+                Defaults to None (the stdlib json).
+            connect (optional): coroutine function taking the url, the
+                subprotocol and the headers and returning a WebSocketConnection.
+                Defaults to None (websockets or trio-websocket).
+            backend (optional): force backend to use asyncio even if trio is
+                installed. Defaults to None.
+
+        Raises:
+            ValueError: if the protocol or the overflow policy is unknown
+            ImportError: if the websocket library of the backend is not installed
+        """
+        endpoint = (
+            endpoint
+            or os.getenv("GRAPHQL_WS_ENDPOINT")
+            or os.getenv("GRAPHQL_ENDPOINT")
+        )
+        assert isinstance(endpoint, str)
+        if protocol not in _MESSAGES:
+            raise ValueError(
+                f"Unknown protocol {protocol!r}, use one of {list(_MESSAGES)}"
+            )
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(
+                f"Unknown overflow policy {overflow!r}, use one of {OVERFLOW_POLICIES}"
+            )
+        assert queue_size > 0
+        if connect is None:
+            if use_asyncio(backend) and websockets is None:
+                raise ImportError("websockets is not installed")
+            if not use_asyncio(backend) and trio_websocket is None:
+                raise ImportError("trio-websocket is not installed")
+
+        if endpoint.startswith("http"):
+            endpoint = "ws" + endpoint[len("http") :]
+        self._endpoint = endpoint
+        self._protocol = protocol
+        self._messages = _MESSAGES[protocol]
+        self._auth = auth if auth is not None else BaseAuth()
+        self._headers = dict(headers or {})
+        self._connection_params = connection_params
+        self._keepalive = keepalive
+        self._keepalive_timeout = keepalive_timeout
+        self._max_reconnect_tries = max_reconnect_tries
+        self._reconnect_sleep = reconnect_sleep or RandomExponentialSleep(
+            multiplier=0.5, max_sleep=30
+        )
+        self._queue_size = queue_size
+        self._overflow = overflow
+        self._codec = get_codec(codec)
+        self._connect = connect or self._default_connect
+        self._backend = backend
+
+        self._subscriptions: Dict[str, Subscription] = {}
+        self._next_id = 0
+        self._connection: Optional[WebSocketConnection] = None
+        self._acked = False
+        self._closed = False
+        self._error: Optional[Exception] = None
+        self._task: Any = None
+        self._nursery: Any = None
+        self._nursery_manager: Any = None
+        self.reconnects = 0
+        self._logger = logging.getLogger(__name__)
+
+    @property
+    def backend(self) -> Any:
+        """the async backend forced on the client, None if not forced"""
+        return self._backend
+
+    @property
+    def protocol(self) -> str:
+        """the subprotocol of the connection, graphql-transport-ws or graphql-ws"""
+        return self._protocol
+
+    @property
+    def connected(self) -> bool:
+        """wether the connection is open and acknowledged by the server"""
+        return self._acked
+
+    @property
+    def subscriptions(self) -> List[Subscription]:
+        """the active subscriptions"""
+        return list(self._subscriptions.values())
+
+    async def __aenter__(self) -> "SubscriptionClient":
+        if use_asyncio(self._backend):
+            self._task = asyncio.ensure_future(self._run())
+        else:
+            self._nursery_manager = trio.open_nursery()
+            self._nursery = await self._nursery_manager.__aenter__()
+            self._nursery.start_soon(self._run)
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """close the websocket, the active subscriptions are completed"""
+        if self._closed:
+            return
+        self._closed = True
+        for subscription in list(self._subscriptions.values()):
+            subscription.complete()
+        self._subscriptions.clear()
+        await self._close_connection()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self._nursery is not None:
+            self._nursery.cancel_scope.cancel()
+            await self._nursery_manager.__aexit__(None, None, None)
+
+    async def subscribe(
+        self, query: Union[str, CompiledQuery], variables: Optional[dict] = None
+    ) -> Subscription:
+        """start a subscription, sent right away if connected or once connected
+
+        Args:
+            query: the subscription document
+            variables (optional): Defaults to None.
+
+        Raises:
+            VariablesError: if the variables don't match a CompiledQuery
+            RetryError: if the client gave up reconnecting
+
+        Returns:
+            Subscription: async iterator of the results
+        """
+        if self._error is not None:
+            raise self._error
+        assert not self._closed, "the client is closed"
+        payload: Dict[str, Any] = {"variables": variables or {}}
+        if isinstance(query, CompiledQuery):
+            query.validate(variables or {})
+            payload["query"] = query.text
+            if query.operation_name is not None:
+                payload["operationName"] = query.operation_name
+        else:
+            payload["query"] = query
+
+        self._next_id += 1
+        subscription = Subscription(
+            self,
+            str(self._next_id),
+            payload,
+            _SubscriptionQueue(self._queue_size, self._overflow, self._backend),
+        )
+        self._subscriptions[subscription.id] = subscription
+        if self._acked:
+            await self._send_subscribe(subscription)
+        return subscription
+
+    async def _unsubscribe(self, subscription: Subscription) -> None:
+        if self._subscriptions.pop(subscription.id, None) is None:
+            return
+        subscription.complete()
+        if self._acked:
+            await self._send_stop(subscription)
+
+    async def _send(self, message: Dict[str, Any]) -> None:
+        if self._connection is None:
+            raise ConnectionError("not connected")
+        await self._connection.send(self._codec.dumps(message).decode("utf-8"))
+
+    async def _send_subscribe(self, subscription: Subscription) -> None:
+        try:
+            await self._send(
+                {
+                    "id": subscription.id,
+                    "type": self._messages["subscribe"],
+                    "payload": subscription.payload,
+                }
+            )
+        except ConnectionError:
+            pass  # subscribed again once reconnected
+
+    async def _send_stop(self, subscription: Subscription) -> None:
+        try:
+            await self._send({"id": subscription.id, "type": self._messages["stop"]})
+        except ConnectionError:
+            pass  # the server forgets the subscriptions of a closed connection
+
+    async def _default_connect(
+        self, url: str, subprotocol: str, headers: Dict[str, str]
+    ) -> WebSocketConnection:
+        if use_asyncio(self._backend):
+            websocket = await websockets_connect(
+                url, subprotocols=[subprotocol], **{_HEADERS_KWARG: headers}
+            )
+            return _WebsocketsConnection(websocket)
+        websocket = await trio_websocket.connect_websocket_url(
+            self._nursery,
+            url,
+            subprotocols=[subprotocol],
+            extra_headers=[
+                (key.encode("utf-8"), value.encode("utf-8"))
+                for key, value in headers.items()
+            ],
+        )
+        return _TrioWebsocketConnection(websocket)
+
+    async def _handshake_headers(self) -> Dict[str, str]:
+        """the headers set by the auth on a request to the endpoint"""
+        request = httpx.Request("GET", "http" + self._endpoint[len("ws") :])
+        flow = self._auth.async_auth_flow(request)
+        request = await flow.__anext__()
+        await flow.aclose()
+        headers = dict(request.headers)
+        headers.pop("host", None)
+        headers.update(self._headers)
+        return headers
+
+    async def _receive(self, timeout: Optional[float]) -> Optional[Dict[str, Any]]:
+        """receive a message, None if nothing was received in time"""
+        connection = self._connection
+        assert connection is not None
+        if timeout is None:
+            message = await connection.receive()
+        elif use_asyncio(self._backend):
+            try:
+                message = await asyncio.wait_for(connection.receive(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        else:
+            message = None
+            with trio.move_on_after(timeout):
+                message = await connection.receive()
+            if message is None:
+                return None
+        return self._codec.loads(message)
+
+    async def _run(self) -> None:
+        """connect, read the messages and reconnect until closed"""
+        failures = 0
+        last_error: Optional[Exception] = None
+        while not self._closed:
+            try:
+                await self._open()
+                failures = 0
+                await self._read()
+            except Exception as error:  # pylint: disable=broad-except
+                if self._closed:
+                    return
+                if isinstance(error, SubscriptionError):
+                    self._logger.error(f"Connection refused: {error}")
+                else:
+                    self._logger.warning(
+                        f"Connection to {self._endpoint} lost: {error}"
+                    )
+                last_error = error
+            finally:
+                self._acked = False
+                await self._close_connection()
+
+            failures += 1
+            if failures > self._max_reconnect_tries:
+                self._give_up(RetryError(failures - 1, last_error))
+                return
+            await sleep(self._reconnect_sleep(failures), backend=self._backend)
+            self.reconnects += 1
+
+    async def _open(self) -> None:
+        """open the websocket, initialise the connection and (re)subscribe"""
+        headers = await self._handshake_headers()
+        self._connection = await self._connect(self._endpoint, self._protocol, headers)
+        params = self._connection_params
+        if params is None:
+            params = {"headers": headers} if headers else None
+        init: Dict[str, Any] = {"type": "connection_init"}
+        if params is not None:
+            init["payload"] = params
+        await self._send(init)
+
+        while True:
+            message = await self._receive(self._keepalive_timeout)
+            if message is None:
+                raise ConnectionError("connection_ack not received")
+            if message.get("type") == "connection_ack":
+                break
+            if message.get("type") in ("connection_error", "error"):
+                raise SubscriptionError(message.get("payload"))
+
+        self._acked = True
+        for subscription in list(self._subscriptions.values()):
+            await self._send_subscribe(subscription)
+
+    async def _read(self) -> None:
+        """dispatch the messages to the subscriptions, with keepalive"""
+        interval = self._keepalive or self._keepalive_timeout
+        last_message = time.monotonic()
+        while True:
+            message = await self._receive(interval)
+            if message is None:
+                silence = time.monotonic() - last_message
+                if self._keepalive_timeout is not None and silence >= (
+                    self._keepalive_timeout
+                ):
+                    raise ConnectionError(f"no message received in {silence:0.1f}s")
+                if self._messages["ping"] is not None:
+                    await self._send({"type": self._messages["ping"]})
+                continue
+            last_message = time.monotonic()
+            await self._dispatch(message)
+
+    async def _dispatch(self, message: Dict[str, Any]) -> None:
+        kind = message.get("type")
+        if kind == "ping":
+            await self._send({"type": "pong"})
+            return
+        if kind == "connection_error":
+            raise SubscriptionError(message.get("payload"))
+        subscription = self._subscriptions.get(message.get("id"))  # type: ignore
+        if subscription is None:
+            return  # keepalive, or late message of an ended subscription
+
+        if kind in ("next", "data"):
+            payload = message.get("payload") or {}
+            result = ExecutionResult(
+                data=payload.get("data"), errors=payload.get("errors")
+            )
+            if not await subscription.deliver(result):
+                self._subscriptions.pop(subscription.id, None)
+                subscription.fail(
+                    SubscriptionOverflowError(
+                        f"more than {self._queue_size} results queued "
+                        f"for subscription {subscription.id}"
+                    )
+                )
+                await self._send_stop(subscription)
+        elif kind in ("error", "complete"):
+            self._subscriptions.pop(subscription.id, None)
+            if kind == "error":
+                errors = message.get("payload")
+                if not isinstance(errors, list):
+                    errors = [errors]
+                subscription.complete(ExecutionResult(errors=errors))
+            else:
+                subscription.complete()
+
+    def _give_up(self, error: Exception) -> None:
+        self._logger.error(f"Giving up connecting to {self._endpoint}: {error}")
+        self._error = error
+        for subscription in list(self._subscriptions.values()):
+            subscription.fail(error)
+        self._subscriptions.clear()
+
+    async def _close_connection(self) -> None:
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                await connection.aclose()
+            except Exception:  # pylint: disable=broad-except
+                pass
@@ -1,6 +1,18 @@
 import asyncio
+import json
 import random
-from typing import Any, Dict, Iterable, List, Optional
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Union,
+)
 
 try:
     import trio
@@ -18,12 +30,241 @@ async def sleep(seconds: float, backend=None) -> None:
         backend (optional): force backend to use asyncio even if trio is installed.
             Defaults to None.
     """
-    if backend == "asyncio" or BACKEND == "asyncio":
+    if use_asyncio(backend):
         await asyncio.sleep(seconds)
     else:
         await trio.sleep(seconds)
 
 
+def use_asyncio(backend=None) -> bool:
+    """wether asyncio should be used instead of trio
+
+    Args:
+        backend (optional): force backend to use asyncio even if trio is installed.
+            Defaults to None.
+    """
+    return backend == "asyncio" or BACKEND == "asyncio"
+
+
+def create_semaphore(value: int, backend=None) -> Any:
+    """create a semaphore for the backend in use"""
+    if use_asyncio(backend):
+        return asyncio.Semaphore(value)
+    return trio.Semaphore(value)
+
+
+def create_event(backend=None) -> Any:
+    """create an event for the backend in use"""
+    if use_asyncio(backend):
+        return asyncio.Event()
+    return trio.Event()
+
+
+async def _aiter_items(items: Union[Iterable[Any], AsyncIterable[Any]]):
+    """iterate lazily over a sync or async iterable"""
+    if hasattr(items, "__aiter__"):
+        async for item in items:  # type: ignore
+            yield item
+    else:
+        for item in items:  # type: ignore
+            yield item
+
+
+async def merge_concurrently(
+    worker: Callable[[Any, Callable[[Any], Awaitable[None]]], Awaitable[None]],
+    items: Union[Iterable[Any], AsyncIterable[Any]],
+    max_concurrency: int = 10,
+    backend=None,
+) -> AsyncIterator[Any]:
+    """run `worker` over `items` with at most `max_concurrency` workers at a time
+    and yield every value the workers send, as soon as it is sent.
+
+    each worker is called as `await worker(item, send)` and can call
+    `await send(value)` as many times as needed, `send` blocks while the consumer
+    is behind which applies backpressure on the workers. items are consumed lazily,
+    a new item is only pulled when a worker slot is free.
+
+    the first exception raised by a worker cancels all the other workers and is
+    raised to the consumer.
+
+    Args:
+        worker: async callable taking an item and a `send` coroutine function
+        items: sync or async iterable of items
+        max_concurrency (optional): max number of workers running at the same time.
+            Defaults to 10.
+        backend (optional): force backend to use asyncio even if trio is installed.
+            Defaults to None.
+    """
+    assert max_concurrency > 0
+
+    if use_asyncio(backend):
+        async for value in _merge_concurrently_asyncio(worker, items, max_concurrency):
+            yield value
+    else:
+        async for value in _merge_concurrently_trio(worker, items, max_concurrency):
+            yield value
+
+
+_DONE = object()
+
+
+async def _merge_concurrently_asyncio(worker, items, max_concurrency):
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_concurrency)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    tasks: set = set()
+
+    async def run(item):
+        try:
+            await worker(item, queue.put)
+        except Exception as error:  # pylint: disable=broad-except
+            await queue.put(_WorkerError(error))
+        finally:
+            semaphore.release()
+
+    async def feed():
+        try:
+            async for item in _aiter_items(items):
+                await semaphore.acquire()
+                task = asyncio.ensure_future(run(item))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(list(tasks))
+        except Exception as error:  # pylint: disable=broad-except
+            await queue.put(_WorkerError(error))
+        await queue.put(_DONE)
+
+    feeder = asyncio.ensure_future(feed())
+    try:
+        while True:
+            value = await queue.get()
+            if value is _DONE:
+                break
+            if isinstance(value, _WorkerError):
+                raise value.error
+            yield value
+    finally:
+        feeder.cancel()
+        for task in list(tasks):
+            task.cancel()
+        await asyncio.gather(feeder, *tasks, return_exceptions=True)
+
+
+async def _merge_concurrently_trio(worker, items, max_concurrency):
+    send_channel, receive_channel = trio.open_memory_channel(max_concurrency)
+    semaphore = trio.Semaphore(max_concurrency)
+
+    async def run(item):
+        try:
+            await worker(item, send_channel.send)
+        finally:
+            semaphore.release()
+
+    async def feed():
+        async with send_channel:
+            async with trio.open_nursery() as workers:
+                async for item in _aiter_items(items):
+                    await semaphore.acquire()
+                    workers.start_soon(run, item)
+
+    async with trio.open_nursery() as nursery:
+        nursery.start_soon(feed)
+        async with receive_channel:
+            async for value in receive_channel:
+                yield value
+
+
+async def hedge(
+    call: Callable[[], Awaitable[Any]],
+    delay: float,
+    can_hedge: Optional[Callable[[], bool]] = None,
+    backend=None,
+) -> Any:
+    """await `call()`, and if it didn't complete after `delay` seconds start a
+    duplicate `call()` and return the result of whichever succeeds first, the
+    other one is cancelled.
+
+    an error before `delay` is raised right away, after that an error is only
+    raised once both calls failed.
+
+    Args:
+        call: coroutine function to call, must be idempotent
+        delay: seconds to wait before starting the duplicate call
+        can_hedge (optional): called when the delay expires, the duplicate call
+            is only started if it returns True. Defaults to None (always).
+        backend (optional): force backend to use asyncio even if trio is installed.
+            Defaults to None.
+    """
+    if use_asyncio(backend):
+        return await _hedge_asyncio(call, delay, can_hedge)
+    return await _hedge_trio(call, delay, can_hedge)
+
+
+async def _hedge_asyncio(call, delay, can_hedge):
+    tasks = [asyncio.ensure_future(call())]
+    try:
+        done, pending = await asyncio.wait(tasks, timeout=delay)
+        if not done and (can_hedge is None or can_hedge()):
+            tasks.append(asyncio.ensure_future(call()))
+            pending = set(tasks)
+        errors = []
+        while True:
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                errors.append(task.exception())
+            if not pending:
+                raise errors[0]
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _hedge_trio(call, delay, can_hedge):
+    send_channel, receive_channel = trio.open_memory_channel(2)
+
+    async def attempt():
+        try:
+            outcome = (None, await call())
+        except Exception as error:  # pylint: disable=broad-except
+            outcome = (error, None)
+        send_channel.send_nowait(outcome)
+
+    async with trio.open_nursery() as nursery:
+        nursery.start_soon(attempt)
+        running = 1
+        with trio.move_on_after(delay) as scope:
+            error, value = await receive_channel.receive()
+        if scope.cancelled_caught:
+            if can_hedge is None or can_hedge():
+                nursery.start_soon(attempt)
+                running += 1
+            error, value = await receive_channel.receive()
+        running -= 1
+        if error is not None and running:
+            first_error = error
+            error, value = await receive_channel.receive()
+            if error is not None:
+                error = first_error
+        nursery.cancel_scope.cancel()
+    if error is not None:
+        raise error
+    return value
+
+
+class _WorkerError:
+    """wraps an exception raised by a worker to send it to the consumer"""
+
+    __slots__ = ("error",)
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+
 class RetryError(Exception):
     """Custom exception thrown when retry logic fails"""
 
@@ -31,9 +272,25 @@ class RetryError(Exception):
         """update the Exception message to take into account the rety logic"""
         message = "Failed {} retries: {}".format(retries_count, last_exception)
         super().__init__(message)
+        self.retries_count = retries_count
         self.last_exception = last_exception
 
 
+class InvalidResponseError(Exception):
+    """Custom exception thrown when the server answers with something that is
+    not a graphql response"""
+
+
+class ExecutionError(Exception):
+    """Custom exception thrown when a result contains graphql errors
+    where data was expected"""
+
+    def __init__(self, result: "ExecutionResult") -> None:
+        """keep the failing result to allow inspecting its errors"""
+        super().__init__("Execution returned errors: {}".format(result.errors))
+        self.result = result
+
+
 class RandomExponentialSleep:
     """Random wait with exponentially widening window.
     An exponential backoff strategy used to mediate contention between multiple
@@ -120,3 +377,33 @@ class ExecutionResult:
 
     def __ne__(self, other: Any) -> bool:
         return not self == other
+
+
+class RawResult:
+    """The undecoded result of GraphQL execution, see BaseClientAsync.execute_raw
+    - ``content`` is the json body of the response, decompressed.
+    - ``status_code`` and ``headers`` are the ones of the response.
+    - ``has_errors`` is wether the body has top level ``errors``.
+    """
+
+    __slots__ = "content", "status_code", "headers", "has_errors"
+
+    def __init__(
+        self, content: bytes, status_code: int, headers: Any, has_errors: bool
+    ):
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers
+        self.has_errors = has_errors
+
+    def __repr__(self) -> str:
+        name = self.__class__.__name__
+        return (
+            f"{name}(status_code={self.status_code}, size={len(self.content)}, "
+            f"has_errors={self.has_errors})"
+        )
+
+    def decode(self, loads: Callable[[bytes], Any] = json.loads) -> ExecutionResult:
+        """decode the body, e.g with `client.codec.loads`"""
+        result = loads(self.content)
+        return ExecutionResult(data=result.get("data"), errors=result.get("errors"))
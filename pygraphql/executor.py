@@ -0,0 +1,363 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pygraphql.client.base import BaseClientAsync
+from pygraphql.client.document import CompiledQuery
+from pygraphql.client.ratelimit import SharedRateLimiter
+from pygraphql.client.utils import merge_concurrently
+
+OUTPUTS = ("result", "bytes")
+
+
+class ExecutorError(Exception):
+    """an execution failed in a worker process, the original exception can't
+    always be sent between processes so only its type name and message are kept"""
+
+    def __init__(self, error_type: str, message: str):
+        super().__init__(f"{error_type}: {message}")
+        self.error_type = error_type
+
+
+class WorkerCrashError(ExecutorError):
+    """a worker process died while executing the query"""
+
+    def __init__(self, message: str):
+        super().__init__("WorkerCrashError", message)
+
+
+class _Worker:
+    __slots__ = "process", "tasks", "in_flight"
+
+    def __init__(self, process: Any, tasks: Any):
+        self.process = process
+        self.tasks = tasks
+        self.in_flight: Dict[int, Any] = {}
+
+
+class ProcessExecutor:
+    """Execute a query over a stream of variables with a pool of processes, for
+    the extractions where a single process is CPU bound (json decoding, TLS)
+    before the network is saturated.
+
+    the variables are sharded across `processes` workers, each one running its
+    own asyncio event loop and client with at most `max_concurrency` executions
+    at a time, and the results are streamed back to the parent as they arrive.
+
+    - `ordered=True` yields the results in the order of the variables, otherwise
+      as soon as they are received. the parent keeps at most `window` variables
+      in flight, buffered results included, so memory stays bounded.
+    - `output="bytes"` sends the bodies of the responses as they were received
+      (see BaseClientAsync.execute_raw), e.g to write them to a file without
+      decoding them, otherwise the results are ExecutionResult objects.
+    - `rate` and `burst` set a rate limit shared by all the workers (see
+      pygraphql.client.ratelimit.SharedRateLimiter), the pauses requested by the
+      rate limit headers are shared too.
+    - a worker that dies is restarted and its executions are sent again, up to
+      `max_restarts` times. an execution that was in flight in
+      `max_task_crashes` dead workers fails with a WorkerCrashError.
+
+    example:
+        >>> executor = ProcessExecutor(query, endpoint=endpoint, auth=auth,
+                processes=8, max_concurrency=20, rate=200, output="bytes")
+        >>> for variables, payload in executor.map(variables_iterable):
+        >>>     file.write(payload + b"\\n")
+
+    takes the same kwargs as BaseClientAsync, they are sent to the workers so
+    they must be picklable, the workers use the asyncio backend.
+    """
+
+    def __init__(
+        self,
+        query: str,
+        processes: Optional[int] = None,
+        max_concurrency: int = 10,
+        ordered: bool = False,
+        output: str = "result",
+        rate: Optional[float] = None,
+        burst: int = 1,
+        window: Optional[int] = None,
+        max_restarts: int = 3,
+        max_task_crashes: int = 2,
+        return_exceptions: bool = False,
+        mp_context: Any = None,
+        **kwargs: Any,
+    ):
+        """
+        Args:
+            query: the query string
+            processes (optional): number of worker processes.
+                Defaults to None (the number of CPUs).
+            max_concurrency (optional): max concurrent executions of a worker.
+                Defaults to 10.
+            ordered (optional): wether to yield the results in the order of the
+                variables. Defaults to False.
+            output (optional): "result" or "bytes". Defaults to "result".
+            rate (optional): max requests per second of all the workers.
+                Defaults to None (no limit).
+            burst (optional): max requests sent at once when the rate limit
+                bucket is full. Defaults to 1.
+            window (optional): max variables in flight.
+                Defaults to None (2 * processes * max_concurrency).
+            max_restarts (optional): max restarts of dead workers. Defaults to 3.
+            max_task_crashes (optional): max worker deaths an execution can be in
+                flight for. Defaults to 2.
+            return_exceptions (optional): wether to yield the errors of the
+                executions instead of raising them. Defaults to False.
+            mp_context (optional): multiprocessing context, e.g
+                multiprocessing.get_context("spawn"). Defaults to None (the
+                default context).
+
+        Raises:
+            DocumentSyntaxError: if the query is not valid
+        """
+        assert output in OUTPUTS, f"output must be one of {OUTPUTS}"
+        assert max_concurrency > 0
+        CompiledQuery(query)
+        self._query = query
+        self.processes = processes or os.cpu_count() or 1
+        self.max_concurrency = max_concurrency
+        self.ordered = ordered
+        self.output = output
+        self.window = window or 2 * self.processes * max_concurrency
+        self.max_restarts = max_restarts
+        self.max_task_crashes = max_task_crashes
+        self.return_exceptions = return_exceptions
+        self._context = mp_context or multiprocessing.get_context()
+        self._rate_limiter = None
+        if rate is not None:
+            self._rate_limiter = SharedRateLimiter(
+                rate, burst, mp_context=self._context
+            )
+        kwargs["backend"] = "asyncio"
+        self._kwargs = kwargs
+        self.restarts = 0
+        self._logger = logging.getLogger(__name__)
+
+    def map(
+        self, variables: Iterable[Dict[str, Any]], **kwargs: Any
+    ) -> Iterator[Tuple[Dict[str, Any], Any]]:
+        """execute the query with each set of variables, the workers are started
+        when the iteration starts and stopped when it ends
+
+        Args:
+            variables: iterable of variables, consumed lazily
+            **kwargs: kwargs of BaseClientAsync.execute (max_tries, ...), or of
+                BaseClientAsync.execute_raw with `output="bytes"`
+
+        Raises:
+            ExecutorError: if an execution failed, unless `return_exceptions`
+            WorkerCrashError: if the workers died more than `max_restarts` times
+
+        Yields:
+            Tuple[dict, Any]: the variables and their ExecutionResult or encoded
+                result (or error if `return_exceptions`)
+        """
+        results = self._context.Queue()
+        workers = [self._start_worker(results, kwargs) for _ in range(self.processes)]
+        items = enumerate(variables)
+        exhausted = False
+        buffered: Dict[int, Tuple[Dict[str, Any], Any]] = {}
+        crashes: Dict[int, int] = {}
+        next_index = 0
+        try:
+            while True:
+                in_flight = sum(len(worker.in_flight) for worker in workers)
+                while not exhausted and in_flight + len(buffered) < self.window:
+                    try:
+                        index, item = next(items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    worker = min(workers, key=lambda worker: len(worker.in_flight))
+                    worker.in_flight[index] = item
+                    worker.tasks.put((index, item))
+                    in_flight += 1
+                if exhausted and not in_flight and not buffered:
+                    return
+
+                done = self._check_workers(workers, results, kwargs, crashes)
+                try:
+                    index, payload, error = results.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+                else:
+                    # not found if it's a duplicate: the result of an execution
+                    # sent again after the death of its worker
+                    for worker in workers:
+                        if index in worker.in_flight:
+                            item = worker.in_flight.pop(index)
+                            if error is not None:
+                                payload = ExecutorError(*error)
+                            done.append((index, item, payload))
+
+                for index, item, value in done:
+                    if isinstance(value, ExecutorError) and not self.return_exceptions:
+                        raise value
+                    if not self.ordered:
+                        yield item, value
+                    else:
+                        buffered[index] = (item, value)
+                while next_index in buffered:
+                    yield buffered.pop(next_index)
+                    next_index += 1
+        finally:
+            self._stop_workers(workers)
+
+    def _start_worker(self, results: Any, kwargs: Dict[str, Any]) -> _Worker:
+        tasks = self._context.Queue()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(
+                self._query,
+                self._kwargs,
+                kwargs,
+                self.max_concurrency,
+                self.output,
+                self._rate_limiter,
+                tasks,
+                results,
+            ),
+            daemon=True,
+        )
+        process.start()
+        return _Worker(process, tasks)
+
+    def _check_workers(
+        self,
+        workers: List[_Worker],
+        results: Any,
+        kwargs: Dict[str, Any],
+        crashes: Dict[int, int],
+    ) -> List[Tuple[int, Dict[str, Any], Any]]:
+        """restart the dead workers and send their executions again, returns the
+        executions that crashed too many workers"""
+        failed = []
+        for position, worker in enumerate(workers):
+            if worker.process.is_alive():
+                continue
+            exitcode = worker.process.exitcode
+            if self.restarts >= self.max_restarts:
+                raise WorkerCrashError(
+                    f"worker died with exit code {exitcode}, "
+                    f"{self.restarts} restarts already"
+                )
+            self.restarts += 1
+            self._logger.warning(
+                f"Worker died with exit code {exitcode}, restarting it "
+                f"({len(worker.in_flight)} executions in flight)"
+            )
+            restarted = self._start_worker(results, kwargs)
+            for index, item in worker.in_flight.items():
+                crashes[index] = crashes.get(index, 0) + 1
+                if crashes[index] >= self.max_task_crashes:
+                    failed.append(
+                        (
+                            index,
+                            item,
+                            WorkerCrashError(
+                                f"{crashes[index]} workers died executing it"
+                            ),
+                        )
+                    )
+                else:
+                    restarted.in_flight[index] = item
+                    restarted.tasks.put((index, item))
+            worker.tasks.close()
+            workers[position] = restarted
+        return failed
+
+    def _stop_workers(self, workers: List[_Worker]) -> None:
+        """stop the idle workers, the busy ones are terminated (the iteration
+        was stopped early or failed)"""
+        for worker in workers:
+            if worker.in_flight:
+                worker.process.terminate()
+            elif worker.process.is_alive():
+                worker.tasks.put(None)
+        for worker in workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+            worker.tasks.close()
+
+
+def _worker_main(
+    query: str,
+    client_kwargs: Dict[str, Any],
+    execute_kwargs: Dict[str, Any],
+    max_concurrency: int,
+    output: str,
+    rate_limiter: Optional[SharedRateLimiter],
+    tasks: Any,
+    results: Any,
+) -> None:
+    """entry point of the worker processes"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(
+            _worker(
+                query,
+                client_kwargs,
+                execute_kwargs,
+                max_concurrency,
+                output,
+                rate_limiter,
+                tasks,
+                results,
+            )
+        )
+    finally:
+        loop.close()
+        # wait for the results to be flushed to the parent
+        results.close()
+        results.join_thread()
+
+
+async def _worker(
+    query: str,
+    client_kwargs: Dict[str, Any],
+    execute_kwargs: Dict[str, Any],
+    max_concurrency: int,
+    output: str,
+    rate_limiter: Optional[SharedRateLimiter],
+    tasks: Any,
+    results: Any,
+) -> None:
+    if rate_limiter is not None:
+        client_kwargs = {**client_kwargs, "rate_limiter": rate_limiter}
+    client = BaseClientAsync(**client_kwargs)
+    document = CompiledQuery(query)
+    loop = asyncio.get_event_loop()
+
+    async def receive():
+        while True:
+            task = await loop.run_in_executor(None, tasks.get)
+            if task is None:
+                return
+            yield task
+
+    async def execute(task, _send):
+        index, variables = task
+        try:
+            if output == "bytes":
+                raw = await client.execute_raw(document, variables, **execute_kwargs)
+                results.put((index, raw.content, None))
+            else:
+                result = await client.execute(document, variables, **execute_kwargs)
+                results.put((index, result, None))
+        except Exception as error:  # pylint: disable=broad-except
+            results.put((index, None, (type(error).__name__, str(error))))
+
+    try:
+        async for _ in merge_concurrently(
+            execute, receive(), max_concurrency, backend="asyncio"
+        ):
+            pass
+    finally:
+        await client.aclose()
@@ -0,0 +1,294 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from pygraphql.client.base import BaseClientAsync
+from pygraphql.client.registry import default_registry
+from pygraphql.client.document import Field, parse, print_tokens
+from pygraphql.client.utils import ExecutionResult, create_event, sleep
+
+
+class LoaderCancelledError(Exception):
+    """the call executing a mutation batch was cancelled after sending it, the
+    mutation may have been applied or not"""
+
+
+class QueryLoader:
+    """DataLoader-style micro-batching of a query
+
+    calls made within `batch_window` seconds (or until `max_batch_size` calls)
+    are merged in a single document where each call gets its own aliased root
+    fields and renamed variables:
+
+        query($id: ID!) { user(id: $id) { name } }
+
+    called with 2 different ids, executes:
+
+        query($id_0: ID!, $id_1: ID!) {
+            _0_user: user(id: $id_0) { name }
+            _1_user: user(id: $id_1) { name }
+        }
+
+    each caller then gets its own ExecutionResult with its data under the
+    original keys and the errors whose path points to its fields (errors
+    without path are given to all the callers). Identical calls of a query
+    batch share the same aliases, the calls of a mutation are never merged
+    this way: each of them is executed. Unlike transport batching this works
+    against any spec compliant server.
+
+    when the call executing a batch is cancelled, the other calls of the batch
+    are queued again if the batch wasn't sent yet, or if it is a query. a
+    mutation may have been applied by the server: its calls raise a
+    LoaderCancelledError instead of writing twice.
+
+    example:
+        >>> get_user = QueryLoader(
+                "query($id: ID!) { user(id: $id) { name } }", client=client
+            )
+        >>> results = await asyncio.gather(*(get_user({"id": i}) for i in ids))
+
+    takes exactly the same kwargs as pygraphql.Query
+    """
+
+    def __init__(
+        self,
+        query: str,
+        max_batch_size: int = 50,
+        batch_window: float = 0.005,
+        **kwargs: Any,
+    ):
+        """initialise the loader
+
+        Args:
+            query: the query string, with a single operation whose root selections
+                are fields, fragments used must not reference variables.
+            max_batch_size (optional): max number of calls merged in a document,
+                a full batch is executed right away. Defaults to 50.
+            batch_window (optional): time in seconds to wait for other calls
+                after the first call of a batch. Defaults to 0.005.
+        """
+        assert max_batch_size > 0
+        self._client = kwargs.get("client")
+        self._registry = kwargs.pop("registry", default_registry())
+        self._kwargs = kwargs
+        self._backend = (
+            self._client.backend
+            if isinstance(self._client, BaseClientAsync)
+            else kwargs.get("backend")
+        )
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+
+        self._document = parse(query)
+        operations = self._document.operations
+        if len(operations) != 1 or operations[0].kind == "subscription":
+            raise ValueError("QueryLoader needs a single query or mutation")
+        self._operation = operations[0]
+        if not all(isinstance(item, Field) for item in self._operation.selections):
+            raise ValueError("QueryLoader needs fields at the root of the operation")
+        for fragment in self._document.fragments.values():
+            tokens = self._document.tokens[fragment.start : fragment.end]
+            if ("punctuator", "$") in tokens:
+                raise ValueError("QueryLoader fragments can't reference variables")
+        self._batch: Optional[_Batch] = None
+
+    async def __call__(self, variables: Dict[str, Any]) -> ExecutionResult:
+        """queue a call in the current batch and wait for its result
+
+        Args:
+            variables: variables of the query or empty dict
+
+        Returns:
+            ExecutionResult: result of the call
+        """
+        batch = self._batch
+        if batch is None or batch.dispatched:
+            batch = self._batch = _Batch(create_event(self._backend))
+        index = len(batch.variables)
+        batch.variables.append(variables)
+
+        if len(batch.variables) >= self.max_batch_size:
+            await self._dispatch(batch)
+        elif index == 0:
+            # the first call of a batch waits for others, then executes it
+            try:
+                await sleep(self.batch_window, backend=self._backend)
+            except BaseException:
+                if not batch.dispatched:
+                    self._abandon(batch)
+                raise
+            if not batch.dispatched:
+                await self._dispatch(batch)
+
+        await batch.done.wait()
+        if batch.abandoned:
+            return await self(variables)
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[index]
+
+    def _abandon(self, batch: "_Batch") -> None:
+        """the first call was cancelled before executing the batch, the other
+        calls are queued again in a new batch"""
+        batch.dispatched = batch.abandoned = True
+        if self._batch is batch:
+            self._batch = None
+        batch.done.set()
+
+    async def _dispatch(self, batch: "_Batch") -> None:
+        batch.dispatched = True
+        if self._batch is batch:
+            self._batch = None
+        try:
+            query, variables, slots = self._merge(batch.variables)
+            if isinstance(self._client, BaseClientAsync):
+                result = await self._execute(batch, self._client, query, variables)
+            elif self._registry is not None:
+                client = await self._registry.acquire(self._kwargs)
+                try:
+                    result = await self._execute(batch, client, query, variables)
+                finally:
+                    self._registry.release(client)
+            else:
+                async with BaseClientAsync(**self._kwargs) as client:
+                    result = await self._execute(batch, client, query, variables)
+            batch.results = self._split(result, slots)
+        except Exception as error:  # pylint: disable=broad-except
+            batch.error = error
+        finally:
+            if batch.error is None and not batch.results:
+                # cancelled while executing, a mutation can't be replayed
+                if batch.sent and self._operation.kind == "mutation":
+                    batch.error = LoaderCancelledError(
+                        "The mutation batch was cancelled after being sent"
+                    )
+                else:
+                    batch.abandoned = True
+            batch.done.set()
+
+    @staticmethod
+    async def _execute(
+        batch: "_Batch", client: BaseClientAsync, query: str, variables: Dict
+    ) -> ExecutionResult:
+        batch.sent = True
+        return await client.execute(query, variables)
+
+    def _merge(
+        self, batch_variables: List[Dict[str, Any]]
+    ) -> Tuple[str, Dict[str, Any], List[int]]:
+        """merge the calls in a single document, returns the query, its variables
+        and the slot of each call (identical calls of a query share the same
+        slot)"""
+        tokens = self._document.tokens
+        operation = self._operation
+
+        slots: List[int] = []
+        slot_of_key: Dict[str, int] = {}
+        definitions: List[Tuple[str, str]] = []
+        selections: List[Tuple[str, str]] = []
+        merged_variables: Dict[str, Any] = {}
+        for index, variables in enumerate(batch_variables):
+            if operation.kind == "query":
+                key = json.dumps(variables, sort_keys=True, default=str)
+            else:
+                key = str(index)  # a write per call
+            if key in slot_of_key:
+                slots.append(slot_of_key[key])
+                continue
+            slot = slot_of_key[key] = len(slot_of_key)
+            slots.append(slot)
+
+            for definition in operation.variables:
+                definitions.extend(
+                    _rename_variables(tokens[definition.start : definition.end], slot)
+                )
+            for field in operation.selections:
+                selections.append(("name", _alias(slot, field.response_key)))
+                selections.append(("punctuator", ":"))
+                selections.extend(
+                    _rename_variables(tokens[field.name_index : field.end], slot)
+                )
+            for name, value in variables.items():
+                merged_variables[f"{name}_{slot}"] = value
+
+        merged: List[Tuple[str, str]] = [("name", operation.kind)]
+        if operation.name:
+            merged.append(("name", operation.name))
+        if definitions:
+            merged += [("punctuator", "(")] + definitions + [("punctuator", ")")]
+        merged += [("punctuator", "{")] + selections + [("punctuator", "}")]
+        for fragment in self._document.fragments.values():
+            merged.extend(tokens[fragment.start : fragment.end])
+        return print_tokens(merged), merged_variables, slots
+
+    def _split(
+        self, result: ExecutionResult, slots: List[int]
+    ) -> List[ExecutionResult]:
+        """demultiplex the result of a merged document to each call"""
+        owners = {
+            _alias(slot, field.response_key): (slot, field.response_key)
+            for slot in set(slots)
+            for field in self._operation.selections
+        }
+        slot_errors: Dict[int, List[Any]] = {slot: [] for slot in slots}
+        for error in result.errors or []:
+            path = error.get("path") if isinstance(error, dict) else None
+            if path and path[0] in owners:
+                slot, key = owners[path[0]]
+                slot_errors[slot].append({**error, "path": [key] + path[1:]})
+            else:
+                for errors in slot_errors.values():
+                    errors.append(error)
+
+        results = []
+        for slot in slots:
+            data = None
+            if result.data is not None:
+                data = {
+                    field.response_key: result.data.get(
+                        _alias(slot, field.response_key)
+                    )
+                    for field in self._operation.selections
+                }
+            results.append(ExecutionResult(data=data, errors=slot_errors[slot] or None))
+        return results
+
+
+class _Batch:
+    """calls collected by a QueryLoader"""
+
+    __slots__ = (
+        "variables",
+        "done",
+        "dispatched",
+        "sent",
+        "abandoned",
+        "results",
+        "error",
+    )
+
+    def __init__(self, done: Any):
+        self.variables: List[Dict[str, Any]] = []
+        self.done = done
+        self.dispatched = False
+        self.sent = False  # the merged document was given to the client
+        self.abandoned = False
+        self.results: List[ExecutionResult] = []
+        self.error: Optional[Exception] = None
+
+
+def _alias(slot: int, key: str) -> str:
+    return f"_{slot}_{key}"
+
+
+def _rename_variables(
+    tokens: List[Tuple[str, str]], slot: int
+) -> List[Tuple[str, str]]:
+    """suffix the variables (`$name`) of tokens with the slot"""
+    renamed = []
+    after_dollar = False
+    for kind, value in tokens:
+        if after_dollar and kind == "name":
+            value = f"{value}_{slot}"
+        after_dollar = (kind, value) == ("punctuator", "$")
+        renamed.append((kind, value))
+    return renamed
@@ -1,7 +1,22 @@
-from typing import Any, Dict
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Optional,
+    Tuple,
+    Union,
+)
 
 from pygraphql.client.base import BaseClientAsync
-from pygraphql.client.utils import ExecutionResult
+from pygraphql.client.document import CompiledQuery
+from pygraphql.client.registry import default_registry
+from pygraphql.client.utils import (
+    ExecutionError,
+    ExecutionResult,
+    merge_concurrently,
+)
 
 
 class Query:
@@ -18,16 +33,33 @@ class Query:
                 or:
                 >>> get_data = Query("...query_str...", endpoint=endpoint, auth=auth)
 
-            in both last examples, Query will use provided kwargs to create client that
-            will execute the query each time it is called
+            in both last examples, Query will use provided kwargs to get a client
+            from a registry of long lived clients (see
+            pygraphql.client.registry.ClientRegistry), shared by the Query objects
+            with the same kwargs and closed when their event loop ends.
+            `registry=ClientRegistry(...)` sets the registry, `registry=None`
+            creates a new client for each call.
 
             takes exactly the same kwargs as pygraphql.BaseClientAsync
 
+            the query is compiled once (see pygraphql.client.document.CompiledQuery):
+            it is sent minified with a pre-encoded payload, and the variables of
+            each call are validated against its declarations before any request.
+            `strict_variables=True` also rejects the variables it doesn't
+            declare, they are sent and ignored by the server by default.
+
         Args:
             query: the query string
+
+        Raises:
+            DocumentSyntaxError: if the query is not valid
         """
         self._client = kwargs.get("client")
+        self._registry = kwargs.pop("registry", default_registry())
         self._query = query
+        self._document = CompiledQuery(
+            query, strict=kwargs.pop("strict_variables", False)
+        )
         self._kwargs = kwargs
 
     async def __call__(
@@ -53,9 +85,204 @@ class Query:
             exc_info (optional): wether to log exec info in case of exception.
                     Defaults to False.
 
+        Raises:
+            VariablesError: if the variables don't match the declarations
+
         Returns:
             ExecutionResult: result of the query
         """
+        if isinstance(self._client, BaseClientAsync):
+            return await self._client.execute(
+                self._document,
+                variables,
+                max_tries,
+                random_exponential_sleep_multiplier,
+                random_exponential_sleep_max_sleep,
+                random_exponential_sleep_exp_base,
+                random_exponential_sleep_min_sleep,
+                exc_info,
+            )
+
+        self._document.validate(variables)  # before creating a client
+        if self._registry is not None:
+            client = await self._registry.acquire(self._kwargs)
+            try:
+                return await client.execute(
+                    self._document,
+                    variables,
+                    max_tries,
+                    random_exponential_sleep_multiplier,
+                    random_exponential_sleep_max_sleep,
+                    random_exponential_sleep_exp_base,
+                    random_exponential_sleep_min_sleep,
+                    exc_info,
+                )
+            finally:
+                self._registry.release(client)
+
+        async with BaseClientAsync(**self._kwargs) as client:
+            return await client.execute(
+                self._document,
+                variables,
+                max_tries,
+                random_exponential_sleep_multiplier,
+                random_exponential_sleep_max_sleep,
+                random_exponential_sleep_exp_base,
+                random_exponential_sleep_min_sleep,
+                exc_info,
+            )
+
+    async def map(
+        self,
+        variables: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]],
+        max_concurrency: int = 10,
+        ordered: bool = True,
+        return_exceptions: bool = True,
+        **kwargs: Any,
+    ) -> AsyncIterator[Tuple[Dict[str, Any], Any]]:
+        """execute the query with each set of variables, at most
+        `max_concurrency` at a time over a single client, see
+        BaseClientAsync.execute_all
+
+            >>> async for variables, result in get_issues.map(repositories):
+            >>>     ...
+
+        Args:
+            variables: sync or async iterable of variables dicts, consumed lazily
+            max_concurrency (optional): max executions at the same time.
+                Defaults to 10.
+            ordered (optional): wether to yield the results in the order of the
+                variables. Defaults to True.
+            return_exceptions (optional): wether to yield the exceptions of the
+                executions that failed instead of raising them. Defaults to True.
+            **kwargs: kwargs of `__call__` (max_tries, ...)
+
+        Yields:
+            Tuple[dict, Any]: the variables and their ExecutionResult or exception
+        """
+        kwargs = dict(
+            max_concurrency=max_concurrency,
+            ordered=ordered,
+            return_exceptions=return_exceptions,
+            **kwargs,
+        )
+        if isinstance(self._client, BaseClientAsync):
+            async for item in self._client.execute_all(
+                self._document, variables, **kwargs
+            ):
+                yield item
+            return
+
+        if self._registry is not None:
+            client = await self._registry.acquire(self._kwargs)
+            try:
+                async for item in client.execute_all(
+                    self._document, variables, **kwargs
+                ):
+                    yield item
+            finally:
+                self._registry.release(client)
+            return
+
+        async with BaseClientAsync(**self._kwargs) as client:
+            async for item in client.execute_all(self._document, variables, **kwargs):
+                yield item
+
+
+class BigQuery:
+    """run a query in parallel to get huge amount of data
+
+    the query must select a relay connection (`edges { node }` or `nodes`, and
+    `pageInfo { hasNextPage endCursor }`) at `aggregation_path`, and take the page
+    cursor as a variable (`$cursor` by default), for example:
+
+        >>> get_issues = BigQuery(
+                '''query($owner: String!, $name: String!, $cursor: String) {
+                    repository(owner: $owner, name: $name) {
+                        issues(first: 100, after: $cursor) {
+                            pageInfo { hasNextPage endCursor }
+                            edges { node { title url } }
+                        }
+                    }
+                }''',
+                aggregation_path="repository.issues",
+                endpoint=endpoint,
+            )
+        >>> async for issue in get_issues(partitions):
+                ...
+
+    each partition is a variables dict (e.g. one per repo or per key range),
+    partitions are paginated independently and at most `max_concurrency` of them
+    run at the same time, pages of a given partition are fetched one after the
+    other. Nodes are yielded as soon as their page is received.
+
+    takes exactly the same kwargs as pygraphql.Query
+    """
+
+    def __init__(
+        self,
+        query: str,
+        aggregation_path: str,
+        cursor_variable: str = "cursor",
+        max_concurrency: int = 10,
+        backward: bool = False,
+        **kwargs: Any,
+    ):
+        """initialise the BigQuery object
+
+        Args:
+            query: the query string
+            aggregation_path: dot separated path to the connection in the result
+                data, e.g: "repository.issues"
+            cursor_variable (optional): name of the query variable holding the
+                cursor. Defaults to "cursor".
+            max_concurrency (optional): max number of partitions fetched at the
+                same time. Defaults to 10.
+            backward (optional): paginate backward (`last`/`before`) using
+                `startCursor` and `hasPreviousPage`. Defaults to False.
+        """
+        self._client = kwargs.get("client")
+        self._registry = kwargs.pop("registry", default_registry())
+        self._query = query
+        self._document = CompiledQuery(query)
+        self._kwargs = kwargs
+        self._path = aggregation_path.split(".")
+        self._cursor_variable = cursor_variable
+        self._max_concurrency = max_concurrency
+        self._backward = backward
+
+    async def __call__(
+        self,
+        partitions: Union[
+            Dict[str, Any], Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]
+        ],
+        max_tries: int = 5,
+        random_exponential_sleep_multiplier: float = 1,
+        random_exponential_sleep_max_sleep: float = 300,
+        random_exponential_sleep_exp_base: float = 2,
+        random_exponential_sleep_min_sleep: float = 0,
+        exc_info: bool = False,
+    ) -> AsyncIterator[Any]:
+        """iterate over all the nodes of all the partitions
+
+        Args:
+            partitions: a variables dict, or a (async) iterable of variables dicts,
+                consumed lazily.
+            max_tries (optional): max number of retries in case of errors.
+                        Defaults to 5.
+            random_exponential_sleep_multiplier (optional): Defaults to 1
+            random_exponential_sleep_max_sleep (optional):Defaults to 300
+            random_exponential_sleep_exp_base (optional): Defaults to 2.
+            random_exponential_sleep_min_sleep (optional): Defaults to 0.
+            exc_info (optional): wether to log exec info in case of exception.
+                    Defaults to False.
+
+        Raises:
+            ExecutionError: if a page is returned with errors
+
+        Yields:
+            the nodes of the connection
+        """
         exec_kwargs: Dict[str, Any] = {
             "max_tries": max_tries,
             "random_exponential_sleep_multiplier": random_exponential_sleep_multiplier,
@@ -64,33 +291,75 @@ class Query:
             "random_exponential_sleep_min_sleep": random_exponential_sleep_min_sleep,
             "exc_info": exc_info,
         }
+        if isinstance(partitions, dict):
+            partitions = [partitions]
+
         if isinstance(self._client, BaseClientAsync):
-            return await self._client.execute(
-                self._query,
-                variables,
-                **exec_kwargs,
-            )
+            async for node in self._iterate(self._client, partitions, exec_kwargs):
+                yield node
+            return
+
+        if self._registry is not None:
+            client = await self._registry.acquire(self._kwargs)
+            try:
+                async for node in self._iterate(client, partitions, exec_kwargs):
+                    yield node
+            finally:
+                self._registry.release(client)
+            return
 
         async with BaseClientAsync(**self._kwargs) as client:
-            return await client.execute(self._query, variables, **exec_kwargs)
+            async for node in self._iterate(client, partitions, exec_kwargs):
+                yield node
 
+    async def _iterate(
+        self,
+        client: BaseClientAsync,
+        partitions: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]],
+        exec_kwargs: Dict[str, Any],
+    ) -> AsyncIterator[Any]:
+        async def paginate(variables, send):
+            cursor = variables.get(self._cursor_variable)
+            while True:
+                result = await client.execute(
+                    self._document,
+                    {**variables, self._cursor_variable: cursor},
+                    **exec_kwargs,
+                )
+                if result.errors:
+                    raise ExecutionError(result)
+                connection = self._get_connection(result)
+                for node in _get_nodes(connection):
+                    await send(node)
+                cursor = self._get_next_cursor(connection)
+                if cursor is None:
+                    return
 
-# class BigQuery:
-#     """run a qurey in parrallel to get huge amount of data using trio.nursery?"""
+        async for node in merge_concurrently(
+            paginate, partitions, self._max_concurrency, backend=client.backend
+        ):
+            yield node
 
-#     def __init__(self, query: str, aggregation_path: str, **kwargs: Any):
-#         _assert_import_trio(name=self.__class__.__name__)
+    def _get_connection(self, result: ExecutionResult) -> Dict[str, Any]:
+        connection: Any = result.data
+        for key in self._path:
+            if not isinstance(connection, dict):
+                raise ExecutionError(result)
+            connection = connection.get(key)
+        return connection or {}
 
+    def _get_next_cursor(self, connection: Dict[str, Any]) -> Optional[str]:
+        page_info = connection.get("pageInfo") or {}
+        if self._backward:
+            has_next, cursor = page_info.get("hasPreviousPage"), "startCursor"
+        else:
+            has_next, cursor = page_info.get("hasNextPage"), "endCursor"
+        if not has_next:
+            return None
+        return page_info.get(cursor)
 
-# def _assert_import_trio(name: str = None) -> None:
-#     try:
-#         import trio  # pylint: disable=unused-import,import-outside-toplevel
 
-#     except ImportError as import_error:
-#         raise Exception(
-#             f"""trio not found, to use '{name}' please install pygraphql with 'trio':
-#                 $ pip install pygraphql[trio]
-#                 or from source
-#                 $ poery install -E trio
-#             """
-#         ) from import_error
+def _get_nodes(connection: Dict[str, Any]) -> Iterable[Any]:
+    if connection.get("edges") is not None:
+        return (edge["node"] for edge in connection["edges"])
+    return connection.get("nodes") or []
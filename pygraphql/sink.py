@@ -0,0 +1,490 @@
+import abc
+import array
+import csv
+import gzip
+import io
+from typing import (
+    Any,
+    AsyncIterable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Union,
+    cast,
+)
+
+from pygraphql.client.codec import JsonCodec, get_codec
+from pygraphql.client.utils import ExecutionError, ExecutionResult, _aiter_items
+from pygraphql.query import _get_nodes
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+Fields = Union[Sequence[str], Dict[str, str]]
+Values = Union[array.array, List[Any]]
+
+# python type of the values of the typed columns, the others are lists
+_TYPES = {"b": bool, "q": int, "d": float}
+
+
+class _Column:
+    """values of a field, in an array.array while they all have the same scalar
+    type, nulls are kept aside by row index"""
+
+    __slots__ = "values", "nulls", "_size"
+
+    def __init__(self) -> None:
+        self.values: Optional[Values] = None  # type unknown
+        self.nulls: Set[int] = set()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def typecode(self) -> Optional[str]:
+        """typecode of the array, None if the values are in a list"""
+        if isinstance(self.values, array.array):
+            return self.values.typecode
+        return None
+
+    def append(self, value: Any) -> None:
+        """append a value, the array becomes a list if it doesn't fit in it"""
+        if value is None:
+            self.nulls.add(self._size)
+        elif self.values is None:
+            self.values = _new_values(value, self._size)
+        elif self.typecode and not _fits(self.typecode, value):
+            self.values = self._untyped()
+        if self.values is not None:
+            if value is None:
+                value = 0 if self.typecode else None
+            self.values.append(value)
+        self._size += 1
+
+    def to_values(self) -> Values:
+        """the array, nulls being 0, or the list of values"""
+        if self.values is None:
+            return [None] * self._size
+        return self.values
+
+    def to_list(self) -> List[Any]:
+        """the values in a list, nulls being None"""
+        if self.values is None:
+            return [None] * self._size
+        return self._untyped() if self.typecode else list(self.values)
+
+    def _untyped(self) -> List[Any]:
+        """the values of the array in a list, nulls being None"""
+        values = self.values.tolist()  # type: ignore
+        if self.typecode == "b":
+            values = [bool(value) for value in values]
+        for index in self.nulls:
+            values[index] = None
+        return values
+
+
+def _new_values(value: Any, size: int) -> Union[array.array, List[Any]]:
+    """the values of a column, `size` rows of nulls followed by `value`"""
+    for typecode in _TYPES:
+        if _fits(typecode, value):
+            return array.array(typecode, [0] * size)
+    return [None] * size
+
+
+def _fits(typecode: str, value: Any) -> bool:
+    if type(value) is not _TYPES[typecode]:  # pylint: disable=unidiomatic-typecheck
+        return False
+    # array("q") overflows above 64 bits integers
+    return typecode != "q" or -(2**63) <= cast(int, value) < 2**63
+
+
+class ColumnBuffer:
+    """Flatten the nodes of connections into columns, a column per field.
+
+    `fields` are dot separated paths in the nodes, e.g "author.login", as a list
+    (the paths are the column names) or a dict of column name to path. a path
+    through a missing or null value gives None.
+
+    columns of booleans, integers or floats are stored in compact `array.array`
+    buffers (8 bytes per value instead of a python object), the other values in
+    lists.
+
+    example:
+        >>> buffer = ColumnBuffer(["title", "comments"], "repository.issues")
+        >>> buffer.append(result)
+        >>> buffer.columns()
+        {"title": ["a", "b"], "comments": array("q", [3, 0])}
+        >>> buffer.nulls()
+        {"title": set(), "comments": {1}}
+        >>> buffer.lists()
+        {"title": ["a", "b"], "comments": [3, None]}
+    """
+
+    def __init__(self, fields: Fields, aggregation_path: Optional[str] = None):
+        """
+        Args:
+            fields: paths of the fields in the nodes
+            aggregation_path (optional): dot separated path to the connection in
+                the result data, e.g "repository.issues", to append
+                ExecutionResults. Defaults to None.
+        """
+        if not isinstance(fields, dict):
+            fields = {field: field for field in fields}
+        self.names = list(fields)
+        self._paths = [path.split(".") for path in fields.values()]
+        self._aggregation_path = aggregation_path.split(".") if aggregation_path else []
+        self._columns = [_Column() for _ in self.names]
+        self._rows = 0
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def append(self, item: Union[ExecutionResult, Dict[str, Any]]) -> int:
+        """append an ExecutionResult (all the nodes of its connection) or a node
+
+        Raises:
+            ExecutionError: if the result has errors
+
+        Returns:
+            int: number of rows appended
+        """
+        if isinstance(item, ExecutionResult):
+            if item.errors:
+                raise ExecutionError(item)
+            connection = _get_path(item.data, self._aggregation_path)
+            if not isinstance(connection, dict):
+                return 0
+            rows = 0
+            for node in _get_nodes(connection):
+                self._append_node(node)
+                rows += 1
+            return rows
+        self._append_node(item)
+        return 1
+
+    def _append_node(self, node: Dict[str, Any]) -> None:
+        for column, path in zip(self._columns, self._paths):
+            column.append(_get_path(node, path))
+        self._rows += 1
+
+    def columns(self) -> Dict[str, Values]:
+        """the values of each column, without copy: the array.array of the typed
+        columns (see `typecodes`), whose nulls are 0 (see `nulls`), a list with
+        None for the nulls for the others"""
+        return {
+            name: column.to_values() for name, column in zip(self.names, self._columns)
+        }
+
+    def nulls(self) -> Dict[str, Set[int]]:
+        """the row indexes of the nulls of each typed column, empty for the
+        others"""
+        return {
+            name: column.nulls if column.typecode else set()
+            for name, column in zip(self.names, self._columns)
+        }
+
+    def lists(self) -> Dict[str, List[Any]]:
+        """the values of each column in lists, None for the nulls"""
+        return {
+            name: column.to_list() for name, column in zip(self.names, self._columns)
+        }
+
+    def typecodes(self) -> Dict[str, Optional[str]]:
+        """the array typecode of each column ("b", "q", "d"), None for the
+        columns of other values"""
+        return {
+            name: column.typecode for name, column in zip(self.names, self._columns)
+        }
+
+    def rows(self) -> Iterable[Dict[str, Any]]:
+        """the rows as dicts of column name to value"""
+        columns = self.lists()
+        for index in range(self._rows):
+            yield {name: columns[name][index] for name in self.names}
+
+    def clear(self) -> None:
+        """remove all the rows"""
+        self._columns = [_Column() for _ in self.names]
+        self._rows = 0
+
+
+class ResultSink(abc.ABC):
+    """Write the nodes of query results to a file in constant memory.
+
+    nodes are flattened in a ColumnBuffer (see ColumnBuffer for `fields` and
+    `aggregation_path`) which is flushed to the file every `buffer_rows` rows and
+    when the sink is closed.
+
+    subclass it and implement `_write` and `_close` to write other formats.
+
+    example:
+        >>> async with NdjsonSink("issues.ndjson.gz", ["title", "author.login"],
+                "repository.issues") as sink:
+        >>>     await sink.consume(results)
+        or:
+        >>> with CsvSink("issues.csv", ["title", "author.login"]) as sink:
+        >>>     async for node in get_issues(partitions):
+        >>>         sink.write(node)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fields: Fields,
+        aggregation_path: Optional[str] = None,
+        buffer_rows: int = 10000,
+    ):
+        """
+        Args:
+            path: path of the file, compressed with gzip if it ends with ".gz"
+                (ndjson and csv)
+            fields: paths of the fields in the nodes
+            aggregation_path (optional): dot separated path to the connection in
+                the result data, e.g "repository.issues". Defaults to None.
+            buffer_rows (optional): rows buffered before writing them.
+                Defaults to 10000.
+        """
+        assert buffer_rows > 0
+        self.path = path
+        self.buffer_rows = buffer_rows
+        self.rows = 0
+        self._buffer = ColumnBuffer(fields, aggregation_path)
+        self._file: Any = None
+        self.closed = False
+
+    def write(self, item: Union[ExecutionResult, Dict[str, Any]]) -> int:
+        """write an ExecutionResult (all the nodes of its connection) or a node
+
+        Raises:
+            ExecutionError: if the result has errors
+
+        Returns:
+            int: number of rows written
+        """
+        assert not self.closed, "the sink is closed"
+        rows = self._buffer.append(item)
+        self.rows += rows
+        if len(self._buffer) >= self.buffer_rows:
+            self.flush()
+        return rows
+
+    async def consume(
+        self,
+        items: Union[
+            Iterable[Union[ExecutionResult, Dict[str, Any]]],
+            AsyncIterable[Union[ExecutionResult, Dict[str, Any]]],
+        ],
+    ) -> int:
+        """write all the ExecutionResults or nodes of a sync or async iterable
+
+        Returns:
+            int: number of rows written
+        """
+        rows = 0
+        async for item in _aiter_items(items):
+            rows += self.write(item)
+        return rows
+
+    def flush(self) -> None:
+        """write the buffered rows to the file"""
+        if len(self._buffer):
+            self._write(self._buffer)
+            self._buffer.clear()
+
+    def close(self) -> None:
+        """flush the buffered rows and close the file, the file is created even
+        without rows"""
+        if self.closed:
+            return
+        self.flush()
+        self._close()
+        self.closed = True
+
+    @abc.abstractmethod
+    def _write(self, buffer: ColumnBuffer) -> None:
+        """write the rows of the buffer, creating the file on the first call"""
+
+    @abc.abstractmethod
+    def _close(self) -> None:
+        """close the file, creating it if nothing was written"""
+
+    def __enter__(self) -> "ResultSink":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    async def __aenter__(self) -> "ResultSink":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        self.close()
+
+
+class NdjsonSink(ResultSink):
+    """write the rows as newline delimited json objects, encoded with `codec`
+    (see pygraphql.client.codec)"""
+
+    def __init__(self, *args: Any, codec: Union[str, JsonCodec, None] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._codec = get_codec(codec)
+
+    def _write(self, buffer: ColumnBuffer) -> None:
+        if self._file is None:
+            self._file = _open_binary(self.path)
+        dumps = self._codec.dumps
+        self._file.write(b"".join(dumps(row) + b"\n" for row in buffer.rows()))
+
+    def _close(self) -> None:
+        if self._file is None:
+            self._file = _open_binary(self.path)
+        self._file.close()
+
+
+class CsvSink(ResultSink):
+    """write the rows as csv with a header line, nested values are written in
+    json"""
+
+    def __init__(self, *args: Any, dialect: str = "excel", **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._dialect = dialect
+        self._codec = JsonCodec()
+        self._writer: Any = None
+
+    def _open(self) -> None:
+        self._file = io.TextIOWrapper(
+            _open_binary(self.path), encoding="utf-8", newline=""
+        )
+        self._writer = csv.writer(self._file, dialect=self._dialect)
+        self._writer.writerow(self._buffer.names)
+
+    def _write(self, buffer: ColumnBuffer) -> None:
+        if self._file is None:
+            self._open()
+        columns = [
+            [self._format(value) for value in values]
+            for values in buffer.lists().values()
+        ]
+        self._writer.writerows(zip(*columns))
+
+    def _close(self) -> None:
+        if self._file is None:
+            self._open()
+        self._file.close()
+
+    def _format(self, value: Any) -> Any:
+        if isinstance(value, (dict, list)):
+            return self._codec.dumps(value).decode("utf-8")
+        return value
+
+
+class ArrowSink(ResultSink):
+    """write the rows in an Arrow IPC file (needs `pyarrow`), a record batch per
+    flush. the file has a single `schema` (a pyarrow.Schema with a field per
+    column), inferred from the first flushed rows when not given: the next
+    batches are cast to it, e.g the integers of a float column, and a column
+    without values in the first rows stays null, set its type in `schema` if
+    it may happen"""
+
+    def __init__(self, *args: Any, schema: Any = None, **kwargs: Any):
+        if pyarrow is None:
+            raise ImportError("pyarrow is not installed")
+        super().__init__(*args, **kwargs)
+        self._schema = schema
+
+    def _write(self, buffer: ColumnBuffer) -> None:
+        nulls = buffer.nulls()
+        arrays = []
+        for name, values in buffer.columns().items():
+            type_ = None if self._schema is None else self._schema.field(name).type
+            try:
+                arrays.append(_arrow_array(values, nulls[name], type_))
+            except (pyarrow.ArrowException, OverflowError) as error:
+                raise ValueError(
+                    f"The values of the {name} column don't fit its {type_} type, "
+                    "set its type in the schema"
+                ) from error
+        if self._schema is None:
+            self._schema = pyarrow.schema(
+                [(name, values.type) for name, values in zip(buffer.names, arrays)]
+            )
+        if self._file is None:
+            self._file = self._new_writer()
+        self._file.write_table(pyarrow.Table.from_arrays(arrays, schema=self._schema))
+
+    def _close(self) -> None:
+        if self._file is None:
+            if self._schema is None:
+                self._schema = pyarrow.schema(
+                    [(name, pyarrow.null()) for name in self._buffer.names]
+                )
+            self._file = self._new_writer()
+        self._file.close()
+
+    def _new_writer(self) -> Any:
+        return pyarrow.ipc.new_file(self.path, self._schema)
+
+
+class ParquetSink(ArrowSink):
+    """write the rows in a Parquet file (needs `pyarrow`), a row group per flush.
+    see ArrowSink for the `schema`"""
+
+    def __init__(self, *args: Any, compression: str = "snappy", **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._compression = compression
+
+    def _new_writer(self) -> Any:
+        return pyarrow.parquet.ParquetWriter(
+            self.path, self._schema, compression=self._compression
+        )
+
+
+def _arrow_array(values: Values, nulls: Set[int], type_: Any = None) -> Any:
+    """the values of a column in an arrow array of type `type_` (inferred if
+    None), the buffers of the typed columns are used without copy"""
+    if not isinstance(values, array.array):
+        return pyarrow.array(values, type=type_)
+    validity = None
+    if nulls:
+        bitmap = bytearray(b"\xff" * ((len(values) + 7) // 8))
+        for index in nulls:
+            bitmap[index >> 3] &= ~(1 << (index & 7))
+        validity = pyarrow.py_buffer(bitmap)
+    arrow_type = {
+        "b": pyarrow.int8(),
+        "q": pyarrow.int64(),
+        "d": pyarrow.float64(),
+    }[values.typecode]
+    result = pyarrow.Array.from_buffers(
+        arrow_type,
+        len(values),
+        [validity, pyarrow.py_buffer(values)],
+        null_count=len(nulls),
+    )
+    if values.typecode == "b":
+        result = result.cast(pyarrow.bool_())
+    if type_ is not None and not result.type.equals(type_):
+        result = result.cast(type_)
+    return result
+
+
+def _open_binary(path: str) -> Any:
+    if path.endswith(".gz"):
+        return gzip.open(path, "wb")
+    return open(path, "wb")
+
+
+def _get_path(value: Any, path: List[str]) -> Any:
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
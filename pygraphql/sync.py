@@ -0,0 +1,292 @@
+import asyncio
+import atexit
+import concurrent.futures
+import os
+import threading
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+
+from pygraphql.client.base import BaseClientAsync
+from pygraphql.client.registry import default_registry
+from pygraphql.client.utils import ExecutionResult
+from pygraphql.query import Query
+
+
+class EventLoopThread:
+    """an asyncio event loop running in a daemon thread, where the coroutines of
+    the sync facades are executed, so the clients and their connections are
+    shared by all the threads submitting work to it"""
+
+    def __init__(self, name: str = "pygraphql-loop"):
+        self._loop = asyncio.new_event_loop()
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """the asyncio loop run by the thread"""
+        return self._loop
+
+    @property
+    def alive(self) -> bool:
+        """wether the loop runs, False in a forked child process"""
+        return (
+            self._pid == os.getpid()
+            and self._thread.is_alive()
+            and not self._loop.is_closed()
+        )
+
+    def submit(self, coroutine: Awaitable[Any]) -> concurrent.futures.Future:
+        """schedule a coroutine in the loop, cancelling the returned future
+        cancels it"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)  # type: ignore
+
+    def run(self, coroutine: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """run a coroutine in the loop and wait for its result
+
+        Args:
+            coroutine: the coroutine to run
+            timeout (optional): seconds to wait, the coroutine is cancelled after
+                that. Defaults to None (no limit).
+
+        Raises:
+            concurrent.futures.TimeoutError: if the timeout expired
+        """
+        assert threading.current_thread() is not self._thread, "deadlock"
+        future = self.submit(coroutine)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def close(self) -> None:
+        """close the clients of the default registry used in the loop and stop it"""
+        if not self.alive:
+            return
+        self.run(default_registry().aclose(backend="asyncio"))
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+_DEFAULT_LOOP: Optional[EventLoopThread] = None
+_DEFAULT_LOOP_LOCK = threading.Lock()
+
+
+def default_loop_thread() -> EventLoopThread:
+    """the loop thread shared by the sync facades, started when first needed and
+    again in forked processes"""
+    global _DEFAULT_LOOP  # pylint: disable=global-statement
+    with _DEFAULT_LOOP_LOCK:
+        if _DEFAULT_LOOP is None or not _DEFAULT_LOOP.alive:
+            _DEFAULT_LOOP = EventLoopThread()
+        return _DEFAULT_LOOP
+
+
+@atexit.register
+def _close_default_loop() -> None:
+    if _DEFAULT_LOOP is not None:
+        _DEFAULT_LOOP.close()
+
+
+class SyncClient:
+    """Synchronous facade of BaseClientAsync for sync code (Celery tasks, Django
+    views, ...), the client lives in a background event loop thread shared by all
+    the threads using the facade, so they share its connection pool and their
+    executions run concurrently.
+
+    `execute`/`execute_many` block until the result is received, or until
+    `timeout` seconds then the execution is cancelled and
+    concurrent.futures.TimeoutError is raised. `submit_execute` and
+    `submit_execute_many` return a concurrent.futures.Future right away,
+    cancelling it cancels the execution.
+
+    example:
+        >>> client = SyncClient(endpoint=endpoint, auth=auth)
+        >>> result = client.execute(query, variables, timeout=10)
+        >>> futures = [client.submit_execute(query, v) for v in variables_list]
+        >>> results = [future.result() for future in futures]
+        >>> client.close()
+
+    takes exactly the same kwargs as BaseClientAsync, on the asyncio backend.
+    """
+
+    def __init__(self, loop_thread: Optional[EventLoopThread] = None, **kwargs: Any):
+        """initialise the client in the loop thread
+
+        Args:
+            loop_thread (optional): the loop running the client.
+                Defaults to None (the loop thread shared by the sync facades).
+        """
+        kwargs["backend"] = "asyncio"
+        self._loop_thread = loop_thread or default_loop_thread()
+        self._client: BaseClientAsync = self._loop_thread.run(_create_client(kwargs))
+
+    @property
+    def client(self) -> BaseClientAsync:
+        """the async client, only usable from the loop thread"""
+        return self._client
+
+    @property
+    def loop_thread(self) -> EventLoopThread:
+        """the thread running the loop of the client"""
+        return self._loop_thread
+
+    def submit_execute(
+        self, query: Any, variables: Optional[dict] = None, **kwargs: Any
+    ) -> concurrent.futures.Future:
+        """schedule an execution, see BaseClientAsync.execute for the kwargs
+
+        Returns:
+            concurrent.futures.Future: future of the ExecutionResult
+        """
+        return self._loop_thread.submit(
+            self._client.execute(query, variables or {}, **kwargs)
+        )
+
+    def execute(
+        self,
+        query: Any,
+        variables: Optional[dict] = None,
+        timeout: Optional[float] = None,
+        **kwargs: Any,
+    ) -> ExecutionResult:
+        """execute a query, see BaseClientAsync.execute for the kwargs
+
+        Args:
+            query: a query in str format or as a CompiledQuery
+            variables (optional): Defaults to None.
+            timeout (optional): seconds to wait for the result, retries
+                included. Defaults to None (no limit).
+
+        Raises:
+            concurrent.futures.TimeoutError: if the timeout expired
+            RetryError: if there is still an error after retrying
+
+        Returns:
+            ExecutionResult: result of the query
+        """
+        return self._loop_thread.run(
+            self._client.execute(query, variables or {}, **kwargs), timeout
+        )
+
+    def submit_execute_many(
+        self, operations: List[Tuple[str, dict]], **kwargs: Any
+    ) -> concurrent.futures.Future:
+        """schedule operations, see BaseClientAsync.execute_many for the kwargs
+
+        Returns:
+            concurrent.futures.Future: future of the list of ExecutionResults
+        """
+        return self._loop_thread.submit(self._client.execute_many(operations, **kwargs))
+
+    def execute_many(
+        self,
+        operations: List[Tuple[str, dict]],
+        timeout: Optional[float] = None,
+        **kwargs: Any,
+    ) -> List[ExecutionResult]:
+        """execute operations in batches, see BaseClientAsync.execute_many
+
+        Args:
+            operations: list of (query, variables) tuples
+            timeout (optional): seconds to wait for the results.
+                Defaults to None (no limit).
+
+        Raises:
+            concurrent.futures.TimeoutError: if the timeout expired
+
+        Returns:
+            List[ExecutionResult]: results in the order of the operations
+        """
+        return self._loop_thread.run(
+            self._client.execute_many(operations, **kwargs), timeout
+        )
+
+    def close(self) -> None:
+        """close the client, the loop thread keeps running"""
+        if self._loop_thread.alive and not self._client.is_closed:
+            self._loop_thread.run(self._client.aclose())
+
+    def __enter__(self) -> "SyncClient":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+class SyncQuery:
+    """Synchronous facade of pygraphql.Query, executed in the background loop
+    thread of the sync facades.
+
+    example:
+        >>> get_user = SyncQuery("query($id: ID!) { user(id: $id) { name } }",
+                endpoint=endpoint)
+        >>> result = get_user({"id": 1}, timeout=10)
+        >>> future = get_user.submit({"id": 2})
+
+    takes the same kwargs as pygraphql.Query, `client` being a SyncClient. Without
+    client, the client is shared by the SyncQuery objects with the same kwargs
+    (see pygraphql.client.registry.ClientRegistry).
+    """
+
+    def __init__(
+        self,
+        query: str,
+        client: Optional[SyncClient] = None,
+        loop_thread: Optional[EventLoopThread] = None,
+        **kwargs: Any,
+    ):
+        """
+        Args:
+            query: the query string
+            client (optional): Defaults to None (a shared client).
+            loop_thread (optional): the loop running the query without client.
+                Defaults to None (the loop thread shared by the sync facades).
+        """
+        if client is not None:
+            self._loop_thread = client.loop_thread
+            self._query = Query(query, client=client.client)
+        else:
+            self._loop_thread = loop_thread or default_loop_thread()
+            kwargs["backend"] = "asyncio"
+            self._query = Query(query, **kwargs)
+
+    def submit(
+        self, variables: Dict[str, Any], **kwargs: Any
+    ) -> concurrent.futures.Future:
+        """schedule an execution, see Query.__call__ for the kwargs
+
+        Returns:
+            concurrent.futures.Future: future of the ExecutionResult
+        """
+        return self._loop_thread.submit(self._query(variables, **kwargs))
+
+    def __call__(
+        self, variables: Dict[str, Any], timeout: Optional[float] = None, **kwargs: Any
+    ) -> ExecutionResult:
+        """execute the query, see Query.__call__ for the kwargs
+
+        Args:
+            variables: variables of the query or empty dict
+            timeout (optional): seconds to wait for the result, retries
+                included. Defaults to None (no limit).
+
+        Raises:
+            concurrent.futures.TimeoutError: if the timeout expired
+            VariablesError: if the variables don't match the declarations
+
+        Returns:
+            ExecutionResult: result of the query
+        """
+        return self._loop_thread.run(self._query(variables, **kwargs), timeout)
+
+
+async def _create_client(kwargs: Dict[str, Any]) -> BaseClientAsync:
+    """create a client inside the loop it will run in"""
+    return BaseClientAsync(**kwargs)
@@ -45,16 +45,23 @@ async def main():
     repositories = ["encode/httpx", "python-trio/trio", "graphql/graphql.github.io"]
     num_last_issues = 2
     results = defaultdict(list)
-    for repo in repositories:
-        repo_owner, repo_name = repo.split("/")
-        variables = {
-            "repo_owner": repo_owner,
-            "repo_name": repo_name,
+    variables = (
+        {
+            "repo_owner": repo.split("/")[0],
+            "repo_name": repo.split("/")[1],
             "num_last_issues": num_last_issues,
         }
+        for repo in repositories
+    )
 
-        result = await get_repo_issues(variables)
-        if result.errors:
+    # the repositories are fetched concurrently, 2 at a time
+    async for repo_variables, result in get_repo_issues.map(
+        variables, max_concurrency=2
+    ):
+        repo = "{repo_owner}/{repo_name}".format(**repo_variables)
+        if isinstance(result, Exception):
+            logger.error(f"Failed: {result}")
+        elif result.errors:
             logger.error(f"Errors: {result.errors}")
         else:
             results[repo].extend(
@@ -0,0 +1,146 @@
+import base64
+import json
+import time
+
+import pytest
+
+import trio
+
+from pygraphql import BaseClientAsync
+from pygraphql.auth import BaseAuth, HasuraAdminAuth, RefreshableToken
+
+
+class Request:
+    def __init__(self):
+        self.headers = {}
+
+
+def jwt(exp):
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode())
+    return f"e30.{payload.decode().rstrip('=')}.sig"
+
+
+class Tokens:
+    def __init__(self, expires_in=None):
+        self.count = 0
+        self.expires_in = expires_in
+
+    async def __call__(self):
+        self.count += 1
+        await trio.sleep(0.05)
+        token = f"token-{self.count}"
+        if self.expires_in is None:
+            return token
+        return token, self.expires_in
+
+
+@pytest.mark.trio
+async def test_RefreshableToken():
+    tokens = Tokens()
+    provider = RefreshableToken(tokens)
+    async with trio.open_nursery() as nursery:
+        for _ in range(5):
+            nursery.start_soon(provider.token)
+    assert provider.current == "token-1"
+    assert provider.expires_in is None
+
+    # rejected by concurrent requests: refreshed once
+    async with trio.open_nursery() as nursery:
+        for _ in range(5):
+            nursery.start_soon(provider.refresh, "token-1")
+    assert provider.current == "token-2"
+    assert await provider.refresh(stale="token-1") == "token-2"
+    assert tokens.count == provider.refreshes == 2
+
+    # refreshed before its expiry
+    provider = RefreshableToken(Tokens(expires_in=30), refresh_margin=60)
+    assert await provider.token() == "token-1"
+    assert await provider.token() == "token-2"
+
+
+@pytest.mark.trio
+async def test_RefreshableToken_jwt():
+    token = jwt(time.time() + 3600)
+
+    async def fetch():
+        return token
+
+    provider = RefreshableToken(fetch)
+    assert await provider.token() == token
+    assert 3500 < provider.expires_in <= 3600
+
+    async def fail():
+        raise ValueError("unavailable")
+
+    with pytest.raises(ValueError):
+        await RefreshableToken(fail).token()
+
+
+def test_RefreshableToken_shared():
+    tokens = Tokens()
+    provider = RefreshableToken.shared("service", tokens)
+    assert RefreshableToken.shared("service", Tokens()) is provider
+    assert BaseAuth(token_provider=provider).identity == (
+        BaseAuth(token_provider=RefreshableToken(tokens, key="service")).identity
+    )
+    assert BaseAuth(token_provider=provider).identity != BaseAuth("service").identity
+
+
+class App:
+    """ASGI server accepting a single token"""
+
+    def __init__(self, header="authorization"):
+        self.header = header.encode()
+        self.valid = None
+
+    async def __call__(self, scope, receive, send):
+        await receive()
+        headers = dict(scope["headers"])
+        if headers.get(self.header) == self.valid:
+            status, body = 200, {"data": {"id": 1}}
+        else:
+            status, body = 401, {"errors": [{"message": "expired"}]}
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(b"content-type", b"application/json")],
+            }
+        )
+        await send({"type": "http.response.body", "body": json.dumps(body).encode()})
+
+
+@pytest.mark.trio
+async def test_BaseAuth_token_provider():
+    app = App()
+    app.valid = b"bearer token-1"
+    tokens = Tokens()
+    auth = BaseAuth(token_provider=RefreshableToken(tokens))
+    async with BaseClientAsync(endpoint="http://test/", auth=auth, app=app) as client:
+        assert (await client.execute("{ id }", {})).data == {"id": 1}
+
+        # the token expired: a single refresh for the concurrent requests
+        app.valid = b"bearer token-2"
+        results = []
+
+        async def execute():
+            results.append(await client.execute("{ id }", {}, max_tries=1))
+
+        async with trio.open_nursery() as nursery:
+            for _ in range(5):
+                nursery.start_soon(execute)
+    assert [result.data for result in results] == [{"id": 1}] * 5
+    assert tokens.count == 2
+
+    request = Request()
+    next(auth.auth_flow(request))
+    assert request.headers["Authorization"] == "bearer token-2"
+
+
+@pytest.mark.trio
+async def test_HasuraAdminAuth_token_provider():
+    app = App(header="x-hasura-admin-secret")
+    app.valid = b"token-1"
+    auth = HasuraAdminAuth(token_provider=RefreshableToken(Tokens()))
+    async with BaseClientAsync(endpoint="http://test/", auth=auth, app=app) as client:
+        assert (await client.execute("{ id }", {})).data == {"id": 1}
@@ -0,0 +1,112 @@
+import json
+
+import pytest
+
+import respx
+
+from pygraphql import BaseAuth, BaseClientAsync, BulkWriter
+from pygraphql.client.utils import RetryError
+
+
+def insert_users(request):
+    """fake hasura rejecting the chunks with a row named "bad" """
+    payload = json.loads(request.read())
+    assert "insert_users" in payload["query"]
+    objects = payload["variables"]["objects"]
+    if any(row["name"] == "bad" for row in objects):
+        return {"errors": [{"message": "check constraint violation"}]}
+    return {"data": {"insert_users": {"affected_rows": len(objects)}}}
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_BulkWriter():
+    route = respx.post("https://foo.bar/", content=insert_users)
+    rows = [{"name": str(i)} for i in range(10)]
+    rows[6]["name"] = "bad"
+    progress = []
+    writer = BulkWriter(
+        "users",
+        chunk_size=4,
+        max_concurrency=2,
+        on_progress=lambda report: progress.append(report.rows),
+        endpoint="https://foo.bar/",
+        auth=BaseAuth("a"),
+        backend="asyncio",
+    )
+    report = await writer(rows)
+
+    assert report.rows == 10
+    assert report.affected_rows == 9
+    assert [row for row, _ in report.failed] == [{"name": "bad"}]
+    assert report.failed[0][1] == [{"message": "check constraint violation"}]
+    # [0-3], [4-7] split in [4, 5] and [6, 7] then [6] and [7], [8, 9]
+    assert route.call_count == 7
+    assert report.chunks == 4
+    assert sorted(progress) == [4, 8, 10]
+    assert report.rows_per_second > 0
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_BulkWriter_chunks_backpressure():
+    route = respx.post("https://foo.bar/", content=insert_users)
+    produced = []
+    sizes = []
+
+    async def rows():
+        for i in range(20):
+            produced.append(i)
+            yield {"name": "x" * 10}
+
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a"), backend="asyncio"
+    ) as client:
+
+        def check(report):
+            # rows are pulled only when a slot is free
+            assert len(produced) <= report.rows + 2 * 3 + 1
+
+        writer = BulkWriter(
+            "users",
+            on_conflict={"constraint": "users_pkey", "update_columns": []},
+            chunk_size=5,
+            max_chunk_bytes=70,  # 3 rows of 22 bytes
+            max_concurrency=2,
+            on_progress=check,
+            client=client,
+        )
+        report = await writer(rows())
+
+    for call in route.calls:
+        variables = json.loads(call[0].read())["variables"]
+        assert variables["on_conflict"]["constraint"] == "users_pkey"
+        sizes.append(len(variables["objects"]))
+    assert sorted(sizes) == [2] + [3] * 6
+    assert report.affected_rows == 20
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_BulkWriter_retry_error():
+    respx.post("https://foo.bar/", status_code=500)
+    writer = BulkWriter(
+        "users",
+        chunk_size=2,
+        split_on_error=True,
+        endpoint="https://foo.bar/",
+        auth=BaseAuth("a"),
+        backend="asyncio",
+    )
+    report = await writer(
+        [{"name": "a"}, {"name": "b"}],
+        max_tries=2,
+        random_exponential_sleep_max_sleep=0,
+    )
+    assert report.rows == 2 and report.affected_rows == 0
+    assert all(isinstance(error, RetryError) for _, error in report.failed)
+
+
+def test_BulkWriter_not_a_mutation():
+    with pytest.raises(ValueError):
+        BulkWriter("users", mutation="query { users { id } }")
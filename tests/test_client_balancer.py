@@ -0,0 +1,116 @@
+import pytest
+
+import respx
+
+from pygraphql import BaseAuth, BaseClientAsync
+from pygraphql.client.balancer import EndpointPool
+
+
+def test_EndpointPool_least_outstanding():
+    pool = EndpointPool(["https://a/", "https://b/"], primary="https://p/")
+    first = pool.acquire()
+    second = pool.acquire()
+    assert {first.url, second.url} == {"https://a/", "https://b/"}
+    assert pool.acquire(primary=True).url == "https://p/"
+
+    pool.release(first, 0.1)
+    assert pool.acquire() is first
+    assert pool.stats()["https://p/"]["outstanding"] == 1
+
+
+def test_EndpointPool_ewma():
+    pool = EndpointPool(["https://a/", "https://b/"], policy="ewma")
+    a, b = pool.endpoints
+    a.ewma, b.ewma = 0.1, 0.15
+    assert pool.acquire() is a
+    # a has a request in flight, its cost doubled
+    assert pool.acquire() is b
+
+
+def test_EndpointPool_ejection():
+    pool = EndpointPool(["https://a/", "https://b/"], failure_threshold=2)
+    a, b = pool.endpoints
+    for _ in range(2):
+        a.outstanding += 1
+        pool.release(a, 0.1, failed=True)
+    assert a.ejected and a.ejections == 1
+    assert all(pool.acquire() is b for _ in range(5))
+    assert pool.due_probes() == []
+
+    a.ejected_until = 0  # ejection time elapsed
+    assert pool.due_probes() == [a]
+    assert pool.due_probes() == []  # already probing
+    pool.record_probe(a, healthy=False)
+    assert a.ejected and not a.probing
+
+    b.ejected_until = 1
+    assert pool.acquire() is b  # all ejected, fail open
+
+    a.ejected_until = 0
+    pool.due_probes()
+    pool.record_probe(a, healthy=True)
+    assert not a.ejected and a.consecutive_failures == 0
+
+
+def test_EndpointPool_invalid():
+    with pytest.raises(ValueError):
+        EndpointPool([])
+    with pytest.raises(ValueError):
+        EndpointPool(["https://a/"], policy="random")
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_BaseClientAsync_endpoint_pool(monkeypatch):
+    # ties between replicas are broken at random, pick the failing one first
+    monkeypatch.setattr(
+        "pygraphql.client.balancer.random.choice", lambda endpoints: endpoints[-1]
+    )
+    replica_1 = respx.post("https://replica-1/", content={"data": {"a": 1}})
+    replica_2 = respx.post("https://replica-2/", status_code=503)
+    primary = respx.post("https://primary/", content={"data": {"b": 1}})
+    pool = EndpointPool(
+        ["https://replica-1/", "https://replica-2/"],
+        primary="https://primary/",
+        failure_threshold=1,
+        ejection_time=3600,
+    )
+    async with BaseClientAsync(
+        endpoint_pool=pool, auth=BaseAuth("a"), backend="asyncio"
+    ) as client:
+        assert client.endpoint_pool is pool
+        for _ in range(4):
+            result = await client.execute(
+                "{ a }", {}, random_exponential_sleep_max_sleep=0
+            )
+            assert result.data == {"a": 1}
+        result = await client.execute("mutation { b }", {})
+        assert result.data == {"b": 1}
+
+    # replica-2 failed once and was ejected, the retry went to replica-1
+    assert replica_2.call_count == 1
+    assert replica_1.call_count == 4
+    assert primary.call_count == 1
+    stats = pool.stats()
+    assert stats["https://replica-2/"]["ejected"]
+    assert stats["https://replica-1/"]["requests"] == 4
+    assert stats["https://replica-1/"]["outstanding"] == 0
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_BaseClientAsync_endpoint_probe():
+    respx.post("https://replica-1/", content={"data": {"a": 1}})
+    replica_2 = respx.post("https://replica-2/", content={"data": {"a": 2}})
+    async with BaseClientAsync(
+        endpoint=["https://replica-1/", "https://replica-2/"],
+        auth=BaseAuth("a"),
+        backend="asyncio",
+    ) as client:
+        pool = client.endpoint_pool
+        _, endpoint = pool.endpoints
+        endpoint.ejected_until = 0  # ejected long ago
+        await client.execute("{ a }", {})
+
+    assert not endpoint.ejected
+    assert b"__typename" in replica_2.calls[0][0].read()
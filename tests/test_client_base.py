@@ -1,11 +1,16 @@
+import json
 import os
+import re
 
 import pytest
 
 import httpcore
 import respx
+import trio
 
 from pygraphql import BaseClientAsync, BaseAuth
+from pygraphql.client.cache import MemoryCache
+from pygraphql.client.document import query_hash
 from pygraphql.client.utils import ExecutionResult, RetryError
 
 
@@ -82,3 +87,305 @@ async def test_BaseClientAsync_trio_auth_assertion_error():
     os.environ = {}
     with pytest.raises(AssertionError):
         BaseClientAsync(endpoint="https://foo.bar/")
+
+
+def batched_echo(request):
+    """fake server echoing variables, supporting array-batched requests"""
+    body = json.loads(request.read())
+    if isinstance(body, list):
+        return [{"data": operation["variables"]} for operation in body]
+    return {"data": body["variables"]}
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_execute_many():
+    request = respx.post("https://foo.bar/", content=batched_echo)
+    operations = [("""test""", {"i": i}) for i in range(5)]
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a")
+    ) as client:
+        results = await client.execute_many(operations, max_batch_size=2)
+
+    assert request.call_count == 3
+    assert [result.data for result in results] == [{"i": i} for i in range(5)]
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_execute_many_max_bytes():
+    request = respx.post("https://foo.bar/", content=batched_echo)
+    operations = [("""test""", {"i": i}) for i in range(4)]
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a")
+    ) as client:
+        results = await client.execute_many(operations, max_batch_bytes=90)
+
+    assert request.call_count == 2
+    assert [result.data for result in results] == [{"i": i} for i in range(4)]
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_execute_many_rejected():
+    def reject_batches(request, response):
+        if isinstance(json.loads(request.read()), list):
+            response.status_code = 404
+        response.content = batched_echo
+        return response
+
+    request = respx.add(reject_batches)
+    operations = [("""test""", {"i": i}) for i in range(4)]
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a")
+    ) as client:
+        results = await client.execute_many(operations)
+        assert [result.data for result in results] == [{"i": i} for i in range(4)]
+        assert request.call_count == 5
+
+        await client.execute_many(operations)
+        assert request.call_count == 9
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_execute_many_failed_batch():
+    def invalid_operation(request, response):
+        body = json.loads(request.read())
+        if isinstance(body, list) and {"i": -1} in [op["variables"] for op in body]:
+            response.status_code = 400
+        response.content = batched_echo
+        return response
+
+    request = respx.add(invalid_operation)
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a")
+    ) as client:
+        operations = [("""test""", {"i": i}) for i in (0, -1, 2)]
+        results = await client.execute_many(operations)
+        assert [result.data for result in results] == [{"i": i} for i in (0, -1, 2)]
+        assert request.call_count == 4
+
+        # batching is still enabled
+        operations = [("""test""", {"i": i}) for i in range(3)]
+        await client.execute_many(operations)
+        assert request.call_count == 5
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_persisted_queries():
+    request = respx.post("https://apq.bar/", content={"data": {"id": 123}})
+    async with BaseClientAsync(
+        endpoint="https://apq.bar/", auth=BaseAuth("a"), persisted_queries=True
+    ) as client:
+        await client.execute("""{ test }""", {"a": "b"})
+        await client.execute("""{ test }""", {"a": "b"})
+
+    # the hashes known by the endpoint are shared by its clients
+    async with BaseClientAsync(
+        endpoint="https://apq.bar/", auth=BaseAuth("b"), persisted_queries=True
+    ) as client:
+        await client.execute("""{ test }""", {"a": "b"})
+
+    first, second, third = [json.loads(call.read()) for call, _ in request.calls]
+    assert first["query"] == "{ test }"
+    assert first["extensions"]["persistedQuery"]["sha256Hash"] == query_hash("{ test }")
+    assert "query" not in second
+    assert second["extensions"] == first["extensions"]
+    assert third == second
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_persisted_queries_get():
+    post_request = respx.post("https://apq-get.bar/", content={"data": {"id": 123}})
+    get_request = respx.get(
+        re.compile(r"https://apq-get\.bar/\?.*"), content={"data": {"id": 123}}
+    )
+    async with BaseClientAsync(
+        endpoint="https://apq-get.bar/",
+        auth=BaseAuth("a"),
+        persisted_queries=True,
+        persisted_queries_get=True,
+    ) as client:
+        for _ in range(3):
+            response = await client.execute("""{ test }""", {"a": "b"})
+
+    assert response.data == {"id": 123}
+    assert post_request.call_count == 1
+    assert get_request.call_count == 2
+    assert "sha256Hash" in str(get_request.calls[0][0].url)
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_persisted_queries_not_found():
+    def evict_hashes(request, response):
+        if "query" not in json.loads(request.read()):
+            response.content = {"errors": [{"message": "PersistedQueryNotFound"}]}
+        else:
+            response.content = {"data": {"id": 123}}
+        return response
+
+    request = respx.add(evict_hashes)
+    async with BaseClientAsync(
+        endpoint="https://apq-not-found.bar/",
+        auth=BaseAuth("a"),
+        persisted_queries=True,
+    ) as client:
+        await client.execute("""{ test }""", {"a": "b"})
+        response = await client.execute("""{ test }""", {"a": "b"})
+
+    assert response.data == {"id": 123}
+    assert request.call_count == 3
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_persisted_queries_not_supported():
+    def no_apq(request, response):
+        if "extensions" in json.loads(request.read()):
+            response.content = {"errors": [{"message": "PersistedQueryNotSupported"}]}
+        else:
+            response.content = {"data": {"id": 123}}
+        return response
+
+    request = respx.add(no_apq)
+    async with BaseClientAsync(
+        endpoint="https://apq-not-supported.bar/",
+        auth=BaseAuth("a"),
+        persisted_queries=True,
+    ) as client:
+        response = await client.execute("""{ test }""", {"a": "b"})
+        assert response.data == {"id": 123}
+        assert request.call_count == 2
+
+        await client.execute("""{ test }""", {"a": "b"})
+        assert request.call_count == 3
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_cache():
+    request = respx.post("https://foo.bar/", content={"data": {"id": 123}})
+    cache = MemoryCache()
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a"), cache=cache
+    ) as client:
+        for _ in range(3):
+            response = await client.execute("""{ test }""", {"a": "b"})
+        await client.execute("""{ test }""", {"a": "c"})
+        await client.execute("""{ test }""", {"a": "b"}, use_cache=False)
+        await client.execute("""mutation { test }""", {"a": "b"})
+        await client.execute("""mutation { test }""", {"a": "b"})
+
+    assert response.data == {"id": 123}
+    assert request.call_count == 5
+    assert (cache.stats.hits, cache.stats.misses) == (2, 2)
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_operation_type_lazy(monkeypatch):
+    request = respx.post("https://foo.bar/", content={"data": {"id": 123}})
+    parsed = []
+
+    def operation_type(query):
+        parsed.append(query)
+        return "query"
+
+    monkeypatch.setattr("pygraphql.client.base.operation_type", operation_type)
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a")
+    ) as client:
+        await client.execute("""~ not a document""", {})
+        await client.execute_raw("""{ test }""", {})
+    # the query is only tokenized by the features depending on its type
+    assert parsed == []
+
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a"), cache=MemoryCache()
+    ) as client:
+        await client.execute("""{ test }""", {})
+    assert parsed == ["""{ test }"""]
+    assert request.call_count == 3
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_cache_coalescing():
+    async def slow_content(request):
+        await trio.sleep(0.1)
+        return {"data": {"id": 123}}
+
+    request = respx.post("https://foo.bar/", content=slow_content)
+    results = []
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a"), cache=MemoryCache()
+    ) as client:
+
+        async def execute():
+            results.append(await client.execute("""{ test }""", {"a": "b"}))
+
+        async with trio.open_nursery() as nursery:
+            for _ in range(5):
+                nursery.start_soon(execute)
+
+    assert request.call_count == 1
+    assert client.cache.stats.coalesced == 4
+    assert [result.data for result in results] == [{"id": 123}] * 5
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_execute_raw():
+    bodies = iter(
+        [
+            '{"data": {"id": 1',  # truncated, retried
+            '{"data": {"id": 1, "errors": "in data"}}',
+            '{"data": null, "errors": [{"message": "boom"}]}',
+            ' {"data": {"id": 2}} ',
+        ]
+    )
+    request = respx.post("https://foo.bar/", content=lambda request: next(bodies))
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a")
+    ) as client:
+        raw = await client.execute_raw("""{ id }""", {}, max_tries=2)
+        assert raw.content == b'{"data": {"id": 1, "errors": "in data"}}'
+        assert (raw.status_code, raw.has_errors) == (200, False)
+        assert raw.decode().data == {"id": 1, "errors": "in data"}
+
+        raw = await client.execute_raw("""{ id }""", {})
+        assert raw.has_errors
+        assert raw.decode(client.codec.loads).errors == [{"message": "boom"}]
+
+        raw = await client.execute_raw("""{ id }""", {})
+        assert not raw.has_errors
+    assert request.call_count == 4
+    assert json.loads(request.calls[0][0].read()) == {
+        "query": "{ id }",
+        "variables": {},
+    }
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_execute_raw_truncated():
+    full = b'{"data": {"items": [{"id": 1}, {"id": 2}]}}'
+    bodies = iter([full[: full.index(b"}") + 1], full])
+
+    def send(request, response):
+        response.content = next(bodies)
+        response.headers["Content-Length"] = str(len(full))
+        return response
+
+    request = respx.add(send)
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a")
+    ) as client:
+        # ends with a "}" but is shorter than its Content-Length: retried
+        raw = await client.execute_raw("""{ items { id } }""", {}, max_tries=2)
+    assert raw.content == full
+    assert request.call_count == 2
@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+from pygraphql import BaseAuth
+from pygraphql.client.cache import BaseCache, DiskCache, MemoryCache, cache_key
+
+
+def test_MemoryCache_ttl(monkeypatch):
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    cache = MemoryCache(default_ttl=10)
+    cache.set("a", {"data": 1})
+    cache.set("b", {"data": 2}, ttl=20)
+    cache.set("c", {"data": 3}, ttl=0)
+    assert cache.get("a") == {"data": 1}
+    assert cache.get("c") is None
+
+    monkeypatch.setattr(time, "monotonic", lambda: now + 15)
+    assert cache.get("a") is None
+    assert cache.get("b") == {"data": 2}
+    assert (cache.stats.hits, cache.stats.misses) == (2, 2)
+
+
+def test_MemoryCache_lru():
+    cache = MemoryCache(max_size=2)
+    cache.set("a", {"data": 1})
+    cache.set("b", {"data": 2})
+    cache.get("a")
+    cache.set("c", {"data": 3})
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == {"data": 1}
+    assert cache.stats.evictions == 1
+
+
+def test_DiskCache(tmp_path):
+    cache = DiskCache(str(tmp_path), default_ttl=10)
+    cache.set("a", {"data": {"id": 1}, "errors": None})
+    cache.set("b", {"data": {"id": 2}, "errors": None}, ttl=-1)
+
+    assert DiskCache(str(tmp_path)).get("a") == {"data": {"id": 1}, "errors": None}
+    assert cache.get("b") is None
+    cache.clear()
+    assert cache.get("a") is None
+
+
+def test_BaseCache_incomplete():
+    class NoClear(BaseCache):
+        def _get(self, key):
+            return None
+
+        def _set(self, key, value, ttl):
+            pass
+
+    with pytest.raises(TypeError):
+        NoClear()
+
+
+def test_cache_key():
+    auth = BaseAuth(token="a")
+    key = cache_key("https://foo.bar/", "{ a  b }", {"x": 1, "y": 2}, auth)
+
+    assert key == cache_key("https://foo.bar/", "{a,b}", {"y": 2, "x": 1}, auth)
+    assert key != cache_key("https://foo.bar/", "{a,b}", {"x": 1, "y": 3}, auth)
+    assert key != cache_key(
+        "https://foo.bar/", "{a,b}", {"y": 2, "x": 1}, BaseAuth(token="b")
+    )
@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+import respx
+
+from pygraphql import BaseAuth, BaseClientAsync, Query
+from pygraphql.client.codec import JsonCodec, OrjsonCodec, UjsonCodec, get_codec
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+@pytest.mark.parametrize(
+    "name",
+    [
+        "json",
+        pytest.param(
+            "orjson",
+            marks=pytest.mark.skipif(orjson is None, reason="orjson not installed"),
+        ),
+        pytest.param(
+            "ujson",
+            marks=pytest.mark.skipif(ujson is None, reason="ujson not installed"),
+        ),
+    ],
+)
+def test_codec(name):
+    codec = get_codec(name)
+    assert codec.name == name
+    value = {"a": [1, 2.5, None, True], "b": "é"}
+    encoded = codec.dumps(value)
+    assert isinstance(encoded, bytes)
+    assert json.loads(encoded) == value
+    assert codec.loads(encoded) == value
+    assert codec.loads(encoded.decode("utf-8")) == value
+
+    # decoding errors are retryable json errors whatever the codec
+    with pytest.raises(json.JSONDecodeError):
+        codec.loads(b'{"data": {"a"')
+
+
+def test_get_codec():
+    assert type(get_codec()) is JsonCodec
+    codec = JsonCodec()
+    assert get_codec(codec) is codec
+    expected = OrjsonCodec if orjson else UjsonCodec if ujson else JsonCodec
+    assert type(get_codec("auto")) is expected
+    with pytest.raises(ValueError):
+        get_codec("yaml")
+
+
+class CountingCodec(JsonCodec):
+    def __init__(self):
+        self.dumped = []
+        self.loaded = 0
+
+    def dumps(self, value):
+        self.dumped.append(value)
+        return super().dumps(value)
+
+    def loads(self, content):
+        self.loaded += 1
+        return super().loads(content)
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_codec():
+    respx.post("https://foo.bar/", content={"data": {"id": 1}})
+    codec = CountingCodec()
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a"), codec=codec
+    ) as client:
+        assert client.codec is codec
+        result = await client.execute("query { id }", {})
+        assert result.data == {"id": 1}
+
+        query = Query("query($a: Int) { id }", client=client)
+        await query({"a": 1})
+
+    assert codec.dumped == [{"query": "query { id }", "variables": {}}, {"a": 1}]
+    assert codec.loaded == 2
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_codec_batch():
+    respx.post("https://foo.bar/", content=[{"data": {"id": 1}}, {"data": {"id": 2}}])
+    codec = CountingCodec()
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a"), codec=codec
+    ) as client:
+        results = await client.execute_many(
+            [("query { id }", {}), ("query { id }", {})], max_batch_bytes=1000
+        )
+
+    assert [result.data for result in results] == [{"id": 1}, {"id": 2}]
+    # the size of each operation, then the batch payload
+    assert len(codec.dumped) == 3
+    assert codec.loaded == 1
@@ -0,0 +1,83 @@
+import gzip
+import json
+
+import pytest
+
+import respx
+
+from pygraphql import BaseAuth, BaseClientAsync
+from pygraphql.client.compression import RequestCompression, accept_encoding
+
+
+def test_RequestCompression():
+    compression = RequestCompression("gzip", min_size=100)
+    assert compression.compress(b"a" * 99) is None
+    compressed = compression.compress(b"a" * 1000)
+    assert gzip.decompress(compressed) == b"a" * 1000
+    assert compression.ratio < 0.1
+
+    with pytest.raises(ValueError):
+        RequestCompression("lzma")
+
+
+def test_accept_encoding():
+    assert accept_encoding("gzip") == {"Accept-Encoding": "gzip"}
+    assert accept_encoding(["gzip", "deflate", "identity"]) == {
+        "Accept-Encoding": "gzip, deflate;q=0.9, identity;q=0.8"
+    }
+    with pytest.raises(ValueError):
+        accept_encoding("gzip, snappy")
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_compression():
+    request = respx.post("https://foo.bar/", content={"data": {"id": 1}})
+    variables = {"objects": [{"name": "row-{}".format(i)} for i in range(100)]}
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/",
+        auth=BaseAuth("a"),
+        compression=RequestCompression(min_size=1024),
+        accept_encoding=["gzip", "identity"],
+    ) as client:
+        await client.execute("mutation($objects: [Row!]!) { insert }", variables)
+        await client.execute("query { id }", {})
+
+    big, small = (call[0] for call in request.calls)
+    assert big.headers["content-encoding"] == "gzip"
+    assert big.headers["accept-encoding"] == "gzip, identity;q=0.9"
+    assert json.loads(gzip.decompress(big.read()))["variables"] == variables
+    assert "content-encoding" not in small.headers
+    assert json.loads(small.read())["query"] == "query { id }"
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_compression_unsupported():
+    def unsupported(request, response):
+        if "content-encoding" in request.headers:
+            response.status_code = 415
+            response.content = b""
+        else:
+            response.status_code = 200
+            response.headers["content-type"] = "application/json"
+            response.content = b'{"data": {"id": 1}}'
+        return response
+
+    request = respx.add(unsupported)
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a"), compression="gzip"
+    ) as client:
+        query = "query($a: String) { id }"
+        variables = {"a": "b" * 2000}
+        result = await client.execute(query, variables)
+        assert result.data == {"id": 1}
+        assert not client.compression.enabled
+
+        await client.execute(query, variables)
+
+    assert ["content-encoding" in call[0].headers for call in request.calls] == [
+        True,
+        False,
+        False,
+    ]
@@ -0,0 +1,88 @@
+import datetime
+import time
+
+import pytest
+
+import respx
+
+from pygraphql import BaseAuth, BaseClientAsync
+from pygraphql.client.cost import CostEstimator, CostScheduler
+from pygraphql.client.document import CompiledQuery
+
+ISSUES = """query($first: Int = 100, $labels: Int) {
+    repository(owner: "a", name: "b") {
+        issues(first: $first) {
+            nodes { ...issue }
+        }
+    }
+}
+fragment issue on Issue {
+    labels(first: $labels) { nodes { name } }
+    ... on Issue { comments(last: 50) { totalCount } }
+}"""
+
+
+def test_CostEstimator():
+    estimator = CostEstimator()
+    # issues: 1, labels and comments: 100 each
+    assert estimator.requests(ISSUES, {"labels": 10}) == 201
+    assert estimator.estimate(ISSUES, {"labels": 10}) == 2
+    # no page size for labels: the default one
+    assert estimator.requests(ISSUES, {"first": 10}) == 21
+    assert estimator.estimate(CompiledQuery(ISSUES), {"first": 10}) == 1
+    assert estimator.estimate("{ viewer { login } }", {}) == 1
+    assert CostEstimator(divisor=1, minimum=0).estimate("{ a }", {}) == 0
+
+
+@pytest.mark.trio
+async def test_CostScheduler():
+    scheduler = CostScheduler(points=10, window=0.2)
+    await scheduler.acquire(6)
+    await scheduler.acquire(4)
+    scheduler.reconcile(6)
+    scheduler.reconcile(4)
+    start = time.monotonic()
+    await scheduler.acquire(3)
+    assert time.monotonic() - start >= 0.15
+    assert scheduler.throttled == 1
+    assert scheduler.stats()["remaining"] == 7
+
+    # the server counts points differently
+    reset = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+        seconds=120
+    )
+    await scheduler.acquire(1)
+    scheduler.reconcile(
+        3,
+        {
+            "rateLimit": {
+                "cost": 2,
+                "remaining": 5,
+                "resetAt": reset.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            }
+        },
+    )
+    assert scheduler.charged == 2
+    # the execution in flight is still reserved
+    assert scheduler.stats()["remaining"] == 4
+    assert 110 < scheduler.stats()["reset_in"] <= 120
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_cost_scheduler():
+    request = respx.post(
+        "https://foo.bar/",
+        content={"data": {"rateLimit": {"cost": 2, "remaining": 4990}, "a": 1}},
+    )
+    scheduler = CostScheduler(points=5000)
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a"), cost_scheduler=scheduler
+    ) as client:
+        await client.execute(ISSUES, {"labels": 10})
+        assert scheduler.stats()["remaining"] == 4990
+        await client.execute_raw(ISSUES, {"labels": 10})
+    assert request.call_count == 2
+    assert scheduler.estimated == 4
+    assert scheduler.charged == 2
+    assert scheduler.in_flight == 0
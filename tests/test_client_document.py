@@ -0,0 +1,142 @@
+import hashlib
+import json
+
+import pytest
+
+from pygraphql.client.document import (
+    CompiledQuery,
+    DocumentSyntaxError,
+    FragmentSpread,
+    InlineFragment,
+    Variable,
+    VariablesError,
+    minify,
+    operation_type,
+    parse,
+    query_hash,
+    tokenize,
+)
+
+
+def test_tokenize():
+    tokens = list(
+        tokenize('query($a: [Int!]! = 3) { a(b: "x,y") { ...F } } # comment, {')
+    )
+    assert tokens == [
+        ("name", "query"),
+        ("punctuator", "("),
+        ("punctuator", "$"),
+        ("name", "a"),
+        ("punctuator", ":"),
+        ("punctuator", "["),
+        ("name", "Int"),
+        ("punctuator", "!"),
+        ("punctuator", "]"),
+        ("punctuator", "!"),
+        ("punctuator", "="),
+        ("number", "3"),
+        ("punctuator", ")"),
+        ("punctuator", "{"),
+        ("name", "a"),
+        ("punctuator", "("),
+        ("name", "b"),
+        ("punctuator", ":"),
+        ("string", '"x,y"'),
+        ("punctuator", ")"),
+        ("punctuator", "{"),
+        ("spread", "..."),
+        ("name", "F"),
+        ("punctuator", "}"),
+        ("punctuator", "}"),
+    ]
+
+
+def test_tokenize_syntax_error():
+    with pytest.raises(DocumentSyntaxError):
+        list(tokenize("query { a % b }"))
+
+
+def test_operation_type():
+    assert operation_type("{ a }") == "query"
+    assert operation_type("query A { a }") == "query"
+    assert operation_type("# mutation\nsubscription { a }") == "subscription"
+    assert operation_type("fragment F on T { a { b } } mutation { ...F }") == "mutation"
+
+
+def test_query_hash():
+    assert query_hash("{ a }") == hashlib.sha256(b"{ a }").hexdigest()
+
+
+def test_parse():
+    document = parse("""query Q($id: ID!, $first: Int = 10) {
+            a: user(id: $id, filter: {tags: ["x"], ratio: 0.5}) {
+                ...F
+                ... on User { name }
+            }
+        }
+        fragment F on User { id }""")
+    (operation,) = document.operations
+    assert (operation.kind, operation.name) == ("query", "Q")
+    assert [(v.name, v.type, v.required) for v in operation.variables] == [
+        ("id", "ID!", True),
+        ("first", "Int", False),
+    ]
+    assert operation.variables[1].default == 10
+
+    (field,) = operation.selections
+    assert (field.alias, field.name, field.response_key) == ("a", "user", "a")
+    assert field.arguments == {
+        "id": Variable("id"),
+        "filter": {"tags": ["x"], "ratio": 0.5},
+    }
+    spread, inline = field.selections
+    assert isinstance(spread, FragmentSpread) and spread.name == "F"
+    assert isinstance(inline, InlineFragment) and inline.type_condition == "User"
+    assert list(document.fragments) == ["F"]
+
+
+def test_parse_syntax_error():
+    with pytest.raises(DocumentSyntaxError):
+        parse("query { a(b: ) }")
+    with pytest.raises(DocumentSyntaxError):
+        parse("query { a ")
+
+
+def test_minify():
+    assert (
+        minify('query Q { a(b: 1, c: "x, y") { ...F d } # comment\n }')
+        == 'query Q{a(b:1 c:"x, y"){...F d}}'
+    )
+
+
+def test_CompiledQuery():
+    compiled = CompiledQuery("""
+        query A($id: ID!, $tags: [String!], $first: Int = 10) { a(id: $id) { b } }
+        query B { b }
+        """)
+    assert compiled.operation_name == "A"
+    assert compiled.operation_type == "query"
+    assert list(compiled.variables) == ["id", "tags", "first"]
+    assert compiled.hash == query_hash(compiled.text)
+    assert json.loads(compiled.encode({"id": "1"})) == {
+        "query": compiled.text,
+        "operationName": "A",
+        "variables": {"id": "1"},
+    }
+    assert CompiledQuery(compiled.source, operation_name="B").operation_name == "B"
+    with pytest.raises(ValueError):
+        CompiledQuery(compiled.source, operation_name="C")
+
+    compiled.validate({"id": 1, "tags": ["a"], "first": None})
+    compiled.validate({"id": "1", "tags": "a"})  # coerced to a list
+    # integral floats are ints, undeclared variables are ignored by default
+    compiled.validate({"id": 1.0, "tags": [], "first": 10.0, "other": 1})
+    with pytest.raises(VariablesError) as error:
+        compiled.validate({"tags": [None], "first": "10", "other": 1})
+    assert str(error.value) == (
+        "missing variable $id, $tags[0] must not be null, "
+        "$first expected Int, got '10'"
+    )
+    strict = CompiledQuery(compiled.source, strict=True)
+    with pytest.raises(VariablesError, match=r"unknown variable \$other"):
+        strict.validate({"id": 1, "tags": [], "first": 1.5, "other": 1})
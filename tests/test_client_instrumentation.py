@@ -0,0 +1,183 @@
+import httpx
+import pytest
+
+import respx
+
+from pygraphql import BaseAuth, BaseClientAsync
+from pygraphql.client.document import operation_name
+from pygraphql.client.instrumentation import (
+    ExecutionEvent,
+    Histogram,
+    MetricsAggregator,
+    OpenTelemetryHook,
+)
+
+
+def test_operation_name():
+    assert operation_name("query GetUser($id: ID!) { user(id: $id) { name } }") == (
+        "GetUser"
+    )
+    assert operation_name("mutation Save { save }") == "Save"
+    assert operation_name("fragment F on User { name } query Q { ...F }") == "Q"
+    assert operation_name("query { user { name } }") is None
+    assert operation_name("{ user { name } }") is None
+
+
+def test_Histogram():
+    histogram = Histogram(buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value)
+    assert histogram.cumulative_counts() == [(0.1, 2), (1, 3), (float("inf"), 4)]
+    assert histogram.count == 4
+    assert histogram.sum == pytest.approx(3.65)
+
+
+def test_MetricsAggregator_to_prometheus():
+    metrics = MetricsAggregator(buckets=(0.1, 1))
+    metrics(
+        ExecutionEvent(
+            "response",
+            "GetUser",
+            1,
+            0.2,
+            status_code=200,
+            request_bytes=10,
+            response_bytes=20,
+            headers_time=0.15,
+            transfer_time=0.05,
+        )
+    )
+    metrics(ExecutionEvent("decoded", "GetUser", 1, 0.2, decode_time=0.01))
+    metrics(ExecutionEvent("retry", "GetUser", 1, 0.2, error=ValueError()))
+    metrics(ExecutionEvent("failure", "GetUser", 2, 1.5, error=ValueError()))
+
+    assert metrics.to_prometheus() == (
+        "# TYPE graphql_failures_total counter\n"
+        'graphql_failures_total{operation="GetUser",error="ValueError"} 1\n'
+        "# TYPE graphql_request_bytes_total counter\n"
+        'graphql_request_bytes_total{operation="GetUser"} 10\n'
+        "# TYPE graphql_requests_total counter\n"
+        'graphql_requests_total{operation="GetUser",status="200"} 1\n'
+        "# TYPE graphql_response_bytes_total counter\n"
+        'graphql_response_bytes_total{operation="GetUser"} 20\n'
+        "# TYPE graphql_retries_total counter\n"
+        'graphql_retries_total{operation="GetUser"} 1\n'
+        "# TYPE graphql_decode_duration_seconds histogram\n"
+        'graphql_decode_duration_seconds_bucket{operation="GetUser",le="0.1"} 1\n'
+        'graphql_decode_duration_seconds_bucket{operation="GetUser",le="1"} 1\n'
+        'graphql_decode_duration_seconds_bucket{operation="GetUser",le="+Inf"} 1\n'
+        'graphql_decode_duration_seconds_sum{operation="GetUser"} 0.01\n'
+        'graphql_decode_duration_seconds_count{operation="GetUser"} 1\n'
+        "# TYPE graphql_execution_duration_seconds histogram\n"
+        'graphql_execution_duration_seconds_bucket{operation="GetUser",le="0.1"} 0\n'
+        'graphql_execution_duration_seconds_bucket{operation="GetUser",le="1"} 0\n'
+        'graphql_execution_duration_seconds_bucket{operation="GetUser",le="+Inf"} 1\n'
+        'graphql_execution_duration_seconds_sum{operation="GetUser"} 1.5\n'
+        'graphql_execution_duration_seconds_count{operation="GetUser"} 1\n'
+        "# TYPE graphql_request_duration_seconds histogram\n"
+        'graphql_request_duration_seconds_bucket{operation="GetUser",le="0.1"} 0\n'
+        'graphql_request_duration_seconds_bucket{operation="GetUser",le="1"} 1\n'
+        'graphql_request_duration_seconds_bucket{operation="GetUser",le="+Inf"} 1\n'
+        'graphql_request_duration_seconds_sum{operation="GetUser"} 0.2\n'
+        'graphql_request_duration_seconds_count{operation="GetUser"} 1\n'
+    )
+
+
+class FakeInstrument:
+    def __init__(self, name):
+        self.name = name
+        self.values = []
+
+    def add(self, value, attributes):
+        self.values.append((value, attributes))
+
+    record = add
+
+
+class FakeMeter:
+    def __init__(self):
+        self.instruments = {}
+
+    def create_counter(self, name, unit=""):
+        return self.instruments.setdefault(name, FakeInstrument(name))
+
+    create_histogram = create_counter
+
+
+def test_OpenTelemetryHook():
+    meter = FakeMeter()
+    hook = OpenTelemetryHook(meter)
+    hook(ExecutionEvent("response", "Q", 1, 0.2, status_code=200, headers_time=0.2))
+    hook(ExecutionEvent("success", "Q", 1, 0.3))
+
+    instruments = meter.instruments
+    assert instruments["graphql.client.requests"].values == [
+        (1, {"operation": "Q", "status": 200})
+    ]
+    assert instruments["graphql.client.request.duration"].values == [
+        (0.2, {"operation": "Q"})
+    ]
+    assert instruments["graphql.client.execution.duration"].values == [
+        (0.3, {"operation": "Q"})
+    ]
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_hooks():
+    calls = []
+
+    def content(request):
+        calls.append(request)
+        if len(calls) == 1:
+            raise httpx.ConnectTimeout("timeout", request=request)
+        return {"data": {"user": {"name": "a"}}}
+
+    respx.post("https://foo.bar/", content=content)
+    events = []
+    metrics = MetricsAggregator()
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a"), hooks=[events.append]
+    ) as client:
+        client.add_hook(metrics)
+        await client.execute(
+            "query GetUser { user { name } }",
+            {},
+            random_exponential_sleep_max_sleep=0,
+        )
+
+    assert [(event.kind, event.attempt) for event in events] == [
+        ("request", 1),
+        ("retry", 1),
+        ("backoff", 1),
+        ("request", 2),
+        ("response", 2),
+        ("decoded", 2),
+        ("success", 2),
+    ]
+    assert {event.operation for event in events} == {"GetUser"}
+    response = events[4]
+    assert response.status_code == 200
+    assert response.request_bytes == len(
+        b'{"query":"query GetUser { user { name } }","variables":{}}'
+    )
+    assert response.response_bytes > 0
+    assert response.headers_time >= 0 and response.transfer_time >= 0
+    assert isinstance(events[1].error, httpx.ConnectTimeout)
+    assert 'graphql_retries_total{operation="GetUser"} 1' in metrics.to_prometheus()
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_hooks_failure():
+    respx.post("https://foo.bar/", status_code=400)
+    events = []
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a"), hooks=[events.append]
+    ) as client:
+        with pytest.raises(Exception):
+            await client.execute("query { user { name } }", {})
+
+    assert [event.kind for event in events] == ["request", "response", "failure"]
+    assert events[1].status_code == 400
+    assert isinstance(events[2].error, httpx.HTTPStatusError)
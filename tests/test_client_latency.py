@@ -0,0 +1,163 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+import respx
+import trio
+
+from pygraphql import BaseAuth, BaseClientAsync
+from pygraphql.client.document import query_hash
+from pygraphql.client.latency import LatencyTracker
+from pygraphql.client.utils import hedge
+
+
+def test_LatencyTracker():
+    tracker = LatencyTracker(window=10, min_samples=5, min_timeout=0.5)
+    for latency in (0.1, 0.2, 0.3, 0.4):
+        tracker.record("a", latency)
+    assert tracker.percentile("a", 50) is None
+    assert tracker.timeout("a") is None
+
+    tracker.record("a", 1.0)
+    assert tracker.percentile("a", 50) == 0.3
+    assert tracker.percentile("a", 99) == 1.0
+    assert tracker.timeout("a") == 2.0
+    assert tracker.hedge_delay("a") == 1.0
+
+    # old samples leave the window
+    for _ in range(10):
+        tracker.record("a", 0.01)
+    assert tracker.percentile("a", 99) == 0.01
+    assert tracker.timeout("a") == 0.5
+    assert tracker.stats("a")["samples"] == 10
+    assert tracker.stats("b") == {
+        "samples": 0,
+        "p50": None,
+        "p95": None,
+        "p99": None,
+        "timeout": None,
+    }
+
+
+def make_call(latencies):
+    calls = []
+
+    async def call(sleep):
+        index = len(calls)
+        calls.append(index)
+        latency = latencies[index]
+        await sleep(abs(latency))
+        if latency < 0:
+            raise ValueError(index)
+        return index
+
+    return call, calls
+
+
+@pytest.mark.trio
+async def test_hedge_trio():
+    call, calls = make_call([1, 0.01])
+    start = time.monotonic()
+    assert await hedge(lambda: call(trio.sleep), 0.01) == 1
+    assert time.monotonic() - start < 0.5
+
+    # fast enough, no duplicate
+    call, calls = make_call([0.001, 0.01])
+    assert await hedge(lambda: call(trio.sleep), 0.05) == 0
+    assert calls == [0]
+
+    # the first error is raised once both failed
+    call, calls = make_call([-0.02, -0.05])
+    with pytest.raises(ValueError, match="0"):
+        await hedge(lambda: call(trio.sleep), 0.01)
+
+    # duplicate refused
+    call, calls = make_call([0.05, 0.01])
+    assert await hedge(lambda: call(trio.sleep), 0.01, can_hedge=lambda: False) == 0
+    assert calls == [0]
+
+
+@pytest.mark.asyncio
+async def test_hedge_asyncio():
+    call, calls = make_call([1, 0.01])
+    start = time.monotonic()
+    assert await hedge(lambda: call(asyncio.sleep), 0.01, backend="asyncio") == 1
+    assert time.monotonic() - start < 0.5
+
+    call, calls = make_call([0.001, 0.01])
+    assert await hedge(lambda: call(asyncio.sleep), 0.05, backend="asyncio") == 0
+    assert calls == [0]
+
+    call, calls = make_call([-0.001, 0.01])
+    with pytest.raises(ValueError, match="0"):
+        await hedge(lambda: call(asyncio.sleep), 0.05, backend="asyncio")
+    assert calls == [0]
+
+    call, calls = make_call([0.05, -0.01])
+    assert await hedge(lambda: call(asyncio.sleep), 0.01, backend="asyncio") == 0
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_hedging():
+    query = "query { user { name } }"
+    tracker = LatencyTracker(min_samples=1)
+    tracker.record(query_hash(query), 0.01)
+    calls = []
+
+    async def content(request):
+        calls.append(request)
+        if len(calls) == 1:
+            await trio.sleep(1)  # slow replica
+        return {"data": {"user": {"name": len(calls)}}}
+
+    respx.post("https://foo.bar/", content=content)
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/",
+        auth=BaseAuth("a"),
+        latency_tracker=tracker,
+        hedging=True,
+    ) as client:
+        start = time.monotonic()
+        result = await client.execute(query, {})
+        assert time.monotonic() - start < 0.5
+        assert result.data == {"user": {"name": 2}}
+        assert tracker.hedged == 1
+
+        # mutations are never hedged
+        mutation = "mutation { user { name } }"
+        tracker.record(query_hash(mutation), 0.01)
+        calls.clear()
+        await client.execute(mutation, {})
+        assert len(calls) == 1
+        assert tracker.stats(query_hash(mutation))["samples"] == 2
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_adaptive_timeout(caplog):
+    query = "query { user { name } }"
+    tracker = LatencyTracker(min_samples=1, timeout_multiplier=2)
+    tracker.record(query_hash(query), 0.5)
+    calls = []
+
+    async def content(request):
+        calls.append(request)
+        if len(calls) == 1:
+            raise httpx.ReadTimeout("timeout", request=request)
+        return {"data": json.loads(request.read())["variables"]}
+
+    respx.post("https://foo.bar/", content=content)
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a"), latency_tracker=tracker
+    ) as client:
+        result = await client.execute(query, {"a": 1})
+
+    # the timeout of the first try came from the latencies, not the 5s default
+    assert "new timeout of 1.50s (last_old=1.00s)" in caplog.text
+    assert result.data == {"a": 1}
+    assert len(calls) == 2
+    assert tracker.stats(query_hash(query))["samples"] == 3
@@ -0,0 +1,92 @@
+import time
+
+import httpx
+import pytest
+
+import respx
+import trio
+
+from pygraphql import BaseAuth, BaseClientAsync
+from pygraphql.client.ratelimit import RateLimiter
+
+
+def test_RateLimiter_update_retry_after():
+    limiter = RateLimiter()
+    limiter.update(httpx.Response(429, headers={"Retry-After": "30"}))
+    assert 29 < limiter.pause_remaining <= 30
+
+
+def test_RateLimiter_update_rate_limit_headers():
+    limiter = RateLimiter()
+    reset = str(int(time.time()) + 60)
+    limiter.update(
+        httpx.Response(
+            200, headers={"X-RateLimit-Remaining": "10", "X-RateLimit-Reset": reset}
+        )
+    )
+    assert limiter.pause_remaining == 0
+
+    limiter.update(
+        httpx.Response(
+            403, headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": reset}
+        )
+    )
+    assert 58 < limiter.pause_remaining <= 60
+
+
+@pytest.mark.trio
+async def test_RateLimiter_trio_rate():
+    limiter = RateLimiter(rate=50, burst=5)
+    start = trio.current_time()
+    for _ in range(15):
+        await limiter.acquire()
+        limiter.release()
+
+    # 5 requests at once then 10 requests at 50 requests per second
+    assert 0.18 < trio.current_time() - start < 0.4
+    assert limiter.throttled == 10
+
+
+@pytest.mark.asyncio
+async def test_RateLimiter_asyncio_max_in_flight():
+    import asyncio
+
+    limiter = RateLimiter(max_in_flight=2, backend="asyncio")
+    max_in_flight = 0
+
+    async def request():
+        nonlocal max_in_flight
+        await limiter.acquire()
+        max_in_flight = max(max_in_flight, limiter.in_flight)
+        await asyncio.sleep(0.01)
+        limiter.release()
+
+    await asyncio.gather(*(request() for _ in range(6)))
+    assert max_in_flight == 2
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_rate_limited():
+    calls = []
+
+    def rate_limited(request, response):
+        calls.append(trio.current_time())
+        if len(calls) == 1:
+            response.status_code = 429
+            response.headers["Retry-After"] = "0.2"
+        response.content = {"data": {"id": 123}}
+        return response
+
+    respx.add(rate_limited)
+    limiter = RateLimiter()
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a"), rate_limiter=limiter
+    ) as client:
+        response = await client.execute(
+            """test""", {}, random_exponential_sleep_min_sleep=100
+        )
+
+    assert response.data == {"id": 123}
+    assert len(calls) == 2
+    assert 0.15 < calls[1] - calls[0] < 1
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+import respx
+import trio
+
+from pygraphql import BaseAuth, Query
+from pygraphql.client.registry import ClientRegistry, _freeze, default_registry
+
+
+def test_freeze():
+    hooks = [print]
+    assert _freeze({"endpoint": "a", "auth": BaseAuth("a"), "hooks": hooks}) == (
+        _freeze({"hooks": hooks, "auth": BaseAuth("a"), "endpoint": "a"})
+    )
+    assert _freeze({"auth": BaseAuth("a")}) != _freeze({"auth": BaseAuth("b")})
+    assert _freeze({"headers": {"a": ["b"]}}) == (("headers", (("a", ("b",)),)),)
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_ClientRegistry_Query():
+    route = respx.post("https://foo.bar/", content={"data": {"id": 1}})
+    registry = ClientRegistry(max_connections=10)
+    kwargs = {"endpoint": "https://foo.bar/", "backend": "asyncio"}
+    get_a = Query("{ id }", auth=BaseAuth("a"), registry=registry, **kwargs)
+    get_b = Query("{ id }", auth=BaseAuth("a"), registry=registry, **kwargs)
+    get_c = Query("{ id }", auth=BaseAuth("c"), registry=registry, **kwargs)
+
+    for get in (get_a, get_b, get_a, get_c):
+        assert (await get({})).data == {"id": 1}
+
+    assert route.call_count == 4
+    assert registry.stats() == {"clients": 2, "created": 2, "reused": 2, "evicted": 0}
+
+    client = await registry.acquire({**get_a._kwargs})
+    assert client._transport._max_connections == 10
+    registry.release(client)
+
+    await registry.aclose(backend="asyncio")
+    assert len(registry) == 0
+    assert client.is_closed
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_ClientRegistry_idle():
+    registry = ClientRegistry(idle_timeout=0)
+    kwargs = {
+        "endpoint": "https://foo.bar/",
+        "auth": BaseAuth("a"),
+        "backend": "asyncio",
+    }
+    client = await registry.acquire(kwargs)
+    # in use, not evicted
+    assert await registry.evict_idle(backend="asyncio") == 0
+    registry.release(client)
+    assert await registry.evict_idle(backend="asyncio") == 1
+    assert client.is_closed
+    assert await registry.acquire(kwargs) is not client
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_ClientRegistry_trio():
+    respx.post("https://foo.bar/", content={"data": {"id": 1}})
+    async with ClientRegistry() as registry:
+        get_id = Query(
+            "{ id }", endpoint="https://foo.bar/", auth=BaseAuth("a"), registry=registry
+        )
+        await get_id({})
+        await get_id({})
+        assert registry.stats()["reused"] == 1
+    assert len(registry) == 0
+
+    # registry=None: a client per call
+    get_id = Query(
+        "{ id }", endpoint="https://foo.bar/", auth=BaseAuth("a"), registry=None
+    )
+    assert (await get_id({})).data == {"id": 1}
+
+
+@respx.mock
+def test_ClientRegistry_loop_end():
+    respx.post("https://foo.bar/", content={"data": {"id": 1}})
+    registry = ClientRegistry()
+    clients = []
+
+    async def main(backend):
+        get_id = Query(
+            "{ id }",
+            endpoint="https://foo.bar/",
+            auth=BaseAuth("a"),
+            backend=backend,
+            registry=registry,
+        )
+        await get_id({})
+        clients.extend(entry.client for entry in registry._entries(backend).values())
+
+    # the clients are closed when the loop ends, without aclose
+    asyncio.run(main("asyncio"))
+    trio.run(main, None)
+    assert len(clients) == 2
+    assert all(client.is_closed for client in clients)
+    assert len(registry) == 0
+
+    assert Query("{ id }", endpoint="https://foo.bar/")._registry is default_registry()
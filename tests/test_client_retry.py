@@ -0,0 +1,153 @@
+import json
+import time
+
+import httpx
+import pytest
+
+import respx
+
+from pygraphql import BaseAuth, BaseClientAsync
+from pygraphql.client.retry import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryBudget,
+    RetryPolicy,
+)
+from pygraphql.client.utils import InvalidResponseError, RetryError
+
+
+def status_error(status_code, headers=None):
+    request = httpx.Request("POST", "https://foo.bar/")
+    response = httpx.Response(status_code, headers=headers, request=request)
+    return httpx.HTTPStatusError("error", request=request, response=response)
+
+
+def test_RetryPolicy():
+    policy = RetryPolicy()
+    request = httpx.Request("POST", "https://foo.bar/")
+
+    assert policy.is_retryable(status_error(503))
+    assert policy.is_retryable(status_error(429))
+    assert policy.is_retryable(status_error(403, {"X-RateLimit-Remaining": "0"}))
+    assert policy.is_retryable(httpx.ReadTimeout("timeout", request=request))
+    assert policy.is_retryable(httpx.ConnectError("refused", request=request))
+    assert policy.is_retryable(json.JSONDecodeError("truncated", "{", 1))
+
+    assert not policy.is_retryable(status_error(400))
+    assert not policy.is_retryable(status_error(401))
+    assert not policy.is_retryable(status_error(403))
+    assert not policy.is_retryable(InvalidResponseError("not graphql"))
+    assert not policy.is_retryable(KeyError("bug"))
+
+
+def test_RetryBudget():
+    budget = RetryBudget(ratio=0.5, min_retries_per_second=0.1, window=10)
+    for _ in range(4):
+        budget.record_request()
+
+    # 1 retry always allowed + half of the 4 requests
+    assert [budget.acquire_retry() for _ in range(4)] == [True, True, True, False]
+    assert budget.stats() == {"requests": 4, "retries": 3, "exhausted": 1}
+
+
+def test_CircuitBreaker(monkeypatch):
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=10)
+
+    breaker.before_call()
+    breaker.record_failure()
+    breaker.record_failure(ValueError("down"))
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # a single probe at a time
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    monkeypatch.setattr(time, "monotonic", lambda: now + 22)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats() == {
+        "state": "closed",
+        "consecutive_failures": 0,
+        "successes": 1,
+        "failures": 3,
+        "rejected": 2,
+        "opened": 2,
+    }
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_non_retryable():
+    request = respx.post("https://foo.bar/", status_code=400, content={"errors": []})
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a")
+    ) as client:
+        with pytest.raises(RetryError):
+            await client.execute("""test""", {})
+
+    assert request.call_count == 1
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_retryable():
+    request = respx.post("https://foo.bar/", status_code=503)
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a")
+    ) as client:
+        with pytest.raises(RetryError):
+            await client.execute(
+                """test""", {}, max_tries=3, random_exponential_sleep_max_sleep=0
+            )
+
+    assert request.call_count == 3
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_circuit_breaker():
+    request = respx.post("https://foo.bar/", status_code=503)
+    breaker = CircuitBreaker(failure_threshold=2)
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a"), circuit_breaker=breaker
+    ) as client:
+        with pytest.raises(CircuitOpenError) as error:
+            await client.execute(
+                """test""", {}, max_tries=5, random_exponential_sleep_max_sleep=0
+            )
+        assert isinstance(error.value, RetryError)
+        assert error.value.retries_count == 2
+        assert isinstance(error.value.last_exception, httpx.HTTPStatusError)
+        assert str(error.value).startswith("Circuit open")
+        with pytest.raises(CircuitOpenError):
+            await client.execute("""test""", {})
+
+    assert request.call_count == 2
+    assert client.circuit_breaker.stats()["rejected"] == 2
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_retry_budget():
+    request = respx.post("https://foo.bar/", status_code=503)
+    budget = RetryBudget(ratio=0, min_retries_per_second=0.1, window=10)
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a"), retry_budget=budget
+    ) as client:
+        for _ in range(2):
+            with pytest.raises(RetryError):
+                await client.execute(
+                    """test""", {}, max_tries=5, random_exponential_sleep_max_sleep=0
+                )
+
+    # first execution: 1 try + 1 retry from the budget, second: 1 try
+    assert request.call_count == 3
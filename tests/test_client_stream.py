@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+import respx
+
+from pygraphql import BaseAuth, BaseClientAsync
+from pygraphql.client.stream import JsonPathStreamParser, JsonStreamError
+
+BODY = {
+    "errors": [{"message": "partial"}],
+    "data": {
+        "skipped": [1, {"a": "]}"}],
+        "repository": {
+            "issues": {
+                "pageInfo": {"hasNextPage": False},
+                "edges": [{"node": {"id": i, "title": 'é"}' * i}} for i in range(20)],
+            }
+        },
+    },
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64, 100000])
+def test_JsonPathStreamParser(chunk_size):
+    text = json.dumps(BODY)
+    parser = JsonPathStreamParser("data.repository.issues.edges.item")
+    items = []
+    for start in range(0, len(text), chunk_size):
+        items.extend(parser.feed(text[start : start + chunk_size]))
+    items.extend(parser.close())
+
+    assert items == BODY["data"]["repository"]["issues"]["edges"]
+    assert parser.errors == BODY["errors"]
+
+
+def test_JsonPathStreamParser_items_before_end():
+    parser = JsonPathStreamParser("data.users.item")
+    assert parser.feed('{"data": {"users": [{"id": 1}, {"i') == [{"id": 1}]
+    assert parser.feed('d": 2}, 12') == [{"id": 2}]
+    assert parser.feed("3]}}") == [123]
+    assert parser.close() == []
+
+
+def test_JsonPathStreamParser_large_item():
+    item = {"id": 1, "body": 'x\\"]}{' * 5000, "labels": [{"name": "a"}] * 500}
+    text = json.dumps({"data": {"users": [item, 's\\"', 1.5]}})
+    parser = JsonPathStreamParser("data.users.item")
+    decoder = parser._decoder
+    decodes = []
+
+    class Decoder:
+        def raw_decode(self, text, position):
+            decodes.append(position)
+            return decoder.raw_decode(text, position)
+
+    parser._decoder = Decoder()
+    items = []
+    for start in range(0, len(text), 100):
+        items.extend(parser.feed(text[start : start + 100]))
+    items.extend(parser.close())
+
+    assert items == [item, 's\\"', 1.5]
+    # the item isn't decoded again for each of its chunks
+    assert len(decodes) < 20
+
+
+def test_JsonPathStreamParser_missing_path():
+    parser = JsonPathStreamParser("data.users.item")
+    assert parser.feed('{"data": null, "errors": ["boom"]}') == []
+    assert parser.close() == []
+    assert parser.errors == ["boom"]
+
+
+def test_JsonPathStreamParser_invalid():
+    parser = JsonPathStreamParser("data.users.item")
+    parser.feed('{"data": {"users": [1, 2')
+    with pytest.raises(JsonStreamError):
+        parser.close()
+    with pytest.raises(JsonStreamError):
+        JsonPathStreamParser("data.users.item").feed('{"data" {')
+    with pytest.raises(JsonStreamError):
+        JsonPathStreamParser("data.users.item").feed('{"data": {"users": [{"a"}')
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BaseClientAsync_trio_execute_stream():
+    request = respx.post("https://foo.bar/", content=BODY)
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a")
+    ) as client:
+        result = client.execute_stream(
+            """test""", {"a": "b"}, path="repository.issues.edges.item"
+        )
+        edges = [edge async for edge in result]
+
+    assert request.called
+    assert edges == BODY["data"]["repository"]["issues"]["edges"]
+    assert result.errors == BODY["errors"]
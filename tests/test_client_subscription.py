@@ -0,0 +1,299 @@
+import json
+from collections import deque
+
+import pytest
+
+from pygraphql import BaseAuth
+from pygraphql.client.subscription import (
+    GRAPHQL_WS,
+    SubscriptionClient,
+    SubscriptionOverflowError,
+    WebSocketConnection,
+)
+from pygraphql.client.utils import RetryError, create_event, sleep
+
+QUERY = "subscription { users { name } }"
+
+
+class FakeServer:
+    """in memory stand-in of a graphql-transport-ws or graphql-ws server"""
+
+    def __init__(self, protocol="graphql-transport-ws", backend=None, pong=True):
+        self.protocol = protocol
+        self.backend = backend
+        self.pong = pong
+        self.connections = []
+        self.received = []
+        self.subscriptions = {}
+        self.refuse = False
+
+    async def connect(self, url, subprotocol, headers):
+        assert subprotocol == self.protocol
+        if self.refuse:
+            raise ConnectionRefusedError("refused")
+        connection = FakeConnection(self, url, headers)
+        self.connections.append(connection)
+        self.subscriptions = {}
+        return connection
+
+    def handle(self, connection, message):
+        self.received.append(message)
+        kind = message["type"]
+        if kind == "connection_init":
+            connection.push({"type": "connection_ack"})
+            if self.protocol == GRAPHQL_WS:
+                connection.push({"type": "ka"})
+        elif kind in ("subscribe", "start"):
+            self.subscriptions[message["id"]] = message["payload"]
+        elif kind in ("complete", "stop"):
+            self.subscriptions.pop(message["id"], None)
+        elif kind == "ping" and self.pong:
+            connection.push({"type": "pong"})
+
+    def publish(self, data):
+        kind = "data" if self.protocol == GRAPHQL_WS else "next"
+        for subscription_id in self.subscriptions:
+            self.connections[-1].push(
+                {"id": subscription_id, "type": kind, "payload": {"data": data}}
+            )
+
+    def complete(self, subscription_id):
+        self.subscriptions.pop(subscription_id)
+        self.connections[-1].push({"id": subscription_id, "type": "complete"})
+
+
+class FakeConnection(WebSocketConnection):
+    def __init__(self, server, url, headers):
+        self.server = server
+        self.url = url
+        self.headers = headers
+        self.messages = deque()
+        self.event = create_event(server.backend)
+        self.closed = False
+
+    def push(self, message):
+        self.messages.append(json.dumps(message))
+        self.event.set()
+
+    def drop(self):
+        self.closed = True
+        self.event.set()
+
+    async def send(self, message):
+        if self.closed:
+            raise ConnectionError("closed")
+        self.server.handle(self, json.loads(message))
+
+    async def receive(self):
+        while not self.messages:
+            if self.closed:
+                raise ConnectionError("closed")
+            self.event = create_event(self.server.backend)
+            await self.event.wait()
+        return self.messages.popleft()
+
+    async def aclose(self):
+        self.drop()
+
+
+def types(server):
+    return [message["type"] for message in server.received]
+
+
+@pytest.mark.asyncio
+async def test_SubscriptionClient_multiplexing():
+    server = FakeServer(backend="asyncio")
+    async with SubscriptionClient(
+        endpoint="https://foo.bar/graphql",
+        auth=BaseAuth("a"),
+        connect=server.connect,
+        backend="asyncio",
+    ) as client:
+        users = await client.subscribe(QUERY)
+        other = await client.subscribe(
+            "subscription($id: Int!) { user(id: $id) { name } }", {"id": 1}
+        )
+        while len(server.subscriptions) < 2:
+            await sleep(0.001, backend="asyncio")
+        assert client.connected
+
+        server.publish({"users": [{"name": "a"}]})
+        assert (await users.__anext__()).data == {"users": [{"name": "a"}]}
+        assert (await other.__anext__()).data == {"users": [{"name": "a"}]}
+
+        await users.unsubscribe()
+        assert server.subscriptions.keys() == {other.id}
+        with pytest.raises(StopAsyncIteration):
+            await users.__anext__()
+
+        server.complete(other.id)
+        assert [result async for result in other] == []
+
+    (connection,) = server.connections
+    assert connection.url == "wss://foo.bar/graphql"
+    assert connection.headers["authorization"] == "bearer a"
+    assert server.received[0]["payload"]["headers"]["authorization"] == "bearer a"
+    assert types(server) == ["connection_init", "subscribe", "subscribe", "complete"]
+    assert server.received[2]["payload"]["variables"] == {"id": 1}
+
+
+@pytest.mark.trio
+async def test_SubscriptionClient_graphql_ws_trio():
+    server = FakeServer(protocol=GRAPHQL_WS)
+    async with SubscriptionClient(
+        endpoint="ws://foo.bar/graphql",
+        protocol=GRAPHQL_WS,
+        auth=BaseAuth("a"),
+        connection_params={"token": "a"},
+        connect=server.connect,
+    ) as client:
+        async with await client.subscribe(QUERY) as subscription:
+            while not server.subscriptions:
+                await sleep(0.001)
+            server.publish({"users": []})
+            server.connections[-1].push(
+                {"id": subscription.id, "type": "error", "payload": {"message": "x"}}
+            )
+            results = [result async for result in subscription]
+        assert results[0].data == {"users": []}
+        assert results[1].errors == [{"message": "x"}]
+
+    assert server.received[0]["payload"] == {"token": "a"}
+    assert types(server) == ["connection_init", "start"]
+
+
+@pytest.mark.asyncio
+async def test_SubscriptionClient_reconnect():
+    server = FakeServer(backend="asyncio")
+    async with SubscriptionClient(
+        endpoint="ws://foo.bar/",
+        auth=BaseAuth("a"),
+        reconnect_sleep=lambda n: 0,
+        connect=server.connect,
+        backend="asyncio",
+    ) as client:
+        subscription = await client.subscribe(QUERY)
+        while not server.subscriptions:
+            await sleep(0.001, backend="asyncio")
+        server.connections[-1].drop()
+        while len(server.connections) < 2 or not server.subscriptions:
+            await sleep(0.001, backend="asyncio")
+
+        # subscribed again with the same id on the new connection
+        assert list(server.subscriptions) == [subscription.id]
+        server.publish({"n": 1})
+        assert (await subscription.__anext__()).data == {"n": 1}
+        assert client.reconnects == 1
+
+
+@pytest.mark.asyncio
+async def test_SubscriptionClient_keepalive():
+    server = FakeServer(backend="asyncio", pong=False)
+    async with SubscriptionClient(
+        endpoint="ws://foo.bar/",
+        auth=BaseAuth("a"),
+        keepalive=0.01,
+        keepalive_timeout=0.035,
+        reconnect_sleep=lambda n: 0,
+        connect=server.connect,
+        backend="asyncio",
+    ):
+        while len(server.connections) < 2:
+            await sleep(0.005, backend="asyncio")
+    assert "ping" in types(server)
+
+
+@pytest.mark.asyncio
+async def test_SubscriptionClient_give_up():
+    server = FakeServer(backend="asyncio")
+    server.refuse = True
+    async with SubscriptionClient(
+        endpoint="ws://foo.bar/",
+        auth=BaseAuth("a"),
+        max_reconnect_tries=2,
+        reconnect_sleep=lambda n: 0,
+        connect=server.connect,
+        backend="asyncio",
+    ) as client:
+        subscription = await client.subscribe(QUERY)
+        with pytest.raises(RetryError):
+            await subscription.__anext__()
+        with pytest.raises(RetryError):
+            await client.subscribe(QUERY)
+
+
+@pytest.mark.parametrize(
+    "overflow, expected, dropped",
+    [("drop_oldest", [3, 4], 2), ("drop_newest", [1, 2], 2), ("error", [1, 2], 0)],
+)
+@pytest.mark.asyncio
+async def test_SubscriptionClient_overflow(overflow, expected, dropped):
+    server = FakeServer(backend="asyncio")
+    async with SubscriptionClient(
+        endpoint="ws://foo.bar/",
+        auth=BaseAuth("a"),
+        queue_size=2,
+        overflow=overflow,
+        connect=server.connect,
+        backend="asyncio",
+    ) as client:
+        subscription = await client.subscribe(QUERY)
+        while not server.subscriptions:
+            await sleep(0.001, backend="asyncio")
+        for n in range(1, 5):
+            server.publish({"n": n})
+        await sleep(0.01, backend="asyncio")
+
+        results = [(await subscription.__anext__()).data["n"] for _ in range(2)]
+        if overflow == "error":
+            with pytest.raises(SubscriptionOverflowError):
+                await subscription.__anext__()
+        else:
+            await subscription.unsubscribe()
+            with pytest.raises(StopAsyncIteration):
+                await subscription.__anext__()
+        assert results == expected
+        assert subscription.dropped == dropped
+    if overflow == "error":
+        # the server was told to stop the subscription
+        assert types(server)[-1] == "complete"
+
+
+@pytest.mark.asyncio
+async def test_SubscriptionClient_block():
+    server = FakeServer(backend="asyncio")
+    async with SubscriptionClient(
+        endpoint="ws://foo.bar/",
+        auth=BaseAuth("a"),
+        queue_size=1,
+        overflow="block",
+        connect=server.connect,
+        backend="asyncio",
+    ) as client:
+        subscription = await client.subscribe(QUERY)
+        while not server.subscriptions:
+            await sleep(0.001, backend="asyncio")
+        for n in range(1, 4):
+            server.publish({"n": n})
+        await sleep(0.01, backend="asyncio")
+        # the reader waits for room instead of dropping
+        assert len(server.connections[-1].messages) == 1
+        results = [(await subscription.__anext__()).data["n"] for _ in range(3)]
+        assert results == [1, 2, 3]
+        assert subscription.dropped == 0
+
+
+def test_SubscriptionClient_invalid():
+    with pytest.raises(ValueError):
+        SubscriptionClient(endpoint="ws://a", auth=BaseAuth("a"), protocol="x")
+    with pytest.raises(ValueError):
+        SubscriptionClient(endpoint="ws://a", auth=BaseAuth("a"), overflow="x")
+
+
+def test_WebSocketConnection_incomplete():
+    class SendOnly(WebSocketConnection):
+        async def send(self, message):
+            pass
+
+    with pytest.raises(TypeError):
+        SendOnly()
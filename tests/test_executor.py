@@ -0,0 +1,123 @@
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import pytest
+
+from pygraphql import BaseAuth, ProcessExecutor
+from pygraphql.client.utils import ExecutionResult
+from pygraphql.executor import ExecutorError, WorkerCrashError
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == "win32", reason="the tests use the fork start method"
+)
+
+
+class App:
+    """ASGI GraphQL server answering {"id": $id}, picklable to be sent to the
+    workers"""
+
+    def __init__(self, crash_marker=None):
+        self.crash_marker = crash_marker
+
+    async def __call__(self, scope, receive, send):
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        variables = json.loads(body)["variables"]
+        if variables.get("crash") and self.crash_marker:
+            if variables["crash"] == "always" or not os.path.exists(self.crash_marker):
+                open(self.crash_marker, "w").close()
+                os._exit(1)
+        response = {"data": {"id": variables["id"], "pid": os.getpid()}}
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 500 if variables.get("error") else 200,
+                "headers": [(b"content-type", b"application/json")],
+            }
+        )
+        await send(
+            {"type": "http.response.body", "body": json.dumps(response).encode()}
+        )
+
+
+def executor(**kwargs):
+    kwargs.setdefault("app", App())
+    return ProcessExecutor(
+        "query($id: Int, $crash: String, $error: Boolean) { id }",
+        endpoint="http://test/",
+        auth=BaseAuth("a"),
+        mp_context=multiprocessing.get_context("fork"),
+        **kwargs,
+    )
+
+
+def test_ProcessExecutor():
+    variables = [{"id": i} for i in range(50)]
+    results = list(executor(processes=2, max_concurrency=4).map(variables))
+    assert sorted(result.data["id"] for _, result in results) == list(range(50))
+    assert all(isinstance(result, ExecutionResult) for _, result in results)
+    assert all(item["id"] == result.data["id"] for item, result in results)
+    # the work was sharded
+    assert len({result.data["pid"] for _, result in results}) == 2
+
+
+def test_ProcessExecutor_ordered_bytes():
+    variables = [{"id": i} for i in range(30)]
+    results = list(
+        executor(processes=3, ordered=True, output="bytes", window=4).map(variables)
+    )
+    assert [item for item, _ in results] == variables
+    assert [json.loads(payload)["data"]["id"] for _, payload in results] == list(
+        range(30)
+    )
+
+
+def test_ProcessExecutor_errors():
+    variables = [{"id": 1}, {"id": 2, "error": True}]
+    with pytest.raises(ExecutorError, match="RetryError"):
+        list(executor(processes=1).map(variables, max_tries=1))
+
+    results = dict(
+        (item["id"], result)
+        for item, result in executor(processes=1, return_exceptions=True).map(
+            variables, max_tries=1
+        )
+    )
+    assert results[1].data["id"] == 1
+    assert isinstance(results[2], ExecutorError)
+    assert results[2].error_type == "RetryError"
+
+
+def test_ProcessExecutor_crash(tmp_path):
+    marker = str(tmp_path / "crashed")
+    pool = executor(processes=2, app=App(marker))
+    variables = [{"id": i} for i in range(10)] + [{"id": 10, "crash": "once"}]
+    results = list(pool.map(variables))
+    assert sorted(result.data["id"] for _, result in results) == list(range(11))
+    assert pool.restarts == 1
+
+    os.remove(marker)
+    pool = executor(processes=1, app=App(marker), return_exceptions=True)
+    results = list(pool.map([{"id": 1, "crash": "always"}]))
+    assert isinstance(results[0][1], WorkerCrashError)
+    assert pool.restarts == 2
+
+    os.remove(marker)
+    pool = executor(processes=1, app=App(marker), max_restarts=0)
+    with pytest.raises(WorkerCrashError):
+        list(pool.map([{"id": 1, "crash": "always"}]))
+
+
+def test_ProcessExecutor_rate():
+    start = time.monotonic()
+    results = list(executor(processes=2, rate=40).map({"id": i} for i in range(9)))
+    assert len(results) == 9
+    # 9 requests at 40/s shared by the workers
+    assert time.monotonic() - start >= 0.2
@@ -0,0 +1,169 @@
+import json
+
+import pytest
+
+import respx
+import trio
+
+from pygraphql import BaseAuth, BaseClientAsync, QueryLoader
+from pygraphql.loader import LoaderCancelledError
+
+USER_QUERY = """query GetUser($id: ID!, $full: Boolean = false) {
+    user(id: $id) { ...UserFields }
+    viewer: me { login }
+}
+fragment UserFields on User { id name }"""
+
+
+def fake_users(request):
+    """fake server resolving the aliased fields of a merged document"""
+    body = json.loads(request.read())
+    data, errors = {}, []
+    for name, value in body["variables"].items():
+        slot = name.split("_")[1]
+        if value == "missing":
+            data[f"_{slot}_user"] = None
+            errors.append({"message": "not found", "path": [f"_{slot}_user"]})
+        else:
+            data[f"_{slot}_user"] = {"id": value, "name": f"user {value}"}
+        data[f"_{slot}_viewer"] = {"login": "me"}
+    return {"data": data, "errors": errors or None, "query": body["query"]}
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_QueryLoader_trio():
+    request = respx.post("https://foo.bar/", content=fake_users)
+    results = {}
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a")
+    ) as client:
+        get_user = QueryLoader(USER_QUERY, client=client)
+
+        async def load(user_id):
+            results[user_id] = await get_user({"id": user_id})
+
+        async with trio.open_nursery() as nursery:
+            for user_id in ["1", "2", "missing", "2"]:
+                nursery.start_soon(load, user_id)
+
+    assert request.call_count == 1
+    query = json.loads(request.calls[0][0].read())["query"]
+    assert query.startswith("query GetUser($id_0:ID!$full_0:Boolean=false")
+    assert "_0_viewer:me{login}" in query
+    assert query.count("fragment UserFields") == 1
+
+    assert results["1"].data == {
+        "user": {"id": "1", "name": "user 1"},
+        "viewer": {"login": "me"},
+    }
+    assert results["1"].errors is None
+    assert results["missing"].data["user"] is None
+    assert results["missing"].errors == [{"message": "not found", "path": ["user"]}]
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_QueryLoader_asyncio_max_batch_size():
+    import asyncio
+
+    request = respx.post("https://foo.bar/", content=fake_users)
+    get_user = QueryLoader(
+        USER_QUERY,
+        max_batch_size=2,
+        endpoint="https://foo.bar/",
+        auth=BaseAuth("a"),
+        backend="asyncio",
+    )
+    results = await asyncio.gather(*(get_user({"id": str(i)}) for i in range(5)))
+
+    assert request.call_count == 3
+    assert [result.data["user"]["id"] for result in results] == [
+        str(i) for i in range(5)
+    ]
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_QueryLoader_mutation():
+    def create_users(request):
+        body = json.loads(request.read())
+        data = {}
+        for index, name in enumerate(sorted(body["variables"])):
+            slot = name.split("_")[1]
+            data[f"_{slot}_createUser"] = {"id": str(index)}
+        return {"data": data, "query": body["query"]}
+
+    request = respx.post("https://foo.bar/", content=create_users)
+    results = []
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a")
+    ) as client:
+        create_user = QueryLoader(
+            "mutation($name: String!) { createUser(name: $name) { id } }",
+            client=client,
+        )
+
+        async def create(name):
+            results.append(await create_user({"name": name}))
+
+        async with trio.open_nursery() as nursery:
+            for _ in range(2):
+                nursery.start_soon(create, "a")
+
+    # identical mutations are both executed
+    assert request.call_count == 1
+    query = json.loads(request.calls[0][0].read())["query"]
+    assert query.count("createUser(") == 2
+    assert sorted(result.data["createUser"]["id"] for result in results) == [
+        "0",
+        "1",
+    ]
+
+
+@pytest.mark.trio
+async def test_QueryLoader_mutation_cancelled():
+    bodies = []
+
+    async def app(scope, receive, send):
+        bodies.append(json.loads((await receive())["body"]))
+        await trio.sleep(1)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b'{"data": {}}'})
+
+    errors = []
+    async with BaseClientAsync(
+        endpoint="http://test/", auth=BaseAuth("a"), app=app
+    ) as client:
+        create_user = QueryLoader(
+            "mutation($name: String!) { createUser(name: $name) { id } }",
+            client=client,
+        )
+
+        async def create(name):
+            try:
+                await create_user({"name": name})
+            except LoaderCancelledError as error:
+                errors.append(error)
+
+        async def create_cancelled(name):
+            # the first call executes the batch, it's cancelled once sent
+            with trio.move_on_after(0.1) as scope:
+                await create_user({"name": name})
+            assert scope.cancelled_caught
+
+        async with trio.open_nursery() as nursery:
+            nursery.start_soon(create_cancelled, "a")
+            await trio.sleep(0)
+            nursery.start_soon(create, "b")
+
+    # the mutation isn't replayed
+    assert len(bodies) == 1
+    assert len(errors) == 1
+
+
+def test_QueryLoader_invalid_query():
+    with pytest.raises(ValueError):
+        QueryLoader("{ a } { b }", endpoint="https://foo.bar/")
+    with pytest.raises(ValueError):
+        QueryLoader("{ ...F } fragment F on Query { a }", endpoint="https://foo.bar/")
@@ -0,0 +1,211 @@
+import json
+
+import pytest
+
+import respx
+import trio
+
+from pygraphql import BaseAuth, BaseClientAsync, BigQuery, Query
+from pygraphql.client.document import VariablesError
+from pygraphql.client.utils import ExecutionError, ExecutionResult
+
+ISSUES_QUERY = """query($repo: String!, $cursor: String) {
+    repository(name: $repo) {
+        issues(first: 2, after: $cursor) {
+            pageInfo { hasNextPage endCursor }
+            edges { node { id } }
+        }
+    }
+}"""
+
+
+def paginated_issues(request):
+    """fake server serving 3 pages of 2 issues per repo"""
+    variables = json.loads(request.read())["variables"]
+    page = int(variables["cursor"] or 0)
+    edges = [
+        {"node": {"id": "{}-{}".format(variables["repo"], page * 2 + i)}}
+        for i in range(2)
+    ]
+    return {
+        "data": {
+            "repository": {
+                "issues": {
+                    "pageInfo": {"hasNextPage": page < 2, "endCursor": str(page + 1)},
+                    "edges": edges,
+                }
+            }
+        }
+    }
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_Query_trio():
+    request = respx.post("https://foo.bar/", content={"data": {"id": 123}})
+    query = Query(
+        """query($a: String) { id }""",
+        endpoint="https://foo.bar/",
+        auth=BaseAuth("blibli"),
+    )
+    response = await query({"a": "b"})
+
+    assert request.called
+    assert isinstance(response, ExecutionResult)
+    assert response.data == {"id": 123}
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_Query_trio_compiled():
+    request = respx.post("https://foo.bar/", content={"data": {"id": 123}})
+    query = Query(
+        """query GetUser($id: ID!) {
+            # comments and whitespaces are not sent
+            user(id: $id) { name }
+        }""",
+        endpoint="https://foo.bar/",
+        auth=BaseAuth("blibli"),
+    )
+    await query({"id": 1})
+
+    sent = request.calls[0][0]
+    assert sent.headers["content-type"] == "application/json"
+    assert json.loads(sent.read()) == {
+        "query": "query GetUser($id:ID!){user(id:$id){name}}",
+        "variables": {"id": 1},
+    }
+
+    # invalid variables fail before any request
+    with pytest.raises(VariablesError, match=r"missing variable \$id"):
+        await query({})
+    with pytest.raises(VariablesError, match=r"\$id expected ID"):
+        await query({"id": 1.5})
+    assert request.call_count == 1
+
+    # undeclared variables are sent, unless the variables are strict
+    await query({"id": 1, "other": 2})
+    assert json.loads(request.calls[1][0].read())["variables"]["other"] == 2
+    strict = Query(
+        "query($id: ID!) { user(id: $id) { name } }",
+        endpoint="https://foo.bar/",
+        auth=BaseAuth("blibli"),
+        strict_variables=True,
+    )
+    with pytest.raises(VariablesError, match=r"unknown variable \$other"):
+        await strict({"id": 1, "other": 2})
+    assert request.call_count == 2
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_Query_trio_map():
+    async def slow_first(request):
+        variables = json.loads(request.read())["variables"]
+        if variables["id"] == 0:
+            await trio.sleep(0.1)
+        return {"data": {"id": variables["id"]}}
+
+    request = respx.post("https://foo.bar/", content=slow_first)
+    query = Query(
+        """query($id: Int!) { id }""",
+        endpoint="https://foo.bar/",
+        auth=BaseAuth("blibli"),
+    )
+    consumed = []
+
+    async def variables():
+        for i in range(20):
+            consumed.append(i)
+            yield {"id": i} if i != 5 else {}
+
+    results = []
+    async for item, result in query.map(variables(), max_concurrency=3):
+        # the variables are consumed lazily, at most 2 * 3 ahead
+        assert len(consumed) <= len(results) + 6
+        results.append((item, result))
+    assert [item for item, _ in results][:5] == [{"id": i} for i in range(5)]
+    assert [result.data["id"] for _, result in results[:5]] == list(range(5))
+    # the error doesn't cancel the other executions
+    assert isinstance(results[5][1], VariablesError)
+    assert len(results) == 20
+    assert request.call_count == 19
+
+    ids = [
+        result.data["id"]
+        async for _, result in query.map(({"id": i} for i in range(5)), ordered=False)
+    ]
+    assert sorted(ids) == list(range(5))
+    assert ids[-1] == 0  # the slow one
+
+    with pytest.raises(VariablesError):
+        async for _ in query.map([{}], return_exceptions=False):
+            pass
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_Query_asyncio_map():
+    request = respx.post("https://foo.bar/", content={"data": {"id": 1}})
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("a"), backend="asyncio"
+    ) as client:
+        results = [
+            result async for _, result in Query("{ id }", client=client).map([{}] * 5)
+        ]
+        results += [
+            result
+            async for _, result in client.execute_all("{ id }", [{}] * 5, ordered=False)
+        ]
+    assert [result.data for result in results] == [{"id": 1}] * 10
+    assert request.call_count == 10
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BigQuery_trio():
+    request = respx.post("https://foo.bar/", content=paginated_issues)
+    get_issues = BigQuery(
+        ISSUES_QUERY,
+        aggregation_path="repository.issues",
+        max_concurrency=2,
+        endpoint="https://foo.bar/",
+        auth=BaseAuth("blibli"),
+    )
+    nodes = [node async for node in get_issues([{"repo": "a"}, {"repo": "b"}])]
+
+    assert request.call_count == 6
+    assert sorted(node["id"] for node in nodes) == sorted(
+        "{}-{}".format(repo, i) for repo in "ab" for i in range(6)
+    )
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_BigQuery_asyncio():
+    request = respx.post("https://foo.bar/", content=paginated_issues)
+    async with BaseClientAsync(
+        endpoint="https://foo.bar/", auth=BaseAuth("blibli"), backend="asyncio"
+    ) as client:
+        get_issues = BigQuery(
+            ISSUES_QUERY, aggregation_path="repository.issues", client=client
+        )
+        nodes = [node async for node in get_issues({"repo": "a"})]
+
+    assert request.call_count == 3
+    assert [node["id"] for node in nodes] == ["a-{}".format(i) for i in range(6)]
+
+
+@respx.mock
+@pytest.mark.trio
+async def test_BigQuery_trio_errors():
+    respx.post("https://foo.bar/", content={"data": None, "errors": ["boom"]})
+    get_issues = BigQuery(
+        ISSUES_QUERY,
+        aggregation_path="repository.issues",
+        endpoint="https://foo.bar/",
+        auth=BaseAuth("blibli"),
+    )
+    with pytest.raises(ExecutionError):
+        async for _ in get_issues([{"repo": "a"}]):
+            pass
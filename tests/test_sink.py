@@ -0,0 +1,144 @@
+import array
+import csv
+import gzip
+import json
+
+import pytest
+
+from pygraphql.client.utils import ExecutionError, ExecutionResult
+from pygraphql.sink import (
+    ArrowSink,
+    ColumnBuffer,
+    CsvSink,
+    NdjsonSink,
+    ResultSink,
+    pyarrow,
+)
+
+
+def page(*nodes):
+    return ExecutionResult(
+        data={"repository": {"issues": {"edges": [{"node": n} for n in nodes]}}}
+    )
+
+
+FIELDS = {"number": "number", "closed": "closed", "login": "author.login"}
+
+
+def test_ColumnBuffer():
+    buffer = ColumnBuffer(FIELDS, "repository.issues")
+    assert buffer.append(page({"number": 1, "closed": True, "author": None})) == 1
+    assert buffer.append({"number": None, "closed": False, "author": {"login": "a"}})
+    assert buffer.append({"number": 3}) == 1
+    assert buffer.append(ExecutionResult(data={"repository": None})) == 0
+    assert len(buffer) == 3
+    assert buffer.typecodes() == {"number": "q", "closed": "b", "login": None}
+    assert buffer.columns() == {
+        "number": array.array("q", [1, 0, 3]),
+        "closed": array.array("b", [1, 0, 0]),
+        "login": [None, "a", None],
+    }
+    assert buffer.nulls() == {"number": {1}, "closed": {2}, "login": set()}
+    assert buffer.lists() == {
+        "number": [1, None, 3],
+        "closed": [True, False, None],
+        "login": [None, "a", None],
+    }
+    assert list(buffer.rows())[1] == {"number": None, "closed": False, "login": "a"}
+
+    # mixed types and overflows fall back to a list
+    buffer.append({"number": 2**70, "closed": "yes"})
+    buffer.append({"number": 1.5, "closed": 1})
+    assert buffer.typecodes() == {"number": None, "closed": None, "login": None}
+    assert buffer.columns()["number"] == [1, None, 3, 2**70, 1.5]
+    assert buffer.columns()["closed"] == [True, False, None, "yes", 1]
+    assert buffer.columns()["closed"][0] is True
+    assert buffer.nulls()["number"] == set()
+
+    buffer.clear()
+    assert len(buffer) == 0 and buffer.columns()["number"] == []
+
+    with pytest.raises(ExecutionError):
+        buffer.append(ExecutionResult(errors=[{"message": "boom"}]))
+
+
+@pytest.mark.asyncio
+async def test_NdjsonSink(tmp_path):
+    path = str(tmp_path / "issues.ndjson.gz")
+
+    async def results():
+        for i in range(0, 10, 2):
+            yield page({"number": i}, {"number": i + 1, "author": {"login": "a"}})
+
+    async with NdjsonSink(path, FIELDS, "repository.issues", buffer_rows=3) as sink:
+        assert await sink.consume(results()) == 10
+    assert sink.rows == 10
+    with gzip.open(path) as file:
+        rows = [json.loads(line) for line in file]
+    assert [row["number"] for row in rows] == list(range(10))
+    assert rows[1] == {"number": 1, "closed": None, "login": "a"}
+
+
+def test_CsvSink(tmp_path):
+    path = str(tmp_path / "issues.csv")
+    with CsvSink(path, {"number": "number", "labels": "labels"}, buffer_rows=2) as sink:
+        for i in range(3):
+            sink.write({"number": i, "labels": ["bug"]})
+    with open(path, newline="") as file:
+        assert list(csv.reader(file)) == [
+            ["number", "labels"],
+            ["0", '["bug"]'],
+            ["1", '["bug"]'],
+            ["2", '["bug"]'],
+        ]
+
+    empty = str(tmp_path / "empty.csv")
+    CsvSink(empty, ["number"]).close()
+    with open(empty) as file:
+        assert file.read().strip() == "number"
+
+
+def test_ResultSink_incomplete(tmp_path):
+    class NoClose(ResultSink):
+        def _write(self, buffer):
+            pass
+
+    with pytest.raises(TypeError):
+        NoClose(str(tmp_path / "issues"), ["number"])
+
+
+@pytest.mark.skipif(pyarrow is None, reason="pyarrow not installed")
+def test_ArrowSink(tmp_path):
+    path = str(tmp_path / "issues.arrow")
+    with ArrowSink(path, FIELDS, "repository.issues", buffer_rows=2) as sink:
+        for i in range(5):
+            sink.write(page({"number": i, "closed": i % 2 == 0}))
+    table = pyarrow.ipc.open_file(path).read_all()
+    assert table.column("number").to_pylist() == list(range(5))
+    assert table.column("closed").to_pylist() == [i % 2 == 0 for i in range(5)]
+
+    # the login column has no values in the first rows, the numbers are promoted
+    schema = pyarrow.schema(
+        [("number", pyarrow.float64()), ("closed", pyarrow.bool_())]
+        + [("login", pyarrow.string())]
+    )
+    with ArrowSink(path, FIELDS, schema=schema, buffer_rows=2) as sink:
+        sink.write({"number": 1, "closed": None})
+        sink.write({"number": None, "closed": True})
+        sink.write({"number": 2.5, "author": {"login": "a"}})
+    table = pyarrow.ipc.open_file(path).read_all()
+    assert table.schema == schema
+    assert table.column("number").to_pylist() == [1.0, None, 2.5]
+    assert table.column("closed").to_pylist() == [None, True, None]
+    assert table.column("login").to_pylist() == [None, None, "a"]
+
+    with pytest.raises(ValueError):
+        with ArrowSink(path, FIELDS, buffer_rows=1) as sink:
+            sink.write({"number": 1})
+            sink.write({"number": "a"})
+
+
+@pytest.mark.skipif(pyarrow is not None, reason="pyarrow installed")
+def test_ArrowSink_missing(tmp_path):
+    with pytest.raises(ImportError):
+        ArrowSink(str(tmp_path / "issues.arrow"), FIELDS)
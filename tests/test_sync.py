@@ -0,0 +1,81 @@
+import asyncio
+import concurrent.futures
+import threading
+
+import pytest
+
+import respx
+
+from pygraphql import BaseAuth, SyncClient, SyncQuery
+from pygraphql.client.document import VariablesError
+from pygraphql.sync import EventLoopThread
+
+
+@pytest.fixture
+def loop_thread():
+    loop_thread = EventLoopThread()
+    yield loop_thread
+    loop_thread.close()
+    assert not loop_thread.alive
+
+
+@respx.mock
+def test_SyncClient(loop_thread):
+    request = respx.post("https://foo.bar/", content={"data": {"id": 1}})
+    with SyncClient(
+        endpoint="https://foo.bar/", auth=BaseAuth("a"), loop_thread=loop_thread
+    ) as client:
+        assert client.execute("{ id }").data == {"id": 1}
+        futures = [client.submit_execute("{ id }", {}) for _ in range(3)]
+        assert [future.result().data for future in futures] == [{"id": 1}] * 3
+        results = client.execute_many([("{ id }", {}), ("{ id }", {})])
+        assert len(results) == 2
+
+        # shared by the threads
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            results = list(executor.map(lambda _: client.execute("{ id }"), range(8)))
+        assert all(result.data == {"id": 1} for result in results)
+    assert client.client.is_closed
+    # the batch was answered unbatched and executed again one by one
+    assert request.call_count == 1 + 3 + (1 + 2) + 8
+
+
+@respx.mock
+def test_SyncClient_timeout(loop_thread):
+    cancelled = threading.Event()
+
+    async def slow(request):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    respx.post("https://foo.bar/", content=slow)
+    with SyncClient(
+        endpoint="https://foo.bar/", auth=BaseAuth("a"), loop_thread=loop_thread
+    ) as client:
+        with pytest.raises(concurrent.futures.TimeoutError):
+            client.execute("{ id }", timeout=0.05)
+        assert cancelled.wait(1)
+
+
+@respx.mock
+def test_SyncQuery(loop_thread):
+    request = respx.post("https://foo.bar/", content={"data": {"id": 1}})
+    get_id = SyncQuery(
+        "query($a: Int) { id }",
+        endpoint="https://foo.bar/",
+        auth=BaseAuth("a"),
+        loop_thread=loop_thread,
+    )
+    assert get_id({"a": 1}).data == {"id": 1}
+    assert get_id.submit({}).result().data == {"id": 1}
+    with pytest.raises(VariablesError):
+        get_id({"a": "1"})
+    assert request.call_count == 2
+
+    with SyncClient(
+        endpoint="https://foo.bar/", auth=BaseAuth("a"), loop_thread=loop_thread
+    ) as client:
+        assert SyncQuery("{ id }", client=client)({}).data == {"id": 1}